@@ -0,0 +1,197 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class Rejected(Exception):
+    """A request that was not admitted; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class RateLimiter:
+    """Per-key token buckets: ``rate`` requests/s sustained, bursts up to ``burst``.
+
+    Only the ``max_keys`` most recently seen keys are tracked.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = int(max_keys)
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        """Seconds until ``key`` may try again; 0 means the request is allowed (and a token spent)."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def refund(self, key):
+        """Return the token spent by an allowed ``check()`` whose request was not served."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), updated)
+
+
+class AdmissionController:
+    """Bounded admission in front of detection/inference, with per-user rate limits.
+
+    At most ``max_in_flight`` requests run at once and at most ``max_queue``
+    more wait for a slot. A request is shed up front when the queue is full,
+    or when the queue ahead of it (at the recent mean service time) means it
+    would finish after its deadline; a queued request also gives up as soon
+    as its deadline passes. Queued requests get freed slots in arrival order.
+    Rejections raise ``Rejected`` (429 for rate
+    limits, 503 for overload) with a Retry-After estimate; a request shed
+    with 503 gets its rate-limit token back, so retrying it is not a 429.
+
+    With ``wait=False`` (the async server, whose executor is the queue) a
+    request is admitted or shed immediately and the ``max_queue`` requests
+    beyond ``max_in_flight`` are counted as queued.
+    """
+
+    def __init__(self, max_in_flight=4, max_queue=16, deadline=2.0, rate=10.0, burst=20, ewma_alpha=0.2):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.deadline = float(deadline)
+        self.limiter = RateLimiter(rate, burst)
+        self.ewma_alpha = float(ewma_alpha)
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queue = deque()  # _Waiter per queued request, oldest first
+        self.service_time = 0.0  # seconds, EWMA of admitted requests
+
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+
+    def _queue_wait(self, ahead):
+        return ahead / self.max_in_flight * self.service_time
+
+    def admit(self, user, budget=None, wait=True):
+        """Admit one request or raise Rejected; use the result as a context manager.
+
+        ``budget`` (seconds) can shorten the server deadline, e.g. from a
+        client-supplied header.
+        """
+        retry = self.limiter.check(user)
+        if retry:
+            with self._cond:
+                self.rate_limited += 1
+            raise Rejected(429, 'Rate limit exceeded', retry)
+
+        try:
+            return self._acquire(budget, wait)
+        except Rejected:
+            self.limiter.refund(user)
+            raise
+
+    def _acquire(self, budget, wait):
+        budget = self.deadline if budget is None else min(budget, self.deadline)
+        deadline = time.monotonic() + budget
+        with self._cond:
+            capacity = self.max_in_flight if wait else self.max_in_flight + self.max_queue
+            ahead = len(self._queue) if wait else max(0, self._active - self.max_in_flight + 1)
+            if self._active >= capacity and (not wait or len(self._queue) >= self.max_queue):
+                self.shed_queue_full += 1
+                raise Rejected(503, 'Server busy', self._queue_wait(ahead) + self.service_time)
+            if self._active >= self.max_in_flight or not wait:
+                expected = self._queue_wait(ahead) + self.service_time
+                if expected > budget:
+                    self.shed_deadline += 1
+                    raise Rejected(503, 'Server busy', expected)
+
+            if wait and (self._active >= capacity or self._queue):
+                # FIFO handoff: a released slot goes straight to the oldest waiter, so a
+                # request cannot be starved by threads that release and re-admit at once
+                waiter = _Waiter()
+                self._queue.append(waiter)
+                try:
+                    while not waiter.granted:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.shed_deadline += 1
+                            raise Rejected(503, 'Request expired in queue', self._queue_wait(len(self._queue)))
+                        self._cond.wait(remaining)
+                finally:
+                    if not waiter.granted:
+                        self._queue.remove(waiter)  # identity: waiters never compare equal
+                self.admitted += 1
+                return _Ticket(self)
+            self._active += 1
+            self.admitted += 1
+        return _Ticket(self)
+
+    def _release(self, elapsed):
+        with self._cond:
+            if self.service_time:
+                self.service_time += self.ewma_alpha * (elapsed - self.service_time)
+            else:
+                self.service_time = elapsed
+            if self._queue:
+                # The slot passes to the oldest waiter; _active is unchanged
+                self._queue.popleft().granted = True
+                self._cond.notify_all()
+            else:
+                self._active -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'deadline_ms': self.deadline * 1000.0,
+                'in_flight': min(self._active, self.max_in_flight),
+                'queued': len(self._queue) + max(0, self._active - self.max_in_flight),
+                'service_time_ms': self.service_time * 1000.0,
+                'admitted': self.admitted,
+                'rate_limited': self.rate_limited,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_deadline': self.shed_deadline,
+            }
+
+
+class _Waiter:
+    __slots__ = ('granted',)
+
+    def __init__(self):
+        self.granted = False
+
+
+class _Ticket:
+    __slots__ = ('controller', 'start')
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.start = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.controller._release(time.monotonic() - self.start)
+        return False
@@ -0,0 +1,131 @@
+import math
+import time
+
+import numpy as np
+
+from pipeline import EMOTIONS, probabilities_to_dict
+
+
+class EmotionAggregator:
+    """Confidence-weighted, time-decayed vote over per-frame probability vectors.
+
+    Each frame contributes ``confidence * probabilities`` (confidence = the
+    top class probability, so unsure frames count less), decayed with
+    ``half_life`` seconds. Only the last ``capacity`` frames take part: they
+    live in a fixed ring buffer and the oldest one's decayed contribution is
+    subtracted when it is overwritten, so every update is O(1) no matter how
+    long the session runs. The running sums are rebuilt from the buffer once
+    per ``capacity`` updates to stop floating-point drift.
+    """
+
+    def __init__(self, capacity=256, half_life=10.0):
+        self.capacity = max(1, int(capacity))
+        self.half_life = float(half_life)
+        self._decay = math.log(2) / self.half_life if self.half_life > 0 else 0.0
+
+        self._votes = np.zeros((self.capacity, len(EMOTIONS)), dtype=np.float64)
+        self._times = np.zeros(self.capacity, dtype=np.float64)
+        self._next = 0
+        self.frames = 0
+
+        self._sum = np.zeros(len(EMOTIONS), dtype=np.float64)
+        self._updated_at = None
+
+    def update(self, probabilities, timestamp=None):
+        """Add one frame: a (7,) vector, or (N, 7) for N faces (each face votes)."""
+        probabilities = np.asarray(probabilities, dtype=np.float64).reshape(-1, len(EMOTIONS))
+        if not len(probabilities):
+            return
+        now = time.monotonic() if timestamp is None else float(timestamp)
+        vote = (probabilities.max(axis=1, keepdims=True) * probabilities).sum(axis=0)
+
+        self._advance(now)
+        slot = self._next
+        if self.frames >= self.capacity:
+            # Evict the oldest frame's remaining (decayed) weight
+            self._sum -= self._votes[slot] * math.exp(-self._decay * (now - self._times[slot]))
+            np.maximum(self._sum, 0.0, out=self._sum)
+        self._votes[slot] = vote
+        self._times[slot] = now
+        self._sum += vote
+        self._next = (slot + 1) % self.capacity
+        self.frames += 1
+
+        if self._next == 0:
+            self._rebuild(now)
+
+    def _advance(self, now):
+        if self._updated_at is not None and now > self._updated_at:
+            self._sum *= math.exp(-self._decay * (now - self._updated_at))
+        self._updated_at = now if self._updated_at is None else max(now, self._updated_at)
+
+    def _rebuild(self, now):
+        filled = min(self.frames, self.capacity)
+        weights = np.exp(-self._decay * (now - self._times[:filled]))
+        self._sum = weights @ self._votes[:filled]
+
+    def reset(self):
+        self._votes[:] = 0.0
+        self._sum[:] = 0.0
+        self._next = 0
+        self.frames = 0
+        self._updated_at = None
+
+    def distribution(self):
+        """Normalized (7,) vote shares; all zeros before the first frame."""
+        total = self._sum.sum()
+        return self._sum / total if total > 0 else np.zeros(len(EMOTIONS))
+
+    @property
+    def emotion(self):
+        if not self._sum.any():
+            return "Neutral"
+        return EMOTIONS[int(np.argmax(self._sum))]
+
+    def ranked(self):
+        """Emotions that received votes, strongest first."""
+        shares = self.distribution()
+        return [EMOTIONS[i] for i in np.argsort(-shares, kind='stable') if shares[i] > 0]
+
+    def summary(self):
+        """Compact aggregate a client can post to /recommend instead of a label list."""
+        return {
+            'emotion': self.emotion,
+            'probabilities': probabilities_to_dict(self.distribution()),
+            'frames': self.frames,
+        }
+
+
+def weights_from_aggregate(aggregate):
+    """Validated, normalized {emotion: share} from a posted {"probabilities": {...}} aggregate.
+
+    The shares can stand in for a label list wherever labels are counted
+    (``Counter``, ``muse.allocation``). Raises ValueError unless the aggregate
+    is an object whose probabilities map known emotions to finite numbers in
+    [0, 1], at least one of them positive; a bare {"emotion": ...} is accepted
+    as a single vote.
+    """
+    if not isinstance(aggregate, dict):
+        raise ValueError("aggregate must be an object")
+    probabilities = aggregate.get('probabilities')
+    if probabilities is None:
+        emotion = aggregate.get('emotion')
+        if emotion not in EMOTIONS:
+            raise ValueError("aggregate needs probabilities or a known emotion")
+        return {emotion: 1.0}
+    if not isinstance(probabilities, dict):
+        raise ValueError("aggregate probabilities must be an object")
+
+    weights = {}
+    for emotion, value in probabilities.items():
+        if emotion not in EMOTIONS:
+            raise ValueError(f"Unknown emotion {emotion!r}")
+        # bool is an int subclass; reject it along with strings, lists, None
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0.0 <= value <= 1.0:
+            raise ValueError(f"Probability for {emotion} must be a number in [0, 1]")
+        if value > 0:
+            weights[emotion] = float(value)
+    total = sum(weights.values())
+    if not total:
+        raise ValueError("aggregate probabilities are all zero")
+    return {emotion: value / total for emotion, value in weights.items()}
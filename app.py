@@ -1,19 +1,17 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, Response, abort, send_file, render_template, request, jsonify, redirect, url_for, session, flash
 from flask_bcrypt import Bcrypt
-from pymongo import MongoClient
 import numpy as np
-import cv2
-import pandas as pd
-import base64
 import os
-from collections import Counter
-import traceback
 
-from flask_cors import CORS
-from dotenv import load_dotenv
+# Model, detection, playlists and the /predict and /recommend helpers are shared with asgi_app.py
+import service
+from admission import Rejected
+from auth import UserStore, UsernameTaken, connect
+from metrics import registry as metrics
+from decoding import decode_data_url, read_body, decode_image, decode_frame
 
-# Load environment variables from .env file
-load_dotenv()
+from flask_cors import CORS
+from flask_sock import Sock
 
 # --- Configuration ---
 app = Flask(__name__)
@@ -27,132 +25,40 @@ CORS(app, supports_credentials=True, resources={r"/*": {"origins": [
     "http://127.0.0.1:5175"
 ]}})
 
-app.secret_key = os.getenv('SECRET_KEY', 'supersecretkey')
+sock = Sock(app)
+
+app.secret_key = service.SECRET_KEY
 app.config['MONGO_URI'] = os.getenv('MONGO_URI')
+app.config['BCRYPT_LOG_ROUNDS'] = service.BCRYPT_LOG_ROUNDS
 
 # --- Database Setup ---
+# MONGO_URI=mongomock:// runs against an in-process stand-in (tests, load tests)
 users_collection = None
+user_store = None
+bcrypt = Bcrypt(app)
 try:
-    client = MongoClient(app.config['MONGO_URI'], serverSelectionTimeoutMS=5000)
+    client = connect(app.config['MONGO_URI'], max_pool_size=int(os.getenv('MONGO_MAX_POOL_SIZE', 50)))
     db = client.get_database('emotion_music_db')
     users_collection = db.users
     # Trigger a connection check
     client.server_info()
+    user_store = UserStore(users_collection, bcrypt,
+                           hash_workers=int(os.getenv('HASH_WORKERS', 4)),
+                           failure_ttl=float(os.getenv('FAILED_LOGIN_TTL', 30)))
     print("Connected to MongoDB")
+    try:
+        user_store.ensure_indexes()
+    except Exception as e:
+        print(f"WARNING: Could not create unique username index: {e}")
 except Exception as e:
     print(f"Error connecting to MongoDB: {e}")
     # Fallback for dev/demo if DB fails? 
     # For now, we leave users_collection as None and handle it in routes
 
 
-bcrypt = Bcrypt(app)
-
-# --- ML Model Setup ---
-model = None
-try:
-    from tensorflow.keras.models import Sequential
-    from tensorflow.keras.layers import Dense, Dropout, Flatten, Conv2D, MaxPooling2D
-    
-    def load_model():
-        model = Sequential()
-        model.add(Conv2D(32, kernel_size=(3, 3), activation='relu', input_shape=(48, 48, 1)))
-        model.add(Conv2D(64, kernel_size=(3, 3), activation='relu'))
-        model.add(MaxPooling2D(pool_size=(2, 2)))
-        model.add(Conv2D(128, kernel_size=(3, 3), activation='relu'))
-        model.add(MaxPooling2D(pool_size=(2, 2)))
-        model.add(Conv2D(128, kernel_size=(3, 3), activation='relu'))
-        model.add(MaxPooling2D(pool_size=(2, 2)))
-        model.add(Dropout(0.25))
-        model.add(Flatten())
-        model.add(Dense(1024, activation='relu'))
-        model.add(Dropout(0.5))
-        model.add(Dense(7, activation='softmax'))
-        model.load_weights('model.h5')
-        return model
-        
-    model = load_model()
-    print("Model loaded successfully")
-except Exception as e:
-    print(f"WARNING: Could not load TensorFlow model: {e}")
-    print("Running in DEMO mode with mock predictions.")
-
-emotion_dict = {0: "Angry", 1: "Disgusted", 2: "Fearful", 3: "Happy", 4: "Neutral", 5: "Sad", 6: "Surprised"}
-
-def load_haarcascade():
-    face_cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
-    return face_cascade
-
-face_cascade = load_haarcascade()
-
-# --- FIXED PLAYLISTS (7 Songs per Emotion) ---
-# Hardcoded to ensure no overlap and high quality
-FIXED_PLAYLISTS = {
-    "Angry": [
-        {"name": "Numb", "artist": "Linkin Park", "link": "https://youtu.be/kXYiU_JCYtU", "track": "Numb"},
-        {"name": "Break Stuff", "artist": "Limp Bizkit", "link": "https://youtu.be/ZpUYjpKg9KY", "track": "Break Stuff"},
-        {"name": "Killing In The Name", "artist": "Rage Against The Machine", "link": "https://youtu.be/bWXazVhlyxQ", "track": "Killing In The Name"},
-        {"name": "Chop Suey!", "artist": "System Of A Down", "link": "https://youtu.be/CSvFpBOe8eY", "track": "Chop Suey!"},
-        {"name": "Du Hast", "artist": "Rammstein", "link": "https://youtu.be/W3q8Od5qJio", "track": "Du Hast"},
-        {"name": "Bodies", "artist": "Drowning Pool", "link": "https://youtu.be/04F4xlWSFh0", "track": "Bodies"},
-        {"name": "Master of Puppets", "artist": "Metallica", "link": "https://youtu.be/xnKhsTXoKCI", "track": "Master of Puppets"}
-    ],
-    "Disgusted": [
-        {"name": "Ugly", "artist": "The Exies", "link": "https://youtu.be/O3M8g8lZgY4", "track": "Ugly"},
-        {"name": "Creep", "artist": "Radiohead", "link": "https://youtu.be/XFkzRNyygfk", "track": "Creep"},
-        {"name": "Bad Guy", "artist": "Billie Eilish", "link": "https://youtu.be/DyDfgMOUjCI", "track": "Bad Guy"},
-        {"name": "Toxic", "artist": "Britney Spears", "link": "https://youtu.be/LOZuxwVk7TU", "track": "Toxic"},
-        {"name": "Sick of It", "artist": "Skillet", "link": "https://youtu.be/A2JGDyX018g", "track": "Sick of It"},
-        {"name": "Hate Me", "artist": "Blue October", "link": "https://youtu.be/dDxgSvJINlU", "track": "Hate Me"},
-        {"name": "Complicated", "artist": "Avril Lavigne", "link": "https://youtu.be/5NPBIwQyPWE", "track": "Complicated"}
-    ],
-    "Fearful": [
-        {"name": "Demons", "artist": "Imagine Dragons", "link": "https://youtu.be/mWRsgZuwf_8", "track": "Demons"},
-        {"name": "Thriller", "artist": "Michael Jackson", "link": "https://youtu.be/sOnqjkJTMaA", "track": "Thriller"},
-        {"name": "Somebody's Watching Me", "artist": "Rockwell", "link": "https://youtu.be/7YvAYIJSSZY", "track": "Somebody's Watching Me"},
-        {"name": "Enter Sandman", "artist": "Metallica", "link": "https://youtu.be/CD-E-LDc384", "track": "Enter Sandman"},
-        {"name": "Disturbia", "artist": "Rihanna", "link": "https://youtu.be/E1mU6h4Xdxc", "track": "Disturbia"},
-        {"name": "In the End", "artist": "Linkin Park", "link": "https://youtu.be/eVTXPUF4Oz4", "track": "In the End"},
-        {"name": "Unthought Known", "artist": "Pearl Jam", "link": "https://youtu.be/T224iY8rYyM", "track": "Unthought Known"}
-    ],
-    "Happy": [
-        {"name": "Happy", "artist": "Pharrell Williams", "link": "https://youtu.be/ZbZSe6N_BXs", "track": "Happy"},
-        {"name": "Uptown Funk", "artist": "Mark Ronson ft. Bruno Mars", "link": "https://youtu.be/OPf0YbXqDm0", "track": "Uptown Funk"},
-        {"name": "Can't Stop the Feeling!", "artist": "Justin Timberlake", "link": "https://youtu.be/ru0K8uYEZWw", "track": "Can't Stop the Feeling!"},
-        {"name": "Walking on Sunshine", "artist": "Katrina and the Waves", "link": "https://youtu.be/iPUmE-tne5U", "track": "Walking on Sunshine"},
-        {"name": "Shut Up and Dance", "artist": "WALK THE MOON", "link": "https://youtu.be/6JCLY0Rlx6Q", "track": "Shut Up and Dance"},
-        {"name": "I Gotta Feeling", "artist": "The Black Eyed Peas", "link": "https://youtu.be/uSD4vsh1zDA", "track": "I Gotta Feeling"},
-        {"name": "Best Day of My Life", "artist": "American Authors", "link": "https://youtu.be/Y66j_BUCBMY", "track": "Best Day of My Life"}
-    ],
-    "Neutral": [
-        {"name": "Weightless", "artist": "Marconi Union", "link": "https://youtu.be/UfcAVejslrU", "track": "Weightless"},
-        {"name": "Orinoco Flow", "artist": "Enya", "link": "https://youtu.be/LTrk4X9ACTw", "track": "Orinoco Flow"},
-        {"name": "Put Your Records On", "artist": "Corinne Bailey Rae", "link": "https://youtu.be/rjOhZZyn30k", "track": "Put Your Records On"},
-        {"name": "Sunday Morning", "artist": "Maroon 5", "link": "https://youtu.be/S2CTI12XBJA", "track": "Sunday Morning"},
-        {"name": "Banana Pancakes", "artist": "Jack Johnson", "link": "https://youtu.be/6Graa_Vm5eA", "track": "Banana Pancakes"},
-        {"name": "Three Little Birds", "artist": "Bob Marley", "link": "https://youtu.be/LanCLS_hIo4", "track": "Three Little Birds"},
-        {"name": "Upside Down", "artist": "Jack Johnson", "link": "https://youtu.be/dqUdI4AIDF0", "track": "Upside Down"}
-    ],
-    "Sad": [
-        {"name": "Someone Like You", "artist": "Adele", "link": "https://youtu.be/hLQl3WQQoQ0", "track": "Someone Like You"},
-        {"name": "Fix You", "artist": "Coldplay", "link": "https://youtu.be/k4V3Mo61fJM", "track": "Fix You"},
-        {"name": "Let Her Go", "artist": "Passenger", "link": "https://youtu.be/RBumgq5yVrA", "track": "Let Her Go"},
-        {"name": "The Night We Met", "artist": "Lord Huron", "link": "https://youtu.be/KtlgYxa6BMU", "track": "The Night We Met"},
-        {"name": "All of Me", "artist": "John Legend", "link": "https://youtu.be/450p7goxZqg", "track": "All of Me"},
-        {"name": "Say Something", "artist": "A Great Big World", "link": "https://youtu.be/-2U0Ivkn2Ds", "track": "Say Something"},
-        {"name": "Skinny Love", "artist": "Birdy", "link": "https://youtu.be/aNzCDt2eidg", "track": "Skinny Love"}
-    ],
-    "Surprised": [
-        {"name": "Firework", "artist": "Katy Perry", "link": "https://youtu.be/QGJuMBdaqUb", "track": "Firework"},
-        {"name": "Bohemian Rhapsody", "artist": "Queen", "link": "https://youtu.be/fJ9rUzIMcZQ", "track": "Bohemian Rhapsody"},
-        {"name": "Sugar", "artist": "Maroon 5", "link": "https://youtu.be/09R8_2nJtjg", "track": "Sugar"},
-        {"name": "Counting Stars", "artist": "OneRepublic", "link": "https://youtu.be/hT_nvWreIhg", "track": "Counting Stars"},
-        {"name": "Viva La Vida", "artist": "Coldplay", "link": "https://youtu.be/dvgZkm1xWPE", "track": "Viva La Vida"},
-        {"name": "On Top of the World", "artist": "Imagine Dragons", "link": "https://youtu.be/w5tWYmIOWGk", "track": "On Top of the World"},
-        {"name": "Starlight", "artist": "Muse", "link": "https://youtu.be/Pgum6OT_VH8", "track": "Starlight"}
-    ]
-}
-
-
+# --- Admission Control ---
+# Requests wait here for one of ADMISSION_MAX_IN_FLIGHT detection/inference slots
+admission = service.make_admission(int(os.getenv('ADMISSION_MAX_IN_FLIGHT', os.cpu_count() or 4)))
 
 # ... (Database and Model setup remains same) ...
 
@@ -183,12 +89,10 @@ def login():
             password = request.form['password']
         
         try:
-            if users_collection is None:
+            if user_store is None:
                 raise Exception("Database connection invalid")
                 
-            user = users_collection.find_one({'username': username})
-            
-            if user and bcrypt.check_password_hash(user['password'], password):
+            if user_store.authenticate(username, password):
                 session['user'] = username
                 if request.is_json:
                     return jsonify({'success': True, 'user': username})
@@ -225,19 +129,21 @@ def register():
             return redirect(url_for('register'))
             
         try:
-            if users_collection.find_one({'username': username}):
-                if request.is_json:
-                    return jsonify({'success': False, 'message': 'Username already exists'}), 400
-                flash('Username already exists', 'error')
-                return redirect(url_for('register'))
-                
-            hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-            users_collection.insert_one({'username': username, 'password': hashed_password})
+            if user_store is None:
+                raise Exception("Database connection invalid")
+
+            # Single insert; the unique index rejects a name that already exists
+            user_store.create_user(username, password)
             
             if request.is_json:
                 return jsonify({'success': True, 'message': 'Account created'})
             flash('Account created successfully! Please login.', 'success')
             return redirect(url_for('login'))
+        except UsernameTaken:
+            if request.is_json:
+                return jsonify({'success': False, 'message': 'Username already exists'}), 400
+            flash('Username already exists', 'error')
+            return redirect(url_for('register'))
         except Exception as e:
              if request.is_json:
                 return jsonify({'success': False, 'message': str(e)}), 500
@@ -260,89 +166,106 @@ def dashboard():
         return redirect(url_for('login'))
     return render_template('dashboard.html')
 
+def read_frame():
+    """Decode the posted frame to grayscale; returns (gray, scale back to client pixels)."""
+    if request.is_json:
+        return decode_data_url(request.json['image']), 1
+
+    # Encoded uploads may ask for a reduced decode (?reduce=2|4|8)
+    reduce = request.args.get('reduce', 1, type=int)
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files['image']
+        return decode_image(np.frombuffer(upload.read(), np.uint8), reduce), reduce
+
+    if request.content_length:
+        body = read_body(request.stream, request.content_length)
+    else:
+        body = np.frombuffer(request.get_data(), np.uint8)
+
+    return decode_frame(request.mimetype, body, request.headers, reduce)
+
 @app.route('/predict', methods=['POST'])
 def predict():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
         
+    metrics.inc('predict_requests_total')
     try:
-        data = request.json['image']
-        header, encoded = data.split(",", 1)
-        nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        emotion = "Neutral"
-        
-        if model:
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
-            # Default to Neutral if no face found but model exists
-            emotion = "Neutral" 
-            for (x, y, w, h) in faces:
-                roi_gray = gray[y:y + h, x:x + w]
-                cropped_img = np.expand_dims(np.expand_dims(cv2.resize(roi_gray, (48, 48)), -1), 0)
-                prediction = model.predict(cropped_img, verbose=0)
-                max_index = int(np.argmax(prediction))
-                emotion = emotion_dict[max_index]
-                break
-        else:
-            # DEMO MODE: Randomize emotion to show UI functionality
-            # Since TensorFlow failed to install, we simulate detection
-            import random
-            # Higher chance of non-neutral emotions for demo
-            emotions_pool = ["Happy", "Sad", "Angry", "Surprised", "Fearful", "Disgusted", "Neutral"]
-            emotion = random.choice(emotions_pool)
-            print(f"Demo Mode Prediction: {emotion}")
-            
-        return jsonify({'emotion': emotion})
+        ticket = admission.admit(session['user'], service.request_budget(request.headers))
+    except Rejected as e:
+        return service.overloaded(e)
+
+    metrics.add('predict_in_flight', 1)
+    try:
+        with ticket:
+            gray, scale = read_frame()
+            result = service.predict_frame(gray, scale, session['user'])
+        with metrics.stage('json_encode'):
+            return jsonify(result)
         
+    except service.INFERENCE_TIMEOUTS:
+        # Saturated inference is overload, not a Neutral face
+        return service.overloaded(Rejected(503, 'Inference timed out', admission.service_time))
     except Exception as e:
         print(f"Prediction error: {e}")
+        metrics.inc('predict_errors_total')
         return jsonify({'emotion': 'Neutral'})
+    finally:
+        metrics.add('predict_in_flight', -1)
+
+@sock.route('/stream')
+def stream(ws):
+    # Long-lived socket: session and cookies are checked once, not per frame
+    if 'user' not in session:
+        ws.close(reason=1008, message='Unauthorized')
+        return
+    service.stream_session(ws).run()
+
+@app.route('/inference-stats')
+def inference_stats():
+    return jsonify(service.inference_stats(admission))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics disabled (set METRICS_ENABLED=1)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
-@app.route('/recommend', methods=['POST'])
+# --- Static Files ---
+def serve_static(filename):
+    if filename.startswith('songs/'):
+        name = filename[len('songs/'):]
+        path = service.audio_path(name)
+        if path is None:
+            abort(404)
+        offloaded = service.audio_offload(path, name)
+        if offloaded is not None:
+            return offloaded
+        response = send_file(path, conditional=True, max_age=service.AUDIO_MAX_AGE)
+        response.cache_control.public = True
+        return response
+    return service.asset_response(filename, request) or app.send_static_file(filename)
+
+# Keeps url_for('static', ...) in the templates working
+app.view_functions['static'] = serve_static
+
+@app.route('/recommend', methods=['GET', 'POST'])
 def recommend():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
         
-    emotions = request.json.get('emotions', [])
+    # GET /recommend?emotion=Happy&emotion=Sad is cacheable by the browser
+    if request.method == 'GET':
+        emotions = request.args.getlist('emotion')
+    else:
+        try:
+            emotions = service.posted_emotions(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     if not emotions:
         return jsonify({'error': 'No emotions provided'}), 400
-        
-    # Get dominant emotion
-    emotion_counts = Counter(emotions)
-    if emotion_counts:
-        dominant_emotion = emotion_counts.most_common(1)[0][0]
-    else:
-        dominant_emotion = "Neutral"
-        
-    # Check for local songs first
-    local_songs = []
-    songs_dir = os.path.join(app.root_path, 'static', 'songs', dominant_emotion)
-    
-    if os.path.exists(songs_dir):
-        for filename in os.listdir(songs_dir):
-            if filename.lower().endswith(('.mp3', '.wav', '.ogg')):
-                local_songs.append({
-                    'name': filename,
-                    'artist': 'Local Track',
-                    # Create full URL for frontend
-                    'link': f"{request.url_root}static/songs/{dominant_emotion}/{filename}",
-                    'track': filename,
-                    'is_local': True
-                })
 
-    if local_songs:
-        # Shuffle the local songs for random playback
-        import random
-        random.shuffle(local_songs)
-        selected_songs = local_songs # Use all local songs found (now shuffled)
-    else:
-        # Fallback to fixed YouTube playlists
-        selected_songs = FIXED_PLAYLISTS.get(dominant_emotion, FIXED_PLAYLISTS["Neutral"])
-        
-    return jsonify({'dominant_emotion': dominant_emotion, 'songs': selected_songs})
+    return service.recommendation(emotions, request)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
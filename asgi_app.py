@@ -0,0 +1,340 @@
+"""Async (ASGI) serving mode for the same API as app.py.
+
+Mongo calls go through motor, bcrypt runs on a bounded hashing pool and frame
+decode + detection + inference run on a bounded CV pool, so the event loop only
+ever waits on I/O. /stream runs the same StreamSession as app.py, on a thread
+per connection. Sessions are signed with the same SECRET_KEY, so cookies
+issued by either server work on both.
+
+    hypercorn -b 0.0.0.0:5000 asgi_app:app
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+from flask_bcrypt import Bcrypt
+from motor.motor_asyncio import AsyncIOMotorClient
+from quart import (Quart, Response, abort, send_file, render_template, request, jsonify, redirect, url_for, session,
+                   flash, websocket)
+from quart_cors import cors, cors_exempt
+
+# Model, cascade, batching and playlists are shared with the sync app; its database,
+# Mongo client and admission controller are not, so nothing here blocks at import
+import service
+from admission import Rejected
+from auth import UserStore, UsernameTaken
+from decoding import decode_data_url, decode_image, decode_frame
+from metrics import registry as metrics
+
+app = Quart(__name__)
+app = cors(app, allow_credentials=True, allow_origin=[
+    "http://localhost:5173",
+    "http://127.0.0.1:5173",
+    "http://localhost:5174",
+    "http://127.0.0.1:5174",
+    "http://localhost:5175",
+    "http://127.0.0.1:5175"
+])
+app.secret_key = service.SECRET_KEY
+app.config['BCRYPT_LOG_ROUNDS'] = service.BCRYPT_LOG_ROUNDS
+bcrypt = Bcrypt(app)
+
+# bcrypt and OpenCV/inference release the GIL, so threads give real parallelism here.
+# The pools and the Mongo client are created when the server starts, not at import.
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', 4))
+CV_WORKERS = int(os.getenv('CV_WORKERS', os.cpu_count() or 4))
+# The CV pool's queue is the admission queue here, so requests are admitted or shed without waiting
+admission = service.make_admission(CV_WORKERS)
+
+cv_pool = None
+mongo_client = None
+user_store = None
+
+
+async def run_in(pool, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, partial(fn, *args))
+
+
+@app.before_serving
+async def startup():
+    global cv_pool, mongo_client, user_store
+    cv_pool = ThreadPoolExecutor(CV_WORKERS, thread_name_prefix='cv')
+    mongo_client = AsyncIOMotorClient(os.getenv('MONGO_URI'), serverSelectionTimeoutMS=5000,
+                                      maxPoolSize=int(os.getenv('MONGO_MAX_POOL_SIZE', 100)))
+    # Same login cache, bcrypt pool and index handling as app.py, over motor
+    user_store = UserStore(mongo_client.get_database('emotion_music_db').users, bcrypt,
+                           hash_workers=HASH_WORKERS, failure_ttl=float(os.getenv('FAILED_LOGIN_TTL', 30)))
+    try:
+        await mongo_client.server_info()
+        print("Connected to MongoDB (async)")
+        try:
+            await user_store.ensure_indexes_async()
+        except Exception as e:
+            print(f"WARNING: Could not create unique username index: {e}")
+    except Exception as e:
+        print(f"Error connecting to MongoDB: {e}")
+
+
+@app.after_serving
+async def shutdown():
+    mongo_client.close()
+    user_store.hash_pool.shutdown(wait=False)
+    cv_pool.shutdown(wait=False)
+
+
+async def read_credentials(*fields):
+    if request.is_json:
+        data = await request.get_json()
+        return [data.get(field) for field in fields]
+    form = await request.form
+    return [form[field] for field in fields]
+
+
+@app.route('/check-auth')
+async def check_auth():
+    if 'user' in session:
+        return jsonify({'authenticated': True, 'user': session['user']})
+    return jsonify({'authenticated': False}), 401
+
+
+@app.route('/')
+async def index():
+    if 'user' in session:
+        return redirect(url_for('dashboard'))
+    return redirect(url_for('login'))
+
+
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    if request.method == 'POST':
+        username, password = await read_credentials('username', 'password')
+
+        try:
+            if await user_store.authenticate_async(username, password):
+                session['user'] = username
+                if request.is_json:
+                    return jsonify({'success': True, 'user': username})
+                await flash('Login successful!', 'success')
+                return redirect(url_for('dashboard'))
+            else:
+                if request.is_json:
+                    return jsonify({'success': False, 'message': 'Invalid username or password'}), 401
+                await flash('Invalid username or password', 'error')
+        except Exception as e:
+            if request.is_json:
+                return jsonify({'success': False, 'message': str(e)}), 500
+            await flash(f'Database error: {str(e)}', 'error')
+
+    return await render_template('login.html')
+
+
+@app.route('/register', methods=['GET', 'POST'])
+async def register():
+    if request.method == 'POST':
+        username, password, confirm_password = await read_credentials('username', 'password', 'confirm_password')
+
+        if password != confirm_password:
+            if request.is_json:
+                return jsonify({'success': False, 'message': 'Passwords do not match'}), 400
+            await flash('Passwords do not match', 'error')
+            return redirect(url_for('register'))
+
+        try:
+            # Single insert; the unique index rejects a name that already exists
+            await user_store.create_user_async(username, password)
+
+            if request.is_json:
+                return jsonify({'success': True, 'message': 'Account created'})
+            await flash('Account created successfully! Please login.', 'success')
+            return redirect(url_for('login'))
+        except UsernameTaken:
+            if request.is_json:
+                return jsonify({'success': False, 'message': 'Username already exists'}), 400
+            await flash('Username already exists', 'error')
+            return redirect(url_for('register'))
+        except Exception as e:
+            if request.is_json:
+                return jsonify({'success': False, 'message': str(e)}), 500
+            await flash(f'Database error: {str(e)}', 'error')
+
+    return await render_template('register.html')
+
+
+@app.route('/logout')
+async def logout():
+    session.pop('user', None)
+    if request.headers.get('Accept') == 'application/json':
+        return jsonify({'success': True})
+    await flash('Logged out successfully.', 'success')
+    return redirect(url_for('login'))
+
+
+@app.route('/dashboard')
+async def dashboard():
+    if 'user' not in session:
+        await flash('Please login to access the dashboard', 'warning')
+        return redirect(url_for('login'))
+    return await render_template('dashboard.html')
+
+
+def decode_and_predict(owner, decode, *args):
+    gray, scale = decode(*args)
+    return service.predict_frame(gray, scale, owner)
+
+
+@app.route('/predict', methods=['POST'])
+async def predict():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    metrics.inc('predict_requests_total')
+    try:
+        ticket = admission.admit(session['user'], service.request_budget(request.headers), wait=False)
+    except Rejected as e:
+        return service.overloaded(e)
+
+    metrics.add('predict_in_flight', 1)
+    try:
+        reduce = request.args.get('reduce', 1, type=int)
+        if request.is_json:
+            data = (await request.get_json())['image']
+            job = (lambda: (decode_data_url(data), 1),)
+        elif request.mimetype == 'multipart/form-data':
+            upload = (await request.files)['image']
+            buf = np.frombuffer(upload.read(), np.uint8)
+            job = (lambda: (decode_image(buf, reduce), reduce),)
+        else:
+            body = np.frombuffer(await request.get_data(), np.uint8)
+            job = (decode_frame, request.mimetype, body, request.headers, reduce)
+
+        with ticket:
+            result = await run_in(cv_pool, decode_and_predict, session['user'], *job)
+        with metrics.stage('json_encode'):
+            return jsonify(result)
+
+    except service.INFERENCE_TIMEOUTS:
+        return service.overloaded(Rejected(503, 'Inference timed out', admission.service_time))
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        metrics.inc('predict_errors_total')
+        return jsonify({'emotion': 'Neutral'})
+    finally:
+        metrics.add('predict_in_flight', -1)
+
+
+class BlockingWebSocket:
+    """Blocking receive()/send() over the Quart websocket, for StreamSession's threads."""
+
+    def __init__(self, ws, loop):
+        self.ws = ws
+        self.loop = loop
+        self._pending = set()
+        self._closed = False
+
+    def _call(self, coro):
+        if self._closed:
+            coro.close()
+            raise ConnectionError('WebSocket closed')
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        self._pending.add(future)
+        try:
+            return future.result()
+        finally:
+            self._pending.discard(future)
+
+    def receive(self):
+        return self._call(self.ws.receive())
+
+    def send(self, data):
+        self._call(self.ws.send(data))
+
+    def close(self):
+        # Unblocks the session's threads once the client is gone
+        self._closed = True
+        for future in list(self._pending):
+            future.cancel()
+
+
+@app.websocket('/stream')
+# quart_cors would refuse the dashboard's own origin; like flask-sock, rely on the session check
+@cors_exempt
+async def stream():
+    # Long-lived socket: session and cookies are checked once, not per frame
+    if 'user' not in session:
+        await websocket.close(1008, 'Unauthorized')
+        return
+    loop = asyncio.get_running_loop()
+    ws = BlockingWebSocket(websocket._get_current_object(), loop)
+    stream_session = service.stream_session(ws)
+    # A thread per connection like flask-sock, so a long session never holds a pool worker
+    done = loop.create_future()
+
+    def run():
+        try:
+            stream_session.run()
+        finally:
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+
+    threading.Thread(target=run, name='stream-session', daemon=True).start()
+    try:
+        await done
+    finally:
+        ws.close()
+        stream_session.slot.close()
+
+
+@app.route('/inference-stats')
+async def inference_stats():
+    return jsonify(service.inference_stats(admission))
+
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics disabled (set METRICS_ENABLED=1)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/recommend', methods=['GET', 'POST'])
+async def recommend():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    if request.method == 'GET':
+        emotions = request.args.getlist('emotion')
+    else:
+        try:
+            emotions = service.posted_emotions(await request.get_json())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    if not emotions:
+        return jsonify({'error': 'No emotions provided'}), 400
+
+    return service.recommendation(emotions, request)
+
+
+
+# --- Static Files ---
+async def serve_static(filename):
+    if filename.startswith('songs/'):
+        name = filename[len('songs/'):]
+        path = service.audio_path(name)
+        if path is None:
+            abort(404)
+        offloaded = service.audio_offload(path, name)
+        if offloaded is not None:
+            return offloaded
+        response = await send_file(path, conditional=True, cache_timeout=service.AUDIO_MAX_AGE)
+        response.cache_control.public = True
+        return response
+    return service.asset_response(filename, request) or await app.send_static_file(filename)
+
+# Keeps url_for('static', ...) in the templates working
+app.view_functions['static'] = serve_static
+
+
+if __name__ == '__main__':
+    app.run(debug=True, port=5000)
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.errors import DuplicateKeyError
+
+
+class UsernameTaken(Exception):
+    pass
+
+
+def connect(uri, max_pool_size=50, timeout_ms=5000):
+    """MongoClient for ``uri``; ``mongomock://`` gives an in-process stand-in for tests and load tests."""
+    if uri and uri.startswith('mongomock://'):
+        import mongomock
+        return mongomock.MongoClient()
+    from pymongo import MongoClient
+    return MongoClient(uri, serverSelectionTimeoutMS=timeout_ms, maxPoolSize=max_pool_size)
+
+
+class FailedLoginCache:
+    """Short-lived memory of (username, password) pairs that just failed to log in.
+
+    A retry of the same wrong credentials within ``ttl`` seconds is rejected
+    without a database round trip or a bcrypt check. Keys are salted SHA-256
+    digests, so no password is kept in memory. At most ``max_entries`` pairs
+    are remembered; the oldest go first.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=10000):
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self._salt = os.urandom(16)
+        self._entries = OrderedDict()  # key -> (username, expiry)
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _key(self, username, password):
+        return hashlib.sha256(self._salt + f'{username}\0{password}'.encode('utf-8')).digest()
+
+    def contains(self, username, password):
+        if self.ttl <= 0:
+            return False
+        key = self._key(username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, username, password):
+        if self.ttl <= 0:
+            return
+        key = self._key(username, password)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (username, time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget_user(self, username):
+        """Drop cached failures for a user whose credentials just changed (e.g. registered)."""
+        with self._lock:
+            for key in [k for k, (name, _) in self._entries.items() if name == username]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class UserStore:
+    """Login and registration over a users collection with a unique username index.
+
+    bcrypt runs on a bounded ``hash_workers`` pool so concurrent logins cannot
+    oversubscribe the CPU. Registration is a single insert that relies on the
+    unique index instead of a find-then-insert. Until ``ensure_indexes``
+    has succeeded, registration falls back to a find-then-insert under a lock
+    (and retries the index first), so a missing index cannot let duplicate
+    usernames in through this process. ``hasher`` provides
+    ``generate_password_hash`` / ``check_password_hash`` (a flask_bcrypt.Bcrypt).
+
+    The ``*_async`` methods do the same over a motor collection for the ASGI
+    server; bcrypt still runs on the hash pool.
+    """
+
+    def __init__(self, collection, hasher, hash_workers=4, failure_ttl=30.0):
+        self.collection = collection
+        self.hasher = hasher
+        self.hash_pool = ThreadPoolExecutor(max(1, int(hash_workers)), thread_name_prefix='bcrypt')
+        self.failures = FailedLoginCache(ttl=failure_ttl)
+        self.logins = 0
+        self.failed_logins = 0
+        self.has_unique_index = False
+        self._register_lock = threading.Lock()
+        self._async_register_lock = asyncio.Lock()
+
+    def ensure_indexes(self):
+        self.collection.create_index('username', unique=True)
+        self.has_unique_index = True
+
+    async def ensure_indexes_async(self):
+        await self.collection.create_index('username', unique=True)
+        self.has_unique_index = True
+
+    def _retry_index(self):
+        try:
+            self.ensure_indexes()
+        except Exception as e:
+            print(f"WARNING: Unique username index still missing, checking names before insert: {e}")
+        return self.has_unique_index
+
+    async def _retry_index_async(self):
+        try:
+            await self.ensure_indexes_async()
+        except Exception as e:
+            print(f"WARNING: Unique username index still missing, checking names before insert: {e}")
+        return self.has_unique_index
+
+    def _known_failure(self, username, password):
+        if not username or password is None:
+            return True
+        if self.failures.contains(username, password):
+            self.failed_logins += 1
+            return True
+        return False
+
+    def _record(self, username, password, ok):
+        if ok:
+            self.logins += 1
+        else:
+            self.failed_logins += 1
+            self.failures.add(username, password)
+        return ok
+
+    def authenticate(self, username, password):
+        if self._known_failure(username, password):
+            return False
+        user = self.collection.find_one({'username': username}, {'password': 1, '_id': 0})
+        ok = bool(user) and self.hash_pool.submit(self.hasher.check_password_hash, user['password'],
+                                                  password).result()
+        return self._record(username, password, ok)
+
+    async def authenticate_async(self, username, password):
+        if self._known_failure(username, password):
+            return False
+        user = await self.collection.find_one({'username': username}, {'password': 1, '_id': 0})
+        ok = bool(user) and await asyncio.wrap_future(
+            self.hash_pool.submit(self.hasher.check_password_hash, user['password'], password))
+        return self._record(username, password, ok)
+
+    def create_user(self, username, password):
+        """Insert a new user; raises UsernameTaken if the name exists."""
+        hashed = self.hash_pool.submit(self.hasher.generate_password_hash, password).result()
+        document = {'username': username, 'password': hashed.decode('utf-8')}
+        try:
+            if self.has_unique_index or self._retry_index():
+                self.collection.insert_one(document)
+            else:
+                with self._register_lock:
+                    if self.collection.find_one({'username': username}, {'_id': 1}):
+                        raise UsernameTaken(username)
+                    self.collection.insert_one(document)
+        except DuplicateKeyError:
+            raise UsernameTaken(username)
+        self.failures.forget_user(username)
+
+    async def create_user_async(self, username, password):
+        hashed = await asyncio.wrap_future(self.hash_pool.submit(self.hasher.generate_password_hash, password))
+        document = {'username': username, 'password': hashed.decode('utf-8')}
+        try:
+            if self.has_unique_index or await self._retry_index_async():
+                await self.collection.insert_one(document)
+            else:
+                async with self._async_register_lock:
+                    if await self.collection.find_one({'username': username}, {'_id': 1}):
+                        raise UsernameTaken(username)
+                    await self.collection.insert_one(document)
+        except DuplicateKeyError:
+            raise UsernameTaken(username)
+        self.failures.forget_user(username)
+
+    def stats(self):
+        return {
+            'logins': self.logins,
+            'failed_logins': self.failed_logins,
+            'failure_cache_hits': self.failures.hits,
+            'failure_cache_size': len(self.failures),
+        }
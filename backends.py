@@ -0,0 +1,146 @@
+import os
+import threading
+
+import numpy as np
+
+# Nothing in this module imports TensorFlow at load time: the heavy runtimes are only
+# imported inside the backend that needs them.
+
+INPUT_SHAPE = (48, 48, 1)
+NUM_CLASSES = 7
+
+
+def load_model(weights_path='model.h5'):
+    """Build the emotion CNN in Keras and load its trained weights."""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Dropout, Flatten, Conv2D, MaxPooling2D
+
+    model = Sequential()
+    model.add(Conv2D(32, kernel_size=(3, 3), activation='relu', input_shape=INPUT_SHAPE))
+    model.add(Conv2D(64, kernel_size=(3, 3), activation='relu'))
+    model.add(MaxPooling2D(pool_size=(2, 2)))
+    model.add(Conv2D(128, kernel_size=(3, 3), activation='relu'))
+    model.add(MaxPooling2D(pool_size=(2, 2)))
+    model.add(Conv2D(128, kernel_size=(3, 3), activation='relu'))
+    model.add(MaxPooling2D(pool_size=(2, 2)))
+    model.add(Dropout(0.25))
+    model.add(Flatten())
+    model.add(Dense(1024, activation='relu'))
+    model.add(Dropout(0.5))
+    model.add(Dense(NUM_CLASSES, activation='softmax'))
+    if weights_path:
+        model.load_weights(weights_path)
+    return model
+
+
+class KerasBackend:
+    """The original TensorFlow/Keras model."""
+
+    name = 'keras'
+    default_path = 'model.h5'
+
+    def __init__(self, path=None, threads=None, max_batch_size=None):
+        if threads:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+        self.model = load_model(path or self.default_path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+class OnnxBackend:
+    """ONNX Runtime on CPU, for models produced by ``convert_model.py --format onnx``."""
+
+    name = 'onnx'
+    default_path = 'model.onnx'
+
+    def __init__(self, path=None, threads=None, max_batch_size=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path or self.default_path, options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class TFLiteBackend:
+    """TensorFlow Lite interpreter (float or int8-quantized), via tflite-runtime when available.
+
+    Tensors are allocated once for ``max_batch_size`` crops: smaller batches are
+    zero-padded and the output sliced, larger ones run in chunks. Micro-batching
+    changes the batch size on nearly every call, and re-allocating each time
+    costs more than the padded rows.
+    """
+
+    name = 'tflite'
+    default_path = 'model.tflite'
+
+    def __init__(self, path=None, threads=None, max_batch_size=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.max_batch_size = max(1, int(max_batch_size or os.getenv('BATCH_MAX_SIZE', 32)))
+        self.interpreter = Interpreter(model_path=path or self.default_path, num_threads=threads)
+        input_index = self.interpreter.get_input_details()[0]['index']
+        self.interpreter.resize_tensor_input(input_index, [self.max_batch_size, *INPUT_SHAPE])
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._padded = np.zeros((self.max_batch_size, *INPUT_SHAPE), dtype=self._input['dtype'])
+        # The interpreter holds per-invocation state and is not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        if not len(batch):
+            return np.zeros((0, NUM_CLASSES), dtype=np.float32)
+        outputs = []
+        with self._lock:
+            for start in range(0, len(batch), self.max_batch_size):
+                chunk = batch[start:start + self.max_batch_size]
+                # Rows past len(chunk) keep stale crops; their outputs are sliced off
+                self._padded[:len(chunk)] = self._quantize(chunk, self._input)
+                self.interpreter.set_tensor(self._input['index'], self._padded)
+                self.interpreter.invoke()
+                values = self.interpreter.get_tensor(self._output['index'])[:len(chunk)]
+                outputs.append(self._dequantize(values, self._output))
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    @staticmethod
+    def _quantize(batch, details):
+        scale, zero_point = details['quantization']
+        if details['dtype'] == np.float32 or not scale:
+            return batch.astype(details['dtype'], copy=False)
+        info = np.iinfo(details['dtype'])
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(details['dtype'])
+
+    @staticmethod
+    def _dequantize(values, details):
+        scale, zero_point = details['quantization']
+        if details['dtype'] == np.float32 or not scale:
+            return values.astype(np.float32, copy=False)
+        return (values.astype(np.float32) - zero_point) * scale
+
+
+BACKENDS = {backend.name: backend for backend in (KerasBackend, OnnxBackend, TFLiteBackend)}
+
+
+def load_backend(name=None, path=None, threads=None, max_batch_size=None):
+    """Instantiate the inference backend chosen by name (default: $INFERENCE_BACKEND or keras).
+
+    ``max_batch_size`` sizes the TFLite input tensor; Keras and ONNX take any batch.
+    """
+    name = (name or os.getenv('INFERENCE_BACKEND', 'keras')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](path=path, threads=threads, max_batch_size=max_batch_size)
@@ -0,0 +1,283 @@
+"""Offline emotion labeling for folders of images and recorded video files.
+
+    python batch_label.py recordings/ --output labels.csv
+    python batch_label.py session1.mp4 session2.mp4 --stride 5 --output labels.parquet
+    python batch_label.py photos/ --backend onnx --model-path model.onnx --batch-size 512
+
+Frames flow through a streaming pipeline: segments of frames are decoded on a
+thread pool, faces are detected on a process pool (the Haar cascade holds the
+GIL for part of its work), crops from many segments are classified in one
+large forward pass and rows are appended to the output as soon as they are
+ready. Writes one row per frame: face count, frame-level emotion, mean
+probabilities and face boxes.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from backends import load_backend
+from pipeline import EMOTIONS, FACE_SIZE, detect_faces, prepare_crops, aggregate
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+CASCADE_PATH = 'haarcascade_frontalface_default.xml'
+COLUMNS = ['source', 'frame', 'timestamp_s', 'face_count', 'emotion'] + [f'p_{e}' for e in EMOTIONS] + ['boxes']
+
+
+# --- Decode (thread pool) ---
+
+def list_inputs(paths):
+    """Expand directories (recursively) into sorted image and video files."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def plan_segments(paths, segment_size, stride):
+    """Split the inputs into decode jobs of at most ``segment_size`` frames."""
+    images = []
+    for path in list_inputs(paths):
+        if not path.lower().endswith(VIDEO_EXTENSIONS):
+            images.append(path)
+            if len(images) == segment_size:
+                yield ('images', images)
+                images = []
+            continue
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        cap.release()
+        if total <= 0:
+            # Unknown length (some containers): decode the whole file as one job
+            yield ('video', (path, 0, None, stride, fps))
+            continue
+        span = segment_size * stride
+        for start in range(0, total, span):
+            yield ('video', (path, start, min(start + span, total), stride, fps))
+    if images:
+        yield ('images', images)
+
+
+def decode_segment(job):
+    """Decode one job to [(source, frame index, timestamp, gray), ...]."""
+    kind, spec = job
+    frames = []
+    if kind == 'images':
+        for path in spec:
+            gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                print(f"WARNING: could not decode {path}")
+                continue
+            frames.append((path, 0, 0.0, gray))
+        return frames
+
+    path, start, end, stride, fps = spec
+    cap = cv2.VideoCapture(path)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    index = start
+    while end is None or index < end:
+        if not cap.grab():
+            break
+        if index % stride == 0:
+            ok, frame = cap.retrieve()
+            if ok:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                frames.append((path, index, index / fps if fps else 0.0, gray))
+        index += 1
+    cap.release()
+    return frames
+
+
+# --- Detect (process pool) ---
+
+_cascade = None
+
+
+def init_detector(cascade_path):
+    global _cascade
+    cv2.setNumThreads(1)  # one detector per core already saturates the machine
+    _cascade = cv2.CascadeClassifier(cascade_path)
+    if _cascade.empty():
+        raise RuntimeError(f"Could not load Haar cascade from {cascade_path}")
+
+
+def detect_segment(frames):
+    """Replace each decoded frame by its face boxes and (N, 48, 48, 1) crops."""
+    results = []
+    for source, index, timestamp, gray in frames:
+        faces = detect_faces(_cascade, gray)
+        faces = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+        crops = prepare_crops(gray, faces) if len(faces) else np.zeros((0, FACE_SIZE, FACE_SIZE, 1), np.float32)
+        results.append((source, index, timestamp, faces, crops))
+    return results
+
+
+# --- Pipeline ---
+
+def prefetch(executor, fn, items, depth):
+    """Like executor.map, but keeps at most ``depth`` tasks in flight and consumes ``items`` lazily."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def classify(segments, predict_fn, batch_size, max_frames=1024):
+    """Group detected frames until ``batch_size`` crops are queued, run one predict, yield rows in order.
+
+    Also flushes once ``max_frames`` frames are waiting, so face-sparse video
+    keeps producing rows (and holding little memory) between full batches.
+    """
+    queued = []
+    crops = 0
+    for frames in segments:
+        queued.extend(frames)
+        crops += sum(len(f[4]) for f in frames)
+        if crops >= batch_size or len(queued) >= max_frames:
+            yield from _label(queued, predict_fn)
+            queued, crops = [], 0
+    if queued:
+        yield from _label(queued, predict_fn)
+
+
+def _label(frames, predict_fn):
+    batch = np.concatenate([f[4] for f in frames], axis=0)
+    probabilities = np.asarray(predict_fn(batch)) if len(batch) else np.zeros((0, len(EMOTIONS)))
+    offset = 0
+    for source, index, timestamp, faces, crops in frames:
+        probs = probabilities[offset:offset + len(crops)]
+        offset += len(crops)
+        summary = aggregate(probs)
+        row = {'source': source, 'frame': index, 'timestamp_s': round(timestamp, 3),
+               'face_count': summary['face_count'], 'emotion': summary['emotion'],
+               'boxes': json.dumps(faces.tolist())}
+        for emotion in EMOTIONS:
+            row[f'p_{emotion}'] = summary['probabilities'].get(emotion)
+        yield row
+
+
+# --- Output ---
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Appends one row group per write(); needs pyarrow."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        fields = [('source', pa.string()), ('frame', pa.int64()), ('timestamp_s', pa.float64()),
+                  ('face_count', pa.int64()), ('emotion', pa.string())]
+        fields += [(f'p_{e}', pa.float64()) for e in EMOTIONS] + [('boxes', pa.string())]
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = {name: [row[name] for row in rows] for name in COLUMNS}
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path, fmt=None):
+    fmt = fmt or ('parquet' if path.lower().endswith('.parquet') else 'csv')
+    return ParquetWriter(path) if fmt == 'parquet' else CsvWriter(path)
+
+
+def main():
+    cpus = os.cpu_count() or 4
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="Image/video files or directories")
+    parser.add_argument('--output', default='labels.csv', help=".csv or .parquet")
+    parser.add_argument('--format', choices=['csv', 'parquet'])
+    parser.add_argument('--backend', default=os.getenv('INFERENCE_BACKEND', 'keras'))
+    parser.add_argument('--model-path', default=os.getenv('MODEL_PATH') or None)
+    parser.add_argument('--stride', type=int, default=1, help="Label every Nth video frame")
+    parser.add_argument('--batch-size', type=int, default=256, help="Face crops per forward pass")
+    parser.add_argument('--segment-size', type=int, default=32, help="Frames per decode/detect task")
+    parser.add_argument('--max-queued-frames', type=int, default=1024,
+                        help="Classify early once this many frames wait for a full batch")
+    parser.add_argument('--decode-threads', type=int, default=cpus)
+    parser.add_argument('--detect-workers', type=int, default=cpus)
+    parser.add_argument('--inference-threads', type=int, default=None)
+    parser.add_argument('--cascade', default=CASCADE_PATH)
+    parser.add_argument('--progress-seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = load_backend(args.backend, args.model_path, threads=args.inference_threads)
+    writer = open_writer(args.output, args.format)
+    print(f"Labeling with {model.name} backend: {args.decode_threads} decode threads, "
+          f"{args.detect_workers} detect processes, batches of {args.batch_size} crops")
+
+    frames = faces = 0
+    start = last_report = time.perf_counter()
+    rows = []
+    try:
+        with ThreadPoolExecutor(args.decode_threads, thread_name_prefix='decode') as decode_pool, \
+                ProcessPoolExecutor(args.detect_workers, initializer=init_detector,
+                                    initargs=(args.cascade,)) as detect_pool:
+            jobs = plan_segments(args.inputs, args.segment_size, max(1, args.stride))
+            decoded = prefetch(decode_pool, decode_segment, jobs, 2 * args.decode_threads)
+            detected = prefetch(detect_pool, detect_segment, decoded, 2 * args.detect_workers)
+
+            for row in classify(detected, model.predict, args.batch_size, args.max_queued_frames):
+                rows.append(row)
+                frames += 1
+                faces += row['face_count']
+                if len(rows) >= args.batch_size:
+                    writer.write(rows)
+                    rows = []
+                now = time.perf_counter()
+                if now - last_report >= args.progress_seconds:
+                    if rows:
+                        writer.write(rows)
+                        rows = []
+                    print(f"{frames} frames, {faces} faces, {frames / (now - start):.1f} frames/s")
+                    last_report = now
+    finally:
+        # A complete CSV / valid Parquet file with every labeled row, even on error
+        try:
+            if rows:
+                writer.write(rows)
+        finally:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {frames} frames, {faces} faces in {elapsed:.1f}s "
+          f"({frames / elapsed if elapsed else 0:.1f} frames/s) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+class BatchingPredictor:
+    """Coalesces face crops from concurrent requests into batched forward passes.
+
+    Callers ``submit()`` a ``(N, 48, 48, 1)`` array and get back a Future that
+    resolves to the ``(N, 7)`` probability array. A single worker thread waits
+    up to ``max_delay_ms`` after the first pending crop (or until
+    ``max_batch_size`` crops are queued), runs one ``predict_fn`` call on the
+    stacked batch and hands each caller its slice of the output.
+
+    Crops are copied on submit, so callers may reuse their buffers at once.
+    A request whose caller timed out (or cancelled its Future) is dropped
+    from the queue instead of being run. The worker thread starts on the
+    first submit, so a predictor created before a fork (``gunicorn
+    --preload``) gets its thread in the process that uses it.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_delay_ms=5.0, latency_window=2048):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+
+        self._pending = deque()
+        self._pending_crops = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._crops = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._cancelled = 0
+
+        self._worker = None
+
+    def submit(self, crops):
+        """Queue crops for the next batch and return a Future of their probabilities."""
+        # Own the data: callers pass views into reusable preprocessing buffers
+        crops = np.array(crops, copy=True)
+        if crops.ndim == 3:
+            crops = crops[np.newaxis]
+        future = Future()
+        if len(crops) == 0:
+            future.set_result(np.zeros((0, 7), dtype=np.float32))
+            return future
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('BatchingPredictor is closed')
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='batching-predictor', daemon=True)
+                self._worker.start()
+            self._pending.append((crops, future, time.perf_counter()))
+            self._pending_crops += len(crops)
+            self._cond.notify()
+        return future
+
+    def predict(self, crops, timeout=None):
+        """Blocking convenience wrapper around ``submit()``; a timed-out request is cancelled."""
+        future = self.submit(crops)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def queue_depth(self):
+        with self._cond:
+            return self._pending_crops
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join()
+
+    def stats(self):
+        """Return achieved batch sizes and end-to-end latency percentiles."""
+        with self._stats_lock:
+            latencies = np.array(self._latencies, dtype=np.float64)
+            sizes = dict(sorted(self._batch_sizes.items()))
+            batches = self._batches
+            crops = self._crops
+            cancelled = self._cancelled
+
+        stats = {
+            'max_batch_size': self.max_batch_size,
+            'max_delay_ms': self.max_delay * 1000.0,
+            'batches': batches,
+            'crops': crops,
+            'mean_batch_size': (crops / batches) if batches else 0.0,
+            'batch_size_histogram': sizes,
+            'cancelled': cancelled,
+            'queue_depth': self.queue_depth(),
+        }
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000.0
+            stats.update({'latency_p50_ms': p50, 'latency_p90_ms': p90, 'latency_p99_ms': p99})
+        return stats
+
+    def _take_batch(self):
+        """Wait for work, then collect requests until the batch is full or the window closes."""
+        with self._cond:
+            while True:
+                self._drop_cancelled()
+                if self._pending or self._closed:
+                    break
+                self._cond.wait()
+            if not self._pending:
+                return []
+
+            deadline = self._pending[0][2] + self.max_delay
+            while self._pending_crops < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            self._drop_cancelled()
+            batch = []
+            size = 0
+            while self._pending:
+                crops, future, _ = self._pending[0]
+                if future.cancelled():
+                    self._pending.popleft()
+                    self._pending_crops -= len(crops)
+                    self._count_cancelled(1)
+                    continue
+                # Always take at least one request, even if it alone exceeds the limit
+                if batch and size + len(crops) > self.max_batch_size:
+                    break
+                batch.append(self._pending.popleft())
+                size += len(crops)
+            self._pending_crops -= size
+            return batch
+
+    def _drop_cancelled(self):
+        """Pop abandoned requests off the head of the queue (caller holds ``_cond``)."""
+        dropped = 0
+        while self._pending and self._pending[0][1].cancelled():
+            crops = self._pending.popleft()[0]
+            self._pending_crops -= len(crops)
+            dropped += 1
+        self._count_cancelled(dropped)
+
+    def _count_cancelled(self, n):
+        if n:
+            with self._stats_lock:
+                self._cancelled += n
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+
+            # Drop requests whose callers gave up while the batch was forming
+            running = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            self._count_cancelled(len(batch) - len(running))
+            batch = running
+            if not batch:
+                continue
+
+            stacked = np.concatenate([crops for crops, _, _ in batch], axis=0)
+            try:
+                probabilities = np.asarray(self.predict_fn(stacked))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            offset = 0
+            for crops, future, enqueued in batch:
+                future.set_result(probabilities[offset:offset + len(crops)])
+                offset += len(crops)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._crops += len(stacked)
+                self._batch_sizes[len(stacked)] += 1
+                self._latencies.extend(now - enqueued for _, _, enqueued in batch)
@@ -0,0 +1,132 @@
+"""Concurrent-request throughput of the sync Flask server vs the async ASGI server.
+
+Starts each server as a subprocess, logs in a benchmark user (MONGO_URI must
+point at a reachable database) and then drives --concurrency keep-alive client
+threads against /login and /predict for --duration seconds.
+
+    python -m benchmarks.bench_async --concurrency 64 --duration 15
+"""
+import argparse
+import http.client
+import json
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_upload import synthetic_frame
+
+SERVERS = {
+    'sync': 'gunicorn -w 1 --threads 16 -b 127.0.0.1:{port} app:app',
+    'async': 'hypercorn -w 1 -b 127.0.0.1:{port} asgi_app:app',
+}
+USER = {'username': 'bench_user', 'password': 'bench-password'}
+
+
+def wait_for(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/check-auth')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def post(conn, path, body, content_type, cookie=None):
+    headers = {'Content-Type': content_type}
+    if cookie:
+        headers['Cookie'] = cookie
+    start = time.perf_counter()
+    conn.request('POST', path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response, time.perf_counter() - start
+
+
+def session_cookie(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    body = json.dumps({**USER, 'confirm_password': USER['password']})
+    post(conn, '/register', body, 'application/json')
+    response, _ = post(conn, '/login', json.dumps(USER), 'application/json')
+    if response.status != 200:
+        raise RuntimeError(f"Login failed with HTTP {response.status}; is MONGO_URI reachable?")
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def drive(port, endpoint, concurrency, duration, cookie, jpeg):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            try:
+                if endpoint == 'login':
+                    response, elapsed = post(conn, '/login', json.dumps(USER), 'application/json')
+                else:
+                    response, elapsed = post(conn, '/predict', jpeg, 'image/jpeg', cookie)
+                if response.status == 200:
+                    mine.append(elapsed)
+                else:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies = np.array(latencies) * 1000.0
+    p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (float('nan'), float('nan'))
+    return {'rps': len(latencies) / duration, 'p50_ms': p50, 'p99_ms': p99, 'errors': sum(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--endpoints', default='login,predict')
+    parser.add_argument('--sync-cmd', default=SERVERS['sync'])
+    parser.add_argument('--async-cmd', default=SERVERS['async'])
+    args = parser.parse_args()
+
+    jpeg = cv2.imencode('.jpg', synthetic_frame(640, 480))[1].tobytes()
+    # Every client shares the benchmark user's session; keep the per-user limiter out of the numbers
+    env = dict(os.environ)
+    env.setdefault('USER_RATE_LIMIT', '0')
+    print(f"{args.concurrency} concurrent clients, {args.duration:.0f}s per run\n")
+    print(f"{'server':<7} {'endpoint':<9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for port, (name, cmd) in enumerate((('sync', args.sync_cmd), ('async', args.async_cmd)), start=5101):
+        server = subprocess.Popen(shlex.split(cmd.format(port=port)), stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL, env=env)
+        try:
+            wait_for(port)
+            cookie = session_cookie(port)
+            for endpoint in args.endpoints.split(','):
+                r = drive(port, endpoint, args.concurrency, args.duration, cookie, jpeg)
+                print(f"{name:<7} {endpoint:<9} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Startup time, per-process RSS, throughput and accuracy parity for each inference backend.
+
+Each backend is loaded in a fresh subprocess so import cost and memory are measured
+the way a gunicorn worker would see them. Outputs are compared against the Keras
+model on the same fixed set of 48x48 crops.
+
+    python convert_model.py --format onnx && python convert_model.py --format tflite --int8
+    python -m benchmarks.bench_backends keras onnx:model.onnx tflite:model.int8.tflite
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def fixed_crops(count=256, crops_dir=None):
+    """Deterministic parity set: real face crops if given, else seeded synthetic crops."""
+    import cv2
+
+    if crops_dir:
+        paths = sorted(glob.glob(os.path.join(crops_dir, '*')))[:count]
+        crops = [cv2.resize(cv2.imread(p, cv2.IMREAD_GRAYSCALE), (48, 48)) for p in paths]
+        return np.stack(crops).astype(np.float32)[..., np.newaxis]
+    rng = np.random.default_rng(1234)
+    noise = rng.normal(0, 40, (count, 48, 48))
+    smooth = np.stack([cv2.GaussianBlur(n, (0, 0), 3) for n in noise])
+    return np.clip(128 + smooth * 3, 0, 255).astype(np.float32)[..., np.newaxis]
+
+
+def child(spec, crops_path, output_path):
+    start = time.perf_counter()
+    from backends import load_backend
+
+    name, _, path = spec.partition(':')
+    backend = load_backend(name, path or None)
+    load_s = time.perf_counter() - start
+
+    crops = np.load(crops_path)
+    backend.predict(crops[:1])  # first-call warm-up
+    first_call_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(crops), 32):
+        backend.predict(crops[i:i + 32])
+    batched_s = time.perf_counter() - start
+
+    probabilities = np.concatenate([backend.predict(crops[i:i + 32]) for i in range(0, len(crops), 32)])
+    np.save(output_path, probabilities)
+    print(json.dumps({
+        'backend': spec,
+        'load_s': load_s,
+        'ready_s': first_call_s,
+        'rss_mb': rss_mb(),
+        'crops_per_s': len(crops) / batched_s,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('backends', nargs='*', default=['keras', 'onnx', 'tflite'],
+                        help="backend[:model_path] specs; the first one is the parity reference")
+    parser.add_argument('--crops-dir', help="Folder of face images for the parity set")
+    parser.add_argument('--count', type=int, default=256)
+    parser.add_argument('--child', nargs=3, metavar=('SPEC', 'CROPS', 'OUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_backends_')
+    crops_path = os.path.join(workdir, 'crops.npy')
+    np.save(crops_path, fixed_crops(args.count, args.crops_dir))
+
+    results = []
+    for i, spec in enumerate(args.backends):
+        out = os.path.join(workdir, f'{i}.npy')
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-m', 'benchmarks.bench_backends', '--child', spec, crops_path, out],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{spec}: failed\n{proc.stderr.strip().splitlines()[-1] if proc.stderr else ''}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['process_s'] = time.perf_counter() - start
+        result['outputs'] = np.load(out)
+        results.append(result)
+
+    if not results:
+        return
+    reference = results[0]['outputs']
+    print(f"\nParity reference: {results[0]['backend']} on {len(reference)} crops\n")
+    print(f"{'backend':<28} {'startup s':>9} {'ready s':>8} {'RSS MB':>8} {'crops/s':>9} {'top-1 agree':>11} {'max |dp|':>9}")
+    for r in results:
+        agree = np.mean(np.argmax(r['outputs'], axis=1) == np.argmax(reference, axis=1))
+        diff = np.max(np.abs(r['outputs'] - reference))
+        print(f"{r['backend']:<28} {r['process_s']:>9.2f} {r['ready_s']:>8.2f} {r['rss_mb']:>8.0f} "
+              f"{r['crops_per_s']:>9.0f} {agree:>11.1%} {diff:>9.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Per-camera FPS and latency: one synchronous loop over all cameras vs CapturePipeline.
+
+Writes --cameras synthetic video files (moving drawn faces, --fps frames per
+second) and plays each back in real time, as a camera would deliver it.
+
+- sync: the old scanner loop generalised to N cameras: read, detect and
+  classify one frame at a time, camera after camera
+- pipeline: capture.CapturePipeline, with a grab thread per camera keeping the
+  newest frame and one inference worker batching faces across cameras
+
+Latency runs from when a frame was due from the camera to when its result is
+ready. A loop that falls behind the cameras processes ever older frames. The
+pipeline instead drops frames and keeps latency at about one inference pass.
+--predict-ms adds a fixed cost per forward pass to stand in for a slower
+model or device.
+
+    python -m benchmarks.bench_capture --cameras 4 --seconds 10
+    python -m benchmarks.bench_capture --backend onnx --model model.onnx --predict-ms 20
+    python -m benchmarks.bench_capture --backend none --predict-ms 20   # no model needed
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.suite import MODEL_CHOICES, load_suite_model, summarize, synthetic_face_frame
+from capture import CameraSource, CapturePipeline, print_stats
+from pipeline import Preprocessor, detect_faces
+
+
+def write_video(path, width, height, fps, seconds, faces, seed):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write {path} (OpenCV built without MJPG support?)")
+    base = synthetic_face_frame(width, height, faces, seed)
+    for i in range(int(fps * seconds)):
+        # Drift a few pixels so consecutive frames differ
+        writer.write(np.roll(base, (i % 16) - 8, axis=1))
+    writer.release()
+
+
+def run_sync(paths, predict_fn, cascade):
+    """Round-robin over the files; frame i of a camera is due (and readable) at start + i / fps."""
+    captures = [cv2.VideoCapture(path) for path in paths]
+    fps = [c.get(cv2.CAP_PROP_FPS) or 30.0 for c in captures]
+    indices = [0] * len(captures)
+    latencies = [[] for _ in captures]
+    preprocess = Preprocessor()
+    start = time.perf_counter()
+    active = set(range(len(captures)))
+    while active:
+        for cam in sorted(active):
+            due = start + indices[cam] / fps[cam]
+            # A camera cannot deliver a frame before it has been captured
+            if due > time.perf_counter():
+                time.sleep(due - time.perf_counter())
+            ok, frame = captures[cam].read()
+            if not ok:
+                active.discard(cam)
+                continue
+            indices[cam] += 1
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = detect_faces(cascade, gray)
+            if len(faces):
+                predict_fn(preprocess(gray, faces))
+            latencies[cam].append(time.perf_counter() - due)
+    elapsed = time.perf_counter() - start
+    for c in captures:
+        c.release()
+    return [(len(lat) / elapsed, summarize(lat)) for lat in latencies], elapsed
+
+
+def run_pipeline(paths, predict_fn, cascade):
+    sources = [CameraSource(path, name=f'cam{i}') for i, path in enumerate(paths)]
+    latencies = {source.name: [] for source in sources}
+    pipeline = CapturePipeline(sources, predict_fn, face_cascade=cascade,
+                               on_result=lambda r: latencies[r.camera].append(r.latency))
+    start = time.perf_counter()
+    with pipeline:
+        pipeline.wait()
+    elapsed = time.perf_counter() - start
+    stats = pipeline.stats()
+    return [(len(latencies[s.name]) / elapsed, summarize(latencies[s.name])) for s in sources], elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cameras', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=8.0, help="video length")
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--resolution', default='640x480')
+    parser.add_argument('--faces', type=int, default=1, help="faces per frame")
+    parser.add_argument('--backend', default='keras', choices=MODEL_CHOICES,
+                        help="'none' returns uniform probabilities without a model")
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--predict-ms', type=float, default=0.0, help="extra fixed cost per forward pass")
+    args = parser.parse_args()
+
+    predict, description = load_suite_model(args.backend, args.model)
+    if args.predict_ms:
+        def predict_fn(batch):
+            time.sleep(args.predict_ms / 1000.0)
+            return predict(batch)
+    else:
+        predict_fn = predict
+    cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+    width, height = (int(v) for v in args.resolution.split('x'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.cameras):
+            path = os.path.join(tmp, f'cam{i}.avi')
+            write_video(path, width, height, args.fps, args.seconds, args.faces, seed=i)
+            paths.append(path)
+        predict_fn(np.zeros((1, 48, 48, 1), np.float32))  # warm-up
+
+        print(f"{args.cameras} cameras x {args.resolution} @ {args.fps:.0f} fps, {args.faces} face(s), "
+              f"{description}, +{args.predict_ms:.0f} ms/pass\n")
+        print(f"{'mode':<9} {'camera':<7} {'proc fps':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+        sync, _ = run_sync(paths, predict_fn, cascade)
+        piped, _, stats = run_pipeline(paths, predict_fn, cascade)
+        for mode, results in (('sync', sync), ('pipeline', piped)):
+            for cam, (fps, lat) in enumerate(results):
+                print(f"{mode:<9} {f'cam{cam}':<7} {fps:>9.1f} {lat.get('p50_ms', 0):>8.1f} "
+                      f"{lat.get('p90_ms', 0):>8.1f} {lat.get('p99_ms', 0):>8.1f}")
+        print()
+        print_stats(stats)
+
+
+if __name__ == '__main__':
+    main()
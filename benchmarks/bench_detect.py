@@ -0,0 +1,95 @@
+"""Detection time and recall: full-resolution Haar vs AdaptiveDetector at several target widths.
+
+Frames are synthetic_frame() backgrounds with one or two drawn faces of random
+size (20-45% of the frame height) and position, so every face has a known
+ground-truth box. A face counts as found when a detection overlaps it with
+IoU >= 0.4; unmatched detections are reported as false positives.
+
+    python -m benchmarks.bench_detect --frames 100 --resolutions 640x480,1280x720,1920x1080
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_upload import synthetic_frame
+from benchmarks.suite import draw_face
+from pipeline import AdaptiveDetector, detect_faces
+
+
+def labeled_frames(width, height, count, seed=0):
+    """Yield (gray frame, ground-truth boxes) with 1-2 non-overlapping faces each."""
+    rng = np.random.default_rng(seed)
+    background = cv2.cvtColor(synthetic_frame(width, height, seed), cv2.COLOR_BGR2GRAY)
+    for _ in range(count):
+        gray = background.copy()
+        boxes = []
+        for _ in range(rng.integers(1, 3)):
+            size = int(height * rng.uniform(0.2, 0.45))
+            for _attempt in range(20):
+                x, y = int(rng.integers(0, width - size)), int(rng.integers(0, height - size))
+                if all(iou((x, y, size, size), b) == 0 for b in boxes):
+                    gray[y:y + size, x:x + size] = draw_face(size)
+                    boxes.append((x, y, size, size))
+                    break
+        yield gray, boxes
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = w * h
+    return inter / float(aw * ah + bw * bh - inter) if inter else 0.0
+
+
+def evaluate(detect, frames):
+    found = total = false_positives = 0
+    elapsed = 0.0
+    for gray, truth in frames:
+        start = time.perf_counter()
+        faces = detect(gray)
+        elapsed += time.perf_counter() - start
+        faces = [tuple(int(v) for v in f) for f in faces]
+        matched = set()
+        for box in truth:
+            hits = [i for i, f in enumerate(faces) if i not in matched and iou(box, f) >= 0.4]
+            if hits:
+                matched.add(hits[0])
+                found += 1
+        total += len(truth)
+        false_positives += len(faces) - len(matched)
+    return elapsed / len(frames) * 1000.0, found / max(total, 1), false_positives / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--resolutions', default='640x480,1280x720,1920x1080')
+    parser.add_argument('--targets', default='160,240,320,480', help="AdaptiveDetector target widths")
+    parser.add_argument('--frames', type=int, default=60)
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+    targets = [int(t) for t in args.targets.split(',')]
+    print(f"{args.frames} frames per case\n")
+    print(f"{'resolution':<11} {'mode':<15} {'detect ms':>10} {'speedup':>8} {'recall':>7} {'FP/frame':>9}")
+    for resolution in args.resolutions.split(','):
+        width, height = (int(v) for v in resolution.split('x'))
+        frames = list(labeled_frames(width, height, args.frames))
+        base_ms, recall, fp = evaluate(lambda g: detect_faces(cascade, g), frames)
+        print(f"{resolution:<11} {'full':<15} {base_ms:>10.2f} {'1.0x':>8} {recall:>7.1%} {fp:>9.2f}")
+        for target in targets:
+            if target >= width:
+                continue
+            detector = AdaptiveDetector(cascade, target_width=target)
+            ms, recall, fp = evaluate(detector.detect, frames)
+            lo, hi = detector.size_range()
+            label = f'adaptive@{target}'
+            print(f"{resolution:<11} {label:<15} {ms:>10.2f} {base_ms / ms:>7.1f}x {recall:>7.1%} {fp:>9.2f}"
+                  f"   tuned face width {lo:.2f}-{hi:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Cold start and memory of the MUSE sampler: CSV parse vs memory-mapped store.
+
+Each case runs in a fresh interpreter that imports muse, loads the catalog and
+serves one recommendation, so imports (pandas for the CSV path) count too.
+Uses muse_v3.csv when --csv is given, otherwise a synthetic 90k-row catalog.
+
+    python -m benchmarks.bench_muse_store --csv muse_v3.csv --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from muse import MuseSampler
+
+CHILD = r"""
+import json, os, sys, time
+start = time.perf_counter()
+from muse import MuseSampler
+kind, path = sys.argv[1], sys.argv[2]
+sampler = MuseSampler.from_csv(path) if kind == 'csv' else MuseSampler.from_store(path)
+sampler.recommend(['Happy'] * 12 + ['Sad'] * 8)
+elapsed = time.perf_counter() - start
+from benchmarks.load_model_server import memory_mb
+with open(f'/proc/{os.getpid()}/status') as f:
+    rss = next(int(line.split()[1]) / 1024.0 for line in f if line.startswith('VmRSS:'))
+print(json.dumps({'seconds': elapsed, 'rss_mb': rss, 'pss_mb': memory_mb(os.getpid())}))
+"""
+
+
+def run(kind, path):
+    out = subprocess.run([sys.executable, '-c', CHILD, kind, path], check=True, capture_output=True,
+                         text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', help="Path to muse_v3.csv")
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.abspath(args.csv) if args.csv else os.path.join(tmp, 'muse_synthetic.csv')
+        if not args.csv:
+            from benchmarks.bench_sampler import synthetic_catalog
+            synthetic_catalog().to_csv(csv_path, index=False)
+        store_path = os.path.join(tmp, 'muse.store')
+        MuseSampler.from_csv(csv_path).save(store_path)
+
+        csv_mb = os.path.getsize(csv_path) / 1e6
+        store_mb = sum(os.path.getsize(os.path.join(store_path, n)) for n in os.listdir(store_path)) / 1e6
+        print(f"CSV {csv_mb:.1f} MB, store {store_mb:.1f} MB, best of {args.runs} cold starts\n")
+        print(f"{'source':<7} {'startup ms':>11} {'RSS MB':>8} {'PSS MB':>8}")
+        for kind, path in (('csv', csv_path), ('store', store_path)):
+            results = [run(kind, path) for _ in range(args.runs)]
+            seconds = min(r['seconds'] for r in results)
+            rss = np.median([r['rss_mb'] for r in results])
+            pss = np.median([r['pss_mb'] for r in results])
+            print(f"{kind:<7} {seconds * 1000:>11.0f} {rss:>8.1f} {pss:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Face preprocessing time and allocations per frame: legacy per-face path vs prepare_crops vs Preprocessor.
+
+- legacy: what predict() used to do per face (slice, resize, two np.expand_dims,
+  then stacking the crops)
+- prepare_crops: one staging array, cast to float32 per frame
+- Preprocessor: per-thread preallocated buffers reused across frames,
+  optionally with histogram equalization or CLAHE
+
+Allocations are measured with tracemalloc, which numpy reports its array
+buffers to: "blocks" is how many allocations are still held when the batch
+is handed to inference, and "peak KiB" the most memory allocated at once
+during the frame, temporaries included. Both are taken after a warm-up frame,
+so the Preprocessor's one-time buffers are excluded.
+
+    python -m benchmarks.bench_preprocess --faces 1,4,16
+"""
+import argparse
+import timeit
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from pipeline import FACE_SIZE, Preprocessor, prepare_crops
+
+
+def legacy_crops(gray, faces):
+    crops = []
+    for (x, y, w, h) in faces:
+        roi_gray = gray[y:y + h, x:x + w]
+        cropped_img = np.expand_dims(np.expand_dims(cv2.resize(roi_gray, (FACE_SIZE, FACE_SIZE)), -1), 0)
+        crops.append(cropped_img)
+    return np.vstack(crops).astype(np.float32)
+
+
+def face_boxes(width, height, count, seed=0):
+    rng = np.random.default_rng(seed)
+    boxes = []
+    for _ in range(count):
+        size = int(rng.integers(height // 8, height // 3))
+        boxes.append((int(rng.integers(0, width - size)), int(rng.integers(0, height - size)), size, size))
+    return boxes
+
+
+def allocations(fn, gray, faces, frames=50):
+    """(new blocks, peak KiB) per frame while the frame's batch is still alive."""
+    fn(gray, faces)
+    tracemalloc.start(1)
+    try:
+        blocks = peak = 0
+        for _ in range(frames):
+            tracemalloc.clear_traces()
+            tracemalloc.reset_peak()
+            out = fn(gray, faces)
+            peak += tracemalloc.get_traced_memory()[1]
+            blocks += sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+            del out
+    finally:
+        tracemalloc.stop()
+    return blocks / frames, peak / frames / 1024.0
+
+
+def timed(fn, gray, faces, repeats):
+    """Best of 7 runs, in microseconds per frame (resize timings are noisy)."""
+    runs = timeit.repeat(lambda: fn(gray, faces), number=max(1, repeats // 7), repeat=7)
+    return min(runs) / max(1, repeats // 7) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--faces', default='1,4,16', help="faces per frame")
+    parser.add_argument('--resolution', default='640x480')
+    parser.add_argument('--repeats', type=int, default=2000)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.split('x'))
+    gray = np.random.default_rng(0).integers(0, 256, (height, width), dtype=np.uint8)
+    variants = [
+        ('legacy', legacy_crops),
+        ('prepare_crops', prepare_crops),
+        ('Preprocessor', Preprocessor()),
+        ('+ hist', Preprocessor(equalize='hist')),
+        ('+ clahe', Preprocessor(equalize='clahe')),
+        ('+ /255', Preprocessor(scale=1 / 255.0)),
+    ]
+
+    print(f"{args.resolution} frame, {args.repeats} repeats\n")
+    print(f"{'faces':>5} {'variant':<14} {'us/frame':>9} {'blocks':>7} {'peak KiB':>9}")
+    for count in (int(c) for c in args.faces.split(',')):
+        faces = face_boxes(width, height, count)
+        reference = legacy_crops(gray, faces)
+        for name, fn in variants:
+            if name in ('prepare_crops', 'Preprocessor'):
+                assert np.array_equal(fn(gray, faces), reference), name
+            us = timed(fn, gray, faces, args.repeats)
+            blocks, peak = allocations(fn, gray, faces)
+            print(f"{count:>5} {name:<14} {us:>9.1f} {blocks:>7.1f} {peak:>9.1f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
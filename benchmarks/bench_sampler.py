@@ -0,0 +1,90 @@
+"""Micro-benchmark: Streamlit's DataFrame sample + pd.concat loop vs the vectorized MuseSampler.
+
+Uses muse_v3.csv when --csv is given, otherwise a synthetic 90k-row catalog.
+
+    python -m benchmarks.bench_sampler --repeat 2000
+"""
+import argparse
+import timeit
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from muse import MuseSampler
+
+EMOTION_LISTS = {
+    1: ['Happy'] * 20,
+    2: ['Happy'] * 12 + ['Sad'] * 8,
+    3: ['Angry'] * 9 + ['Neutral'] * 6 + ['Fearful'] * 5,
+    5: ['Happy'] * 6 + ['Sad'] * 5 + ['Angry'] * 4 + ['Neutral'] * 3 + ['Fearful'] * 2,
+}
+
+
+def synthetic_catalog(rows=90000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'track': [f'track {i}' for i in range(rows)],
+        'artist': [f'artist {i % 5000}' for i in range(rows)],
+        'lastfm_url': [f'https://www.last.fm/music/a/_/t{i}' for i in range(rows)],
+        'number_of_emotion_tags': rng.integers(1, 30, rows),
+        'valence_tags': rng.random(rows) * 8,
+    })
+
+
+def concat_loop(raw):
+    """The original streamlit_app_backup.py data prep and get_recommendations()."""
+    df = raw.copy()
+    df['link'] = df['lastfm_url']
+    df['name'] = df['track']
+    df['emotional'] = df['number_of_emotion_tags']
+    df['pleasant'] = df['valence_tags']
+    df = df[['name', 'emotional', 'pleasant', 'link', 'artist']]
+    df = df.sort_values(by=["emotional", "pleasant"])
+    df.reset_index(inplace=True, drop=True)
+    df_sad, df_fear, df_angry = df[:18000], df[18000:36000], df[36000:54000]
+    df_neutral, df_happy = df[54000:72000], df[72000:]
+
+    def get_recommendations(emotion_list):
+        data = pd.DataFrame()
+        sorted_emotions = [item for item, count in Counter(emotion_list).most_common()][:5]
+        times = {1: [30], 2: [30, 20], 3: [55, 20, 15], 4: [30, 29, 18, 9]}.get(len(sorted_emotions), [10, 7, 6, 5, 2])
+        for i, emotion in enumerate(sorted_emotions):
+            count = times[i] if i < len(times) else 5
+            if emotion == 'Neutral':
+                data = pd.concat([data, df_neutral.sample(n=count)], ignore_index=True)
+            elif emotion == 'Angry':
+                data = pd.concat([data, df_angry.sample(n=count)], ignore_index=True)
+            elif emotion in ('Fearful', 'fear'):
+                data = pd.concat([data, df_fear.sample(n=count)], ignore_index=True)
+            elif emotion in ('Happy', 'happy'):
+                data = pd.concat([data, df_happy.sample(n=count)], ignore_index=True)
+            else:
+                data = pd.concat([data, df_sad.sample(n=count)], ignore_index=True)
+        return data
+
+    return get_recommendations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', help="Path to muse_v3.csv")
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.csv) if args.csv else synthetic_catalog()
+    old = concat_loop(raw)
+    sampler = MuseSampler.from_columns(raw['track'].to_numpy(), raw['artist'].to_numpy(), raw['lastfm_url'].to_numpy(),
+                                       raw['number_of_emotion_tags'].to_numpy(), raw['valence_tags'].to_numpy())
+
+    print(f"{len(raw):,} songs, {args.repeat} calls per case\n")
+    print(f"{'emotions':>8} {'songs':>6} {'concat loop us':>15} {'vectorized us':>14} {'speedup':>8}")
+    for n, emotions in EMOTION_LISTS.items():
+        songs = len(sampler.sample_positions(emotions))
+        old_us = timeit.timeit(lambda: old(emotions), number=args.repeat) / args.repeat * 1e6
+        new_us = timeit.timeit(lambda: sampler.recommend(emotions), number=args.repeat) / args.repeat * 1e6
+        print(f"{n:>8} {songs:>6} {old_us:>15.1f} {new_us:>14.1f} {old_us / new_us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Requests/s and bytes on the wire for /recommend and audio fetches, via the Flask test client.
+
+Runs in process against mongomock, so it needs no server or database:
+
+    python -m benchmarks.bench_static --requests 2000
+"""
+import argparse
+import os
+import time
+
+
+def rate(client, method, path, requests, **kwargs):
+    response = getattr(client, method)(path, **kwargs)  # warm-up
+    size = len(response.get_data())
+    start = time.perf_counter()
+    for _ in range(requests):
+        getattr(client, method)(path, **kwargs).get_data()
+    return requests / (time.perf_counter() - start), response.status_code, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('MONGO_URI', 'mongomock://')
+    import app as flask_app
+    import service
+    from flask import jsonify
+
+    client = flask_app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'bench'
+
+    fixed = next((e for e, entry in ((e, service.song_catalog.get(e)) for e in service.FIXED_PLAYLISTS)
+                  if not entry.is_local), 'NoLocalSongs')
+    local = next((e for e in service.FIXED_PLAYLISTS if service.song_catalog.get(e).is_local), None)
+    etag = client.post('/recommend', json={'emotions': [fixed]}, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    cases = [
+        ('recommend fixed, identity', 'post', '/recommend', {'json': {'emotions': [fixed]}}),
+        ('recommend fixed, gzip', 'post', '/recommend',
+         {'json': {'emotions': [fixed]}, 'headers': {'Accept-Encoding': 'gzip, br'}}),
+        ('recommend fixed, 304', 'post', '/recommend',
+         {'json': {'emotions': [fixed]}, 'headers': {'Accept-Encoding': 'gzip', 'If-None-Match': etag}}),
+    ]
+    if local:
+        cases.append(('recommend local, gzip', 'post', '/recommend',
+                      {'json': {'emotions': [local]}, 'headers': {'Accept-Encoding': 'gzip'}}))
+    cases.append(('static/js/script.js gzip', 'get', '/static/js/script.js', {'headers': {'Accept-Encoding': 'gzip'}}))
+
+    songs_root = service.song_catalog.songs_root
+    audio = None
+    for emotion in sorted(os.listdir(songs_root)) if os.path.isdir(songs_root) else []:
+        files = sorted(os.listdir(os.path.join(songs_root, emotion)))
+        if files:
+            audio = f'/static/songs/{emotion}/{files[0]}'
+            break
+    if audio:
+        cases.append(('audio full file', 'get', audio, {}))
+        cases.append(('audio Range 64 KiB', 'get', audio, {'headers': {'Range': 'bytes=0-65535'}}))
+
+    with flask_app.app.test_request_context(headers={'Accept-Encoding': 'gzip, br'}):
+        from flask import request
+        # Body cost alone: the old jsonify() per call vs selecting a precompressed variant
+        songs = service.FIXED_PLAYLISTS['Neutral']
+        payload = service.song_catalog.get('NoLocalSongs').payload
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            jsonify({'dominant_emotion': 'Neutral', 'songs': songs}).get_data()
+        old_us = (time.perf_counter() - start) / args.requests * 1e6
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            payload.select(request.accept_encodings)
+        new_us = (time.perf_counter() - start) / args.requests * 1e6
+    print(f"Playlist body: jsonify per call {old_us:.1f} us, precompressed select {new_us:.1f} us\n")
+
+    print(f"{args.requests} requests per case\n")
+    print(f"{'case':<28} {'req/s':>9} {'status':>7} {'bytes':>10}")
+    for name, method, path, kwargs in cases:
+        rps, status, size = rate(client, method, path, args.requests, **kwargs)
+        print(f"{name:<28} {rps:>9.0f} {status:>7} {size:>10,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compare bytes on the wire and server CPU per frame for each /predict upload mode.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_upload --width 1280 --height 720 --frames 200
+"""
+import argparse
+import base64
+import json
+import time
+
+import cv2
+import numpy as np
+
+from decoding import decode_data_url, decode_image, decode_raw_gray
+
+
+def synthetic_frame(width, height, seed=0):
+    """A webcam-like BGR frame: smooth gradients plus sensor noise (compresses like a photo)."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = 128 + 60 * np.sin(xx / 37.0) * np.cos(yy / 23.0)
+    frame = np.stack([base, base * 0.9 + 20, base * 0.8 + 40], axis=-1)
+    frame += rng.normal(0, 6, frame.shape)
+    cv2.circle(frame, (width // 2, height // 2), min(width, height) // 5, (200, 180, 160), -1)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def cpu_per_frame(fn, payload, frames):
+    fn(payload)  # warm-up
+    start = time.process_time()
+    for _ in range(frames):
+        fn(payload)
+    return (time.process_time() - start) / frames * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--quality', type=int, default=90, help="JPEG quality used by the client")
+    args = parser.parse_args()
+
+    frame = synthetic_frame(args.width, args.height)
+    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+    jpeg = jpeg.tobytes()
+
+    # What the browser would POST today
+    json_body = json.dumps({'image': 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')})
+
+    # Client-side grayscale + 2x downscale, sent as raw bytes
+    small_gray = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (args.width // 2, args.height // 2),
+                            interpolation=cv2.INTER_AREA)
+    raw_gray = small_gray.tobytes()
+
+    modes = [
+        ('json data URL (current)', json_body.encode('utf-8'),
+         lambda body: decode_data_url(json.loads(body)['image'])),
+        ('octet-stream JPEG', jpeg,
+         lambda body: decode_image(np.frombuffer(body, np.uint8))),
+        ('octet-stream JPEG ?reduce=2', jpeg,
+         lambda body: decode_image(np.frombuffer(body, np.uint8), reduce=2)),
+        ('x-gray8 pre-downscaled', raw_gray,
+         lambda body: decode_raw_gray(np.frombuffer(body, np.uint8), args.width // 2, args.height // 2)),
+    ]
+
+    print(f"Frame {args.width}x{args.height}, JPEG q={args.quality}, {args.frames} frames per mode\n")
+    print(f"{'mode':<30} {'bytes/frame':>12} {'vs json':>8} {'cpu ms/frame':>13}")
+    baseline_bytes = len(modes[0][1])
+    for name, body, fn in modes:
+        ms = cpu_per_frame(fn, body, args.frames)
+        print(f"{name:<30} {len(body):>12,} {len(body) / baseline_bytes:>7.0%} {ms:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""/predict latency past saturation, with and without admission control.
+
+Requests arrive open-loop at --load times the server's capacity, spread over
+--users sessions. Detection/inference is replaced by a stand-in that holds
+one of --workers slots for --service-ms, so capacity is exactly
+workers / service time and the test does not depend on the model. Latency is
+measured from each request's scheduled arrival, so queueing delay is counted
+even when the client threads fall behind.
+
+Without admission every request waits its turn and latency grows for as long
+as the overload lasts; with it, requests beyond the queue or deadline are
+answered 503/429 at once and admitted ones stay within the deadline.
+
+    python -m benchmarks.load_admission --load 2 --duration 10
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from admission import AdmissionController
+
+
+def run(flask_app, args, frame):
+    local = threading.local()
+
+    def client_for(user):
+        # Test clients keep a cookie jar, so each client thread gets its own per user
+        if not hasattr(local, 'clients'):
+            local.clients = {}
+        client = local.clients.get(user)
+        if client is None:
+            client = local.clients[user] = flask_app.app.test_client()
+            with client.session_transaction() as s:
+                s['user'] = f'load_user_{user}'
+        return client
+
+    def request(index, scheduled):
+        response = client_for(index % args.users).post('/predict', data=frame, content_type='image/jpeg')
+        return response.status_code, time.perf_counter() - scheduled
+
+    interval = args.service_ms / 1000.0 / args.workers / args.load
+    total = int(args.duration / interval)
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(request, i, scheduled))
+        results = [f.result() for f in futures]
+    return results, time.perf_counter() - start
+
+
+def report(label, results, elapsed):
+    codes = Counter(code for code, _ in results)
+    ok = np.array([latency for code, latency in results if code == 200]) * 1000.0
+    rejected = np.array([latency for code, latency in results if code != 200]) * 1000.0
+    p50, p99, worst = np.percentile(ok, [50, 99, 100]) if len(ok) else (float('nan'),) * 3
+    rej_p99 = np.percentile(rejected, 99) if len(rejected) else float('nan')
+    print(f"{label:<10} {len(ok) / elapsed:>8.1f} {p50:>8.1f} {p99:>8.1f} {worst:>8.1f} "
+          f"{codes.get(429, 0):>6} {codes.get(503, 0):>6} {rej_p99:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help="inference slots (= ADMISSION_MAX_IN_FLIGHT)")
+    parser.add_argument('--service-ms', type=float, default=20.0, help="stand-in detection+inference time")
+    parser.add_argument('--load', type=float, default=2.0, help="offered load as a multiple of capacity")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=256, help="client threads")
+    parser.add_argument('--queue', type=int, default=16)
+    parser.add_argument('--deadline-ms', type=float, default=500.0)
+    parser.add_argument('--rate', type=float, default=10.0, help="per-user requests/s")
+    args = parser.parse_args()
+
+    import app as flask_app
+    import service
+
+    slots = threading.Semaphore(args.workers)
+
+    def fixed_cost_predict(gray, scale=1, owner=None):
+        with slots:
+            time.sleep(args.service_ms / 1000.0)
+        return {'faces': [], 'emotion': 'Neutral'}
+
+    service.predict_frame = fixed_cost_predict
+    frame = cv2.imencode('.jpg', np.zeros((120, 160, 3), np.uint8))[1].tobytes()
+
+    capacity = args.workers / (args.service_ms / 1000.0)
+    print(f"capacity {capacity:.0f} req/s, offered {capacity * args.load:.0f} req/s over {args.users} users, "
+          f"{args.duration:.0f}s\n")
+    print(f"{'admission':<10} {'ok/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'429':>6} {'503':>6} {'reject p99':>12}")
+
+    flask_app.admission = AdmissionController(max_in_flight=10 ** 6, max_queue=0, deadline=float('inf'), rate=0)
+    report('off', *run(flask_app, args, frame))
+
+    controller = AdmissionController(max_in_flight=args.workers, max_queue=args.queue,
+                                     deadline=args.deadline_ms / 1000.0, rate=args.rate, burst=args.rate * 2)
+    flask_app.admission = controller
+    report('on', *run(flask_app, args, frame))
+    print(f"\n{controller.stats()}")
+
+
+if __name__ == '__main__':
+    main()
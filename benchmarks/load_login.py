@@ -0,0 +1,79 @@
+"""Login throughput through the Flask app, in process, against mongomock or a real MongoDB.
+
+Registers --users accounts, then --concurrency client threads log in for
+--duration seconds. A --bad-fraction of attempts repeat one wrong password per
+user, which the failed-login cache answers without MongoDB or bcrypt.
+
+    python -m benchmarks.load_login --concurrency 16 --hash-workers 4
+    MONGO_URI=mongodb://localhost:27017 python -m benchmarks.load_login
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--bad-fraction', type=float, default=0.2)
+    parser.add_argument('--hash-workers', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=12, help="bcrypt cost factor")
+    args = parser.parse_args()
+
+    os.environ.setdefault('MONGO_URI', 'mongomock://')
+    os.environ['HASH_WORKERS'] = str(args.hash_workers)
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(args.rounds)
+    import app as flask_app
+
+    store = flask_app.user_store
+    if store is None:
+        raise SystemExit("No database; set MONGO_URI (default mongomock://)")
+    setup = flask_app.app.test_client()
+    names = [f'load_user_{i}' for i in range(args.users)]
+    for name in names:
+        body = {'username': name, 'password': 'pw-' + name, 'confirm_password': 'pw-' + name}
+        setup.post('/register', data=json.dumps(body), content_type='application/json')
+
+    latencies = {'ok': [], 'rejected': []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client(seed):
+        rng = np.random.default_rng(seed)
+        test_client = flask_app.app.test_client()
+        mine = {'ok': [], 'rejected': []}
+        while time.perf_counter() < deadline:
+            name = names[rng.integers(len(names))]
+            bad = rng.random() < args.bad_fraction
+            body = json.dumps({'username': name, 'password': 'wrong' if bad else 'pw-' + name})
+            start = time.perf_counter()
+            response = test_client.post('/login', data=body, content_type='application/json')
+            mine['ok' if response.status_code == 200 else 'rejected'].append(time.perf_counter() - start)
+        with lock:
+            for key, values in mine.items():
+                latencies[key].extend(values)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"{args.concurrency} clients, {args.hash_workers} hash workers, bcrypt cost {args.rounds}, "
+          f"{args.duration:.0f}s\n")
+    print(f"{'outcome':<9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for key, values in latencies.items():
+        ms = np.array(values) * 1000.0
+        p50, p99 = np.percentile(ms, [50, 99]) if len(ms) else (float('nan'), float('nan'))
+        print(f"{key:<9} {len(ms) / args.duration:>8.1f} {p50:>8.1f} {p99:>8.1f}")
+    print(f"\n{store.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Load test: per-worker model copies vs one shared model server.
+
+Starts N worker processes that each hammer predict() from several threads with
+1-3 face crops per request, then reports total crops/s and total memory (PSS,
+so shared pages are not double counted) across all processes involved.
+
+    python -m benchmarks.load_model_server --workers 8 --backend onnx --model-path model.onnx
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+def memory_mb(pid):
+    """Proportional set size if the kernel reports it, else RSS."""
+    for path, key in ((f'/proc/{pid}/smaps_rollup', 'Pss:'), (f'/proc/{pid}/status', 'VmRSS:')):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(key):
+                        return int(line.split()[1]) / 1024.0
+        except OSError:
+            continue
+    return float('nan')
+
+
+def worker(mode, backend, model_path, address, threads, duration):
+    if mode == 'shared':
+        from model_server import RemotePredictor
+        predictor = RemotePredictor(address)
+    else:
+        from backends import load_backend
+        from batching import BatchingPredictor
+        model = load_backend(backend, model_path)
+        predictor = BatchingPredictor(model.predict)
+
+    rng = np.random.default_rng(os.getpid())
+    crops = rng.integers(0, 256, (3, 48, 48, 1)).astype(np.float32)
+    predictor.predict(crops[:1], timeout=30)
+    print('ready', flush=True)
+    sys.stdin.readline()  # wait for the parent to start everyone together
+
+    counts = [0] * threads
+    deadline = time.perf_counter() + duration
+
+    def loop(i):
+        n = 1 + i % 3
+        while time.perf_counter() < deadline:
+            predictor.predict(crops[:n], timeout=30)
+            counts[i] += n
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    print(json.dumps({'crops': sum(counts)}), flush=True)
+
+
+def run(mode, args):
+    procs = []
+    server = None
+    address = os.path.join(tempfile.mkdtemp(prefix='model_server_'), 'sock')
+    if mode == 'shared':
+        cmd = [sys.executable, 'model_server.py', '--address', address, '--backend', args.backend,
+               '--clients', str(args.workers)]
+        if args.model_path:
+            cmd += ['--model-path', args.model_path]
+        server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+        while not os.path.exists(address):
+            if server.poll() is not None:
+                raise RuntimeError("model_server.py exited during startup")
+            time.sleep(0.05)
+
+    for _ in range(args.workers):
+        cmd = [sys.executable, '-m', 'benchmarks.load_model_server', '--worker', mode,
+               '--backend', args.backend, '--address', address,
+               '--threads', str(args.threads), '--duration', str(args.duration)]
+        if args.model_path:
+            cmd += ['--model-path', args.model_path]
+        procs.append(subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True))
+    for p in procs:
+        if p.stdout.readline().strip() != 'ready':
+            raise RuntimeError("worker failed to start")
+
+    for p in procs:
+        p.stdin.write('go\n')
+        p.stdin.flush()
+    time.sleep(args.duration / 2)
+    pids = [p.pid for p in procs] + ([server.pid] if server else [])
+    total_mb = sum(memory_mb(pid) for pid in pids)
+
+    crops = sum(json.loads(p.communicate()[0].strip().splitlines()[-1])['crops'] for p in procs)
+    if server:
+        server.terminate()
+        server.wait()
+    return {'mode': mode, 'memory_mb': total_mb, 'crops_per_s': crops / args.duration}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help="Concurrent requests per worker")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--backend', default=os.getenv('INFERENCE_BACKEND', 'keras'))
+    parser.add_argument('--model-path', default=os.getenv('MODEL_PATH') or None)
+    parser.add_argument('--address', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', choices=['local', 'shared'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.backend, args.model_path, args.address, args.threads, args.duration)
+        return
+
+    print(f"{args.workers} workers x {args.threads} threads, {args.duration:.0f}s, {args.backend} backend\n")
+    print(f"{'mode':<8} {'total MB':>9} {'crops/s':>9}")
+    for mode in ('local', 'shared'):
+        result = run(mode, args)
+        print(f"{result['mode']:<8} {result['memory_mb']:>9.0f} {result['crops_per_s']:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Offline benchmark suite for the /predict pipeline; writes JSON for comparing commits.
+
+Times each stage (JPEG and base64 decode, Haar detection, crop resize, batched
+inference) on synthetic frames with drawn faces the Haar cascade detects, at
+several resolutions, then load-tests /predict end to end through the Flask
+test client. Without model.h5 the Keras network is built with random weights,
+which times the same graph; no network or database is needed.
+
+    python -m benchmarks.suite --output bench_results.json
+    python -m benchmarks.suite --images faces/ --compare bench_results.json
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, NUM_CLASSES
+from benchmarks.bench_upload import synthetic_frame
+from decoding import decode_data_url, decode_image
+from pipeline import detect_faces, prepare_crops
+
+RESOLUTIONS = '320x240,640x480,1280x720'
+# 'none' times everything but the model
+MODEL_CHOICES = sorted(BACKENDS) + ['none']
+
+
+def draw_face(size):
+    """A cartoon face (oval, eyes, brows, nose, mouth) that the frontal Haar cascade detects."""
+    img = np.full((size, size), 90, np.uint8)
+    c, s = size // 2, size / 200.0
+    cv2.ellipse(img, (c, c), (int(70 * s), int(90 * s)), 0, 0, 360, 200, -1)
+    for dx in (-30, 30):
+        cv2.ellipse(img, (c + int(dx * s), c - int(20 * s)), (int(16 * s), int(8 * s)), 0, 0, 360, 40, -1)
+        cv2.line(img, (c + int((dx - 18) * s), c - int(40 * s)), (c + int((dx + 18) * s), c - int(40 * s)),
+                 50, max(1, int(5 * s)))
+    cv2.line(img, (c, c - int(10 * s)), (c, c + int(25 * s)), 150, max(1, int(4 * s)))
+    cv2.ellipse(img, (c, c + int(45 * s)), (int(28 * s), int(10 * s)), 0, 0, 360, 60, -1)
+    return cv2.GaussianBlur(img, (0, 0), 2 * s)
+
+
+def synthetic_face_frame(width, height, faces=1, seed=0):
+    """synthetic_frame() background with ``faces`` drawn faces side by side (BGR)."""
+    frame = synthetic_frame(width, height, seed)
+    size = min(height * 2 // 3, width // max(faces, 1) - 8)
+    for i in range(faces):
+        x = 4 + i * (width // faces) + (width // faces - size) // 2
+        y = (height - size) // 2
+        frame[y:y + size, x:x + size] = cv2.cvtColor(draw_face(size), cv2.COLOR_GRAY2BGR)
+    return frame
+
+
+def load_frames(images_dir, resolutions, faces):
+    if images_dir:
+        frames = []
+        for path in sorted(glob.glob(os.path.join(images_dir, '*'))):
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is not None:
+                frames.append((f'{img.shape[1]}x{img.shape[0]}:{os.path.basename(path)}', img))
+        return frames
+    sizes = [tuple(int(v) for v in r.split('x')) for r in resolutions.split(',')]
+    return [(f'{w}x{h}', synthetic_face_frame(w, h, faces)) for w, h in sizes]
+
+
+def uniform_predict(batch):
+    return np.full((len(batch), NUM_CLASSES), 1.0 / NUM_CLASSES, np.float32)
+
+
+def load_suite_model(backend, path):
+    """(predict_fn, description); random-init Keras weights when the weights file is missing.
+
+    ``none`` answers uniform probabilities without loading any model.
+    """
+    from backends import load_backend, load_model
+
+    if backend == 'none':
+        return uniform_predict, 'none (uniform probabilities)'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}' (choose from {', '.join(MODEL_CHOICES)})")
+    default = BACKENDS[backend].default_path
+    if backend == 'keras' and not os.path.exists(path or default):
+        model = load_model(weights_path=None)
+        return (lambda batch: model.predict(batch, batch_size=len(batch), verbose=0)), 'keras (random init)'
+    model = load_backend(backend, path)
+    return model.predict, model.name
+
+
+def timed(fn, repeat):
+    fn()  # warm-up
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    return summarize(samples)
+
+
+def summarize(seconds):
+    ms = np.asarray(seconds) * 1000.0
+    if not len(ms):
+        return {'n': 0}
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {'n': len(ms), 'mean_ms': float(ms.mean()), 'p50_ms': float(p50), 'p90_ms': float(p90),
+            'p99_ms': float(p99)}
+
+
+def bench_stages(frames, cascade, predict_fn, repeat):
+    results = {}
+    for label, frame in frames:
+        jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1]
+        data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg.tobytes()).decode('ascii')
+        gray = decode_image(jpeg)
+        faces = detect_faces(cascade, gray)
+        stages = {
+            'decode_data_url': timed(lambda: decode_data_url(data_url), repeat),
+            'imdecode_gray': timed(lambda: decode_image(jpeg), repeat),
+            'imdecode_gray_reduce2': timed(lambda: decode_image(jpeg, 2), repeat),
+            'detect': timed(lambda: detect_faces(cascade, gray), repeat),
+        }
+        if len(faces):
+            crops = prepare_crops(gray, faces)
+            stages['resize'] = timed(lambda: prepare_crops(gray, faces), repeat)
+            if predict_fn:
+                stages['inference'] = timed(lambda: predict_fn(crops), repeat)
+        results[label] = {'faces_detected': int(len(faces)), 'jpeg_bytes': int(len(jpeg)), 'stages': stages}
+        print(f"{label:<14} faces={len(faces)} " +
+              ' '.join(f"{name}={s['p50_ms']:.2f}ms" for name, s in stages.items()))
+    return results
+
+
+def bench_end_to_end(frame, predict_fn, requests, concurrency):
+    """POST JPEG frames to /predict via the Flask test client from ``concurrency`` threads."""
+    os.environ.setdefault('PREDICT_CACHE_SIZE', '0')  # identical frames would otherwise all hit the cache
+    # In-process stand-in, so importing the app doesn't wait on an unreachable server
+    os.environ.setdefault('MONGO_URI', 'mongomock://')
+    # Measure /predict itself, not the per-user limiter (USER_RATE_LIMIT=0 turns it off)
+    os.environ.setdefault('USER_RATE_LIMIT', '0')
+    import app as flask_app
+    import service
+    from batching import BatchingPredictor
+
+    if predict_fn and service.predictor is None:
+        service.predictor = BatchingPredictor(predict_fn)
+    mode = 'model' if service.predictor else 'demo'
+    jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+    latencies, errors, lock = [], [], threading.Lock()
+    per_thread = max(1, requests // concurrency)
+
+    def client(user):
+        test_client = flask_app.app.test_client()
+        with test_client.session_transaction() as sess:
+            sess['user'] = user
+        mine, failed = [], 0
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            response = test_client.post('/predict', data=jpeg, content_type='image/jpeg')
+            elapsed = time.perf_counter() - start
+            # Fast 429/5xx answers would flatter both latency and throughput
+            if response.status_code == 200:
+                mine.append(elapsed)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    # Cold first calls (model, cascade) would otherwise be timed, or shed as stale by admission control
+    warm = flask_app.app.test_client()
+    with warm.session_transaction() as sess:
+        sess['user'] = 'bench-warmup'
+    warm.post('/predict', data=jpeg, content_type='image/jpeg')
+
+    threads = [threading.Thread(target=client, args=(f'bench-{i}',)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    # Latency and req/s cover successful (200) responses only, as in bench_async.drive
+    result = {'mode': mode, 'concurrency': concurrency, 'requests': len(latencies) + sum(errors),
+              'rps': len(latencies) / elapsed, 'errors': sum(errors), **summarize(latencies)}
+    print(f"end-to-end ({mode}, {concurrency} threads): {result['rps']:.1f} req/s, "
+          f"p50 {result.get('p50_ms', float('nan')):.1f}ms, p99 {result.get('p99_ms', float('nan')):.1f}ms, "
+          f"{result['errors']} errors")
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'opencv': cv2.__version__, 'cpus': os.cpu_count(),
+            'machine': platform.machine()}
+
+
+def compare(previous, current):
+    """Print p50 changes for every stage present in both runs."""
+    print(f"\nvs {previous['environment'].get('commit')}:")
+    for label, entry in current['stages'].items():
+        for stage, stats in entry['stages'].items():
+            old = previous.get('stages', {}).get(label, {}).get('stages', {}).get(stage)
+            if old and old.get('p50_ms'):
+                change = stats['p50_ms'] / old['p50_ms'] - 1
+                print(f"  {label:<14} {stage:<22} {old['p50_ms']:>8.2f} -> {stats['p50_ms']:>8.2f} ms ({change:+.0%})")
+    old, new = previous.get('end_to_end'), current.get('end_to_end')
+    if old and new and old.get('rps'):
+        print(f"  end-to-end req/s {old['rps']:.1f} -> {new['rps']:.1f} ({new['rps'] / old['rps'] - 1:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--resolutions', default=RESOLUTIONS)
+    parser.add_argument('--faces', type=int, default=1, help="Drawn faces per synthetic frame")
+    parser.add_argument('--images', help="Folder of real images to use instead of synthetic frames")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--backend', default=os.getenv('INFERENCE_BACKEND', 'keras'), choices=MODEL_CHOICES,
+                        help="'none' skips inference timings")
+    parser.add_argument('--model-path', default=os.getenv('MODEL_PATH') or None)
+    parser.add_argument('--requests', type=int, default=200, help="End-to-end /predict requests")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--skip-e2e', action='store_true')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="Earlier JSON result to diff against")
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+    predict_fn, model_name = None, None
+    if args.backend != 'none':
+        try:
+            predict_fn, model_name = load_suite_model(args.backend, args.model_path)
+        except Exception as e:
+            print(f"WARNING: no inference backend ({e}); skipping inference timings")
+
+    frames = load_frames(args.images, args.resolutions, args.faces)
+    results = {'environment': environment(), 'model': model_name, 'repeat': args.repeat,
+               'stages': bench_stages(frames, cascade, predict_fn, args.repeat)}
+    if not args.skip_e2e:
+        # Middle resolution (640x480 by default) is the typical webcam frame
+        results['end_to_end'] = bench_end_to_end(frames[len(frames) // 2][1], predict_fn, args.requests,
+                                                 args.concurrency)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""Multi-camera capture: one grab thread per source, one batching inference worker.
+
+Sources are webcam indices, stream URLs (rtsp://, http://) or video files.
+Each source has a dedicated thread that reads as fast as the device delivers
+and keeps only the newest frame, so capture never waits on inference. A
+single worker takes the newest frame from every camera that has one, detects
+faces per camera, classifies all faces from all cameras in one forward pass
+and hands each camera its results.
+
+    python capture.py --source 0 --source clip.mp4 --duration 10
+"""
+import argparse
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from pipeline import EMOTIONS, Preprocessor, detect_faces
+from streaming import LatestFrameSlot
+
+
+def parse_source(source):
+    """Webcam index for digit strings, otherwise a path or URL as given."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class RateMeter:
+    """Events per second over the last ``window`` events."""
+
+    def __init__(self, window=64):
+        self._times = deque(maxlen=window)
+
+    def tick(self, now=None):
+        self._times.append(time.perf_counter() if now is None else now)
+
+    def rate(self):
+        if len(self._times) < 2:
+            return 0.0
+        span = self._times[-1] - self._times[0]
+        return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+class CameraSource:
+    """A capture device or stream read by its own thread into a latest-frame slot.
+
+    Video files are paced to their own frame rate (``realtime``, default on for
+    files) so they behave like a camera in tests, and can ``loop`` forever.
+    ``start()`` raises RuntimeError if the source cannot be opened.
+    """
+
+    def __init__(self, source, name=None, realtime=None, loop=False):
+        self.source = parse_source(source)
+        self.name = name or str(source)
+        self.is_file = isinstance(self.source, str) and '://' not in self.source
+        self.realtime = self.is_file if realtime is None else bool(realtime)
+        self.loop = bool(loop)
+
+        self.slot = LatestFrameSlot()
+        self.meter = RateMeter()
+        self.ended = threading.Event()
+        self._stop = threading.Event()
+        self._on_frame = None
+        self._capture = None
+        self._thread = None
+
+    def start(self, on_frame=None):
+        """Open the source and start grabbing; ``on_frame()`` is called after each grab."""
+        self._capture = cv2.VideoCapture(self.source)
+        if not self._capture.isOpened():
+            self._capture.release()
+            raise RuntimeError(f"Cannot open video source {self.source!r}")
+        self._on_frame = on_frame
+        self._thread = threading.Thread(target=self._grab_loop, name=f'grab-{self.name}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.slot.close()
+
+    def _grab_loop(self):
+        fps = self._capture.get(cv2.CAP_PROP_FPS) if self.realtime else 0
+        interval = 1.0 / fps if fps and fps > 0 else 0.0
+        due = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                ok, frame = self._capture.read()
+                if not ok:
+                    if self.loop and self.is_file and self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                        continue
+                    break
+                if interval:
+                    due += interval
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        due = time.perf_counter()  # fell behind; don't burst to catch up
+                self.meter.tick()
+                self.slot.put(frame)
+                if self._on_frame is not None:
+                    self._on_frame()
+        finally:
+            self._capture.release()
+            self.ended.set()
+            if self._on_frame is not None:
+                self._on_frame()
+
+    def stats(self):
+        return {
+            'grabbed': self.slot.received,
+            'dropped': self.slot.dropped,
+            'capture_fps': self.meter.rate(),
+            'ended': self.ended.is_set(),
+        }
+
+
+class CaptureResult:
+    """One processed frame: the BGR frame, face boxes and (N, 7) probabilities."""
+
+    __slots__ = ('camera', 'frame', 'faces', 'probabilities', 'captured_at', 'latency')
+
+    def __init__(self, camera, frame, faces, probabilities, captured_at, latency):
+        self.camera = camera
+        self.frame = frame
+        self.faces = faces
+        self.probabilities = probabilities
+        self.captured_at = captured_at
+        self.latency = latency
+
+    @property
+    def emotions(self):
+        return [EMOTIONS[int(np.argmax(p))] for p in self.probabilities]
+
+
+class CapturePipeline:
+    """Shared inference over several ``CameraSource``s.
+
+    ``predict_fn`` maps an (N, 48, 48, 1) batch to (N, 7) probabilities.
+    ``detect_factory(name)`` returns each camera's detect function (gray ->
+    boxes), so every camera can have its own ``FaceTracker``; the default is
+    plain Haar detection with ``face_cascade``. Faces from all cameras with a
+    new frame go through one ``predict_fn`` call of at most ``max_batch_faces``
+    faces. ``on_result(CaptureResult)`` runs on the worker thread, and the
+    newest result per camera is kept in ``latest``.
+    """
+
+    def __init__(self, sources, predict_fn, face_cascade=None, detect_factory=None, preprocess=None,
+                 max_batch_faces=64, on_result=None, latency_window=256):
+        self.sources = list(sources)
+        names = [source.name for source in self.sources]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Camera names must be unique: {names}")
+        self.predict_fn = predict_fn
+        if detect_factory is None:
+            cascade = face_cascade if face_cascade is not None else \
+                cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+            detect_factory = lambda name: (lambda gray: detect_faces(cascade, gray))
+        self.detectors = {source.name: detect_factory(source.name) for source in self.sources}
+        self.preprocess = preprocess or Preprocessor()
+        self.max_batch_faces = max(1, int(max_batch_faces))
+        self.on_result = on_result
+        self.latest = {}
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._processed = {source.name: RateMeter() for source in self.sources}
+        self._counts = {source.name: 0 for source in self.sources}
+        self._latencies = {source.name: deque(maxlen=latency_window) for source in self.sources}
+        self.batches = 0
+        self.batch_frames = 0
+        self.batch_faces = 0
+
+    def start(self):
+        started = []
+        try:
+            for source in self.sources:
+                started.append(source.start(on_frame=self._wake.set))
+        except Exception:
+            for source in started:
+                source.stop()
+            raise
+        self._worker = threading.Thread(target=self._run, name='capture-inference', daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for source in self.sources:
+            source.stop()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def wait(self, timeout=None):
+        """Block until every source has ended (files without ``loop``) or ``timeout`` passes."""
+        if self._worker is not None:
+            self._worker.join(timeout)
+        return self._worker is None or not self._worker.is_alive()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            # Checked before polling so a source's last frame is never left behind
+            ended = all(source.ended.is_set() for source in self.sources)
+            pending = []
+            for source in self.sources:
+                item = source.slot.poll()
+                if item is not None:
+                    pending.append((source, item))
+            if not pending:
+                if ended:
+                    break
+                self._wake.wait(0.1)
+                continue
+            try:
+                self._process(pending)
+            except Exception as e:
+                print(f"Capture inference error: {e}")
+
+    def _process(self, pending):
+        frames = []
+        for source, (frame, captured_at) in pending:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            faces = self.detectors[source.name](gray)
+            frames.append((source, frame, gray, faces, captured_at))
+
+        # Chunks of whole frames up to max_batch_faces (a single larger frame still gets its own pass)
+        start = 0
+        while start < len(frames):
+            end, total = start, 0
+            while end < len(frames) and (end == start or total + len(frames[end][3]) <= self.max_batch_faces):
+                total += len(frames[end][3])
+                end += 1
+            self._classify(frames[start:end], total)
+            start = end
+
+    def _classify(self, frames, total):
+        probabilities = np.zeros((0, len(EMOTIONS)), dtype=np.float32)
+        if total:
+            batch = self.preprocess.prepare_many([(gray, faces) for _, _, gray, faces, _ in frames if len(faces)])
+            probabilities = np.asarray(self.predict_fn(batch))
+
+        done = time.perf_counter()
+        offset = 0
+        with self._stats_lock:
+            self.batches += 1
+            self.batch_frames += len(frames)
+            self.batch_faces += total
+        for source, frame, _, faces, captured_at in frames:
+            result = CaptureResult(source.name, frame, faces, probabilities[offset:offset + len(faces)],
+                                   captured_at, done - captured_at)
+            offset += len(faces)
+            with self._stats_lock:
+                self._processed[source.name].tick(done)
+                self._counts[source.name] += 1
+                self._latencies[source.name].append(result.latency)
+            self.latest[source.name] = result
+            if self.on_result is not None:
+                self.on_result(result)
+
+    def stats(self):
+        cameras = {}
+        with self._stats_lock:
+            for source in self.sources:
+                latencies = np.asarray(self._latencies[source.name]) * 1000.0
+                p50, p95 = np.percentile(latencies, [50, 95]) if len(latencies) else (0.0, 0.0)
+                cameras[source.name] = {
+                    **source.stats(),
+                    'processed': self._counts[source.name],
+                    'processed_fps': self._processed[source.name].rate(),
+                    'latency_p50_ms': float(p50),
+                    'latency_p95_ms': float(p95),
+                }
+            batches = self.batches
+            return {
+                'cameras': cameras,
+                'batches': batches,
+                'mean_batch_frames': self.batch_frames / batches if batches else 0.0,
+                'mean_batch_faces': self.batch_faces / batches if batches else 0.0,
+            }
+
+
+def print_stats(stats):
+    print(f"{'camera':<24} {'capture fps':>11} {'proc fps':>9} {'grabbed':>8} {'dropped':>8} "
+          f"{'p50 ms':>7} {'p95 ms':>7}")
+    for name, cam in stats['cameras'].items():
+        print(f"{name[-24:]:<24} {cam['capture_fps']:>11.1f} {cam['processed_fps']:>9.1f} {cam['grabbed']:>8} "
+              f"{cam['dropped']:>8} {cam['latency_p50_ms']:>7.1f} {cam['latency_p95_ms']:>7.1f}")
+    print(f"mean batch: {stats['mean_batch_frames']:.2f} frames, {stats['mean_batch_faces']:.2f} faces "
+          f"over {stats['batches']} batches\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', action='append', required=True,
+                        help="webcam index, stream URL or video file (repeat for more cameras)")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run (files stop at their end)")
+    parser.add_argument('--loop', action='store_true', help="restart video files at the end")
+    parser.add_argument('--no-realtime', action='store_true', help="read files as fast as possible")
+    parser.add_argument('--backend', default=None, help="inference backend (default: $INFERENCE_BACKEND)")
+    parser.add_argument('--model', default=None, help="model file for the backend")
+    args = parser.parse_args()
+
+    from backends import load_backend
+
+    model = load_backend(args.backend, args.model)
+    sources = [CameraSource(s, name=f'cam{i}', loop=args.loop, realtime=False if args.no_realtime else None)
+               for i, s in enumerate(args.source)]
+    for source in sources:
+        print(f"{source.name}: {source.source}")
+    with CapturePipeline(sources, model.predict) as capture:
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline and not capture.wait(min(1.0, deadline - time.perf_counter())):
+            print_stats(capture.stats())
+    print_stats(capture.stats())
+
+
+if __name__ == '__main__':
+    main()
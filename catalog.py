@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from responses import Precompressed
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg')
+
+
+class CatalogEntry:
+    """Songs for one emotion with pre-serialized JSON fragments and validators."""
+
+    def __init__(self, emotion, filenames, fixed_songs, mtime, link_root='/static/songs/'):
+        self.emotion = emotion
+        self.filenames = tuple(filenames)
+        self.mtime = mtime
+        self.last_modified = datetime.fromtimestamp(mtime or time.time(), tz=timezone.utc).replace(microsecond=0)
+
+        digest = hashlib.sha1(json.dumps([emotion, self.filenames, fixed_songs]).encode('utf-8'))
+        self._digest = digest.hexdigest()[:16]
+        self._header = '{"dominant_emotion": %s, "songs": [' % json.dumps(emotion)
+        # Fixed playlists never change order, so the whole body is built once
+        self._fixed_body = (self._header + ', '.join(json.dumps(song) for song in fixed_songs) + ']}').encode('utf-8')
+        # Root-relative links resolve against whatever host the page came from,
+        # so one set of fragments (and one validator) serves every request
+        self._local_fragments = [json.dumps({
+            'name': filename,
+            'artist': 'Local Track',
+            'link': f"{link_root}{emotion}/{filename}",
+            'track': filename,
+            'is_local': True
+        }) for filename in self.filenames]
+        # Fixed bodies are gzip/brotli-compressed once; local bodies are reshuffled per call
+        self.payload = None if self.is_local else Precompressed(self._fixed_body, 'application/json', self._digest)
+
+    @property
+    def is_local(self):
+        return bool(self.filenames)
+
+    def etag(self):
+        return self._digest
+
+    def body(self):
+        """Serialized response; local songs come back in a fresh random order each call."""
+        if not self.is_local:
+            return self._fixed_body
+        shuffled = random.sample(self._local_fragments, len(self._local_fragments))
+        return (self._header + ', '.join(shuffled) + ']}').encode('utf-8')
+
+
+class SongCatalog:
+    """Emotion -> songs index over static/songs/<Emotion>/, kept in memory.
+
+    Loaded once at startup. At most every ``refresh_interval`` seconds the
+    emotion directories are stat()ed and only those whose mtime changed
+    (files added, removed or renamed) are listed again. Local song links are
+    root-relative (``link_root``), independent of the request's Host.
+    """
+
+    def __init__(self, songs_root, fixed_playlists, refresh_interval=5.0, fallback="Neutral",
+                 link_root='/static/songs/'):
+        self.songs_root = songs_root
+        self.link_root = link_root
+        self.fixed_playlists = fixed_playlists
+        self.refresh_interval = float(refresh_interval)
+        self.fallback = fallback
+        self._entries = {}
+        self._fallback_entry = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.rescans = 0
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = now
+
+            if self._fallback_entry is None:
+                # Shared by every unknown label, so it is serialized and compressed once
+                self._fallback_entry = CatalogEntry(self.fallback, (), self.fixed_playlists[self.fallback],
+                                                    None, self.link_root)
+
+            emotions = set(self.fixed_playlists)
+            if os.path.isdir(self.songs_root):
+                emotions.update(name for name in os.listdir(self.songs_root)
+                                if os.path.isdir(os.path.join(self.songs_root, name)))
+
+            entries = dict(self._entries)
+            for emotion in emotions:
+                songs_dir = os.path.join(self.songs_root, emotion)
+                try:
+                    mtime = os.stat(songs_dir).st_mtime
+                except OSError:
+                    mtime = None
+                entry = entries.get(emotion)
+                if entry is not None and entry.mtime == mtime:
+                    continue
+                entries[emotion] = self._build(emotion, songs_dir, mtime)
+                self.rescans += 1
+            self._entries = entries
+
+    def _build(self, emotion, songs_dir, mtime):
+        filenames = []
+        if mtime is not None:
+            filenames = sorted(f for f in os.listdir(songs_dir) if f.lower().endswith(AUDIO_EXTENSIONS))
+        fixed = self.fixed_playlists.get(emotion, self.fixed_playlists[self.fallback])
+        return CatalogEntry(emotion, filenames, fixed, mtime, self.link_root)
+
+    def get(self, emotion):
+        self.refresh()
+        # Unknown label: answer with the fallback playlist but don't grow the index
+        return self._entries.get(emotion) or self._fallback_entry
@@ -0,0 +1,79 @@
+"""Convert the Keras emotion model (model.h5) to a lightweight CPU runtime format.
+
+    python convert_model.py --format onnx                  # -> model.onnx
+    python convert_model.py --format onnx --int8           # -> model.int8.onnx (dynamic quantization)
+    python convert_model.py --format tflite                # -> model.tflite
+    python convert_model.py --format tflite --int8 --calibration-dir crops/
+
+Select the result at runtime with INFERENCE_BACKEND=onnx|tflite and MODEL_PATH.
+"""
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from backends import INPUT_SHAPE, load_model
+
+
+def calibration_crops(directory, limit=200):
+    """Yield (1, 48, 48, 1) float32 crops from a folder of face images for int8 calibration."""
+    paths = sorted(glob.glob(os.path.join(directory, '*'))) if directory else []
+    crops = []
+    for path in paths[:limit]:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is not None:
+            crops.append(cv2.resize(gray, INPUT_SHAPE[:2]))
+    if not crops:
+        print("WARNING: no calibration images found, using random crops (int8 accuracy will suffer)")
+        rng = np.random.default_rng(0)
+        crops = list(rng.integers(0, 256, (limit, *INPUT_SHAPE[:2]), dtype=np.uint8))
+    for crop in crops:
+        yield crop.astype(np.float32)[np.newaxis, ..., np.newaxis]
+
+
+def to_onnx(model, output, int8=False):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = [tf.TensorSpec((None, *INPUT_SHAPE), tf.float32, name='input')]
+    float_path = output if not int8 else os.path.splitext(output)[0] + '.float.onnx'
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=float_path)
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(float_path, output, weight_type=QuantType.QInt8)
+
+
+def to_tflite(model, output, int8=False, calibration_dir=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if int8:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([crop] for crop in calibration_crops(calibration_dir))
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(output, 'wb') as f:
+        f.write(converter.convert())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--format', choices=['onnx', 'tflite'], required=True)
+    parser.add_argument('--weights', default='model.h5')
+    parser.add_argument('--int8', action='store_true', help="Quantize weights (and activations for TFLite) to int8")
+    parser.add_argument('--calibration-dir', help="Folder of face crops used to calibrate TFLite int8 ranges")
+    parser.add_argument('--output', help="Output path (default: model[.int8].<format>)")
+    args = parser.parse_args()
+
+    output = args.output or f"model{'.int8' if args.int8 else ''}.{args.format}"
+    model = load_model(args.weights)
+    if args.format == 'onnx':
+        to_onnx(model, output, args.int8)
+    else:
+        to_tflite(model, output, args.int8, args.calibration_dir)
+    print(f"Wrote {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
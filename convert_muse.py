@@ -0,0 +1,34 @@
+"""Convert the MUSE CSV (muse_v3.csv) to the memory-mapped columnar store.
+
+    python convert_muse.py                           # muse_v3.csv -> muse_v3.store/
+    python convert_muse.py --csv other.csv --output other.store
+
+The store holds the catalog already sorted into mood bands: names and artists
+are dictionary-encoded, links are one UTF-8 blob plus offsets, all as .npy
+files. app.py and the Streamlit app pick up muse_v3.store/ automatically
+(or MUSE_STORE) and memory-map it instead of parsing the CSV.
+"""
+import argparse
+import os
+import time
+
+from muse import MuseSampler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default='muse_v3.csv')
+    parser.add_argument('--output', help="Store directory (default: <csv name>.store)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.csv)[0] + '.store'
+    start = time.perf_counter()
+    sampler = MuseSampler.from_csv(args.csv)
+    sampler.save(output)
+
+    size = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output))
+    print(f"Wrote {len(sampler)} songs to {output} ({size / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
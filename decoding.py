@@ -0,0 +1,87 @@
+import base64
+import threading
+
+import cv2
+import numpy as np
+
+from metrics import registry as metrics
+
+# Content type for frames the client has already converted to 8-bit grayscale
+RAW_GRAY_MIMETYPE = 'application/x-gray8'
+
+# JPEG decoders can emit luminance directly and skip DCT work for 1/2, 1/4, 1/8 scale
+GRAYSCALE_READ_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+_local = threading.local()
+
+
+def decode_data_url(data):
+    """Legacy path: base64 data URL -> BGR decode -> grayscale."""
+    header, encoded = data.split(",", 1)
+    with metrics.stage('base64_decode'):
+        nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
+    with metrics.stage('imdecode'):
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    with metrics.stage('cvtcolor'):
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def read_body(stream, length):
+    """Read a request body into a reusable per-thread buffer.
+
+    The returned uint8 array is a view on that buffer and is only valid until
+    the same thread reads the next body.
+    """
+    buf = getattr(_local, 'buffer', None)
+    if buf is None or len(buf) < length:
+        size = 1 << max(16, (length - 1).bit_length())
+        buf = _local.buffer = bytearray(size)
+
+    view = memoryview(buf)
+    read = 0
+    while read < length:
+        n = stream.readinto(view[read:length])
+        if not n:
+            break
+        read += n
+    return np.frombuffer(buf, dtype=np.uint8, count=read)
+
+
+def decode_image(buf, reduce=1):
+    """Decode an encoded image (JPEG/PNG/...) straight to grayscale, optionally downscaled."""
+    if reduce not in GRAYSCALE_READ_FLAGS:
+        raise ValueError(f"reduce must be one of {sorted(GRAYSCALE_READ_FLAGS)}")
+    with metrics.stage('imdecode'):
+        gray = cv2.imdecode(buf, GRAYSCALE_READ_FLAGS[reduce])
+    if gray is None:
+        raise ValueError("Could not decode image")
+    return gray
+
+
+def decode_raw_gray(buf, width, height):
+    """Interpret a raw 8-bit grayscale buffer as a (height, width) image without copying."""
+    if width <= 0 or height <= 0:
+        raise ValueError("Frame width and height must be positive")
+    if len(buf) < width * height:
+        raise ValueError(f"Expected {width * height} bytes for a {width}x{height} frame, got {len(buf)}")
+    return buf[:width * height].reshape(height, width)
+
+
+def decode_frame(mimetype, body, headers, reduce=1):
+    """Decode a raw /predict body to grayscale; returns (gray, scale back to client pixels)."""
+    if mimetype == RAW_GRAY_MIMETYPE:
+        # Client already converted (and possibly downscaled) the frame
+        width = int(headers['X-Frame-Width'])
+        height = int(headers['X-Frame-Height'])
+        scale = float(headers.get('X-Frame-Scale', 1))
+        return decode_raw_gray(body, width, height), scale
+
+    # application/octet-stream, image/jpeg, image/png, ...
+    return decode_image(body, reduce), reduce
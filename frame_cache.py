@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Set bits per byte value, for Hamming distances over packed hashes
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def frame_hash(gray, hash_size=16):
+    """Difference hash of a grayscale image: hash_size**2 bits packed into bytes.
+
+    The frame is downscaled to (hash_size + 1) x hash_size and each bit records
+    whether a pixel is brighter than its left neighbour, so sensor noise and
+    small JPEG differences leave the hash (nearly) unchanged.
+    """
+    # A bilinear pass to 4x the target first: INTER_AREA at an integer factor
+    # is ~50x cheaper than straight from full resolution and still averages noise
+    width, height = hash_size + 1, hash_size
+    small = cv2.resize(gray, (width * 4, height * 4), interpolation=cv2.INTER_LINEAR)
+    small = cv2.resize(small, (width, height), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+
+class PredictionCache:
+    """LRU + TTL cache of /predict results keyed by perceptual frame hash.
+
+    A lookup hits when a live entry with the same ``meta`` (owner, frame size
+    and box scale) lies within ``threshold`` bits Hamming distance of the
+    query hash.
+    Entries expire ``ttl`` seconds after insertion; when all ``max_entries``
+    slots are live the least recently used one is evicted.
+    """
+
+    def __init__(self, max_entries=256, ttl=1.0, threshold=4, hash_size=16):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.threshold = int(threshold)
+        self.hash_size = int(hash_size)
+
+        nbytes = (self.hash_size * self.hash_size + 7) // 8
+        self._hashes = np.zeros((self.max_entries, nbytes), dtype=np.uint8)
+        self._meta = [None] * self.max_entries
+        self._values = [None] * self.max_entries
+        self._expires = np.full(self.max_entries, np.inf)  # inf marks a free slot
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        self._lru = OrderedDict()  # occupied slot -> None, least recently used first
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, gray):
+        return frame_hash(gray, self.hash_size)
+
+    def get(self, key, meta=None):
+        """Cached value for the closest live entry within the threshold, else None."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if not self._lru:
+                self.misses += 1
+                return None
+            slots = np.fromiter(self._lru, dtype=np.int64, count=len(self._lru))
+            distances = POPCOUNT[self._hashes[slots] ^ key].sum(axis=1, dtype=np.int32)
+            for i in np.argsort(distances, kind='stable'):
+                if distances[i] > self.threshold:
+                    break
+                slot = int(slots[i])
+                if self._meta[slot] == meta:
+                    self._lru.move_to_end(slot)
+                    self.hits += 1
+                    return self._values[slot]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, meta=None):
+        with self._lock:
+            self._expire(time.monotonic())
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self.evictions += 1
+            self._hashes[slot] = key
+            self._meta[slot] = meta
+            self._values[slot] = value
+            self._expires[slot] = time.monotonic() + self.ttl
+            self._lru[slot] = None
+
+    def _expire(self, now):
+        for slot in np.flatnonzero(self._expires <= now).tolist():
+            del self._lru[slot]
+            self._free.append(slot)
+            self._values[slot] = None
+            self._expires[slot] = np.inf
+            self.expirations += 1
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            self._values = [None] * self.max_entries
+            self._expires[:] = np.inf
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'max_entries': self.max_entries,
+            'ttl_s': self.ttl,
+            'threshold_bits': self.threshold,
+            'hash_bits': self.hash_size * self.hash_size,
+            'size': len(self._lru),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,167 @@
+"""Hot-path timing histograms and counters, rendered in Prometheus text format.
+
+Instrumented code imports the shared ``registry`` and wraps each stage:
+
+    with registry.stage('imdecode'):
+        gray = cv2.imdecode(...)
+
+The registry starts disabled; then ``stage()`` hands back one shared no-op
+context manager and ``inc()`` / ``observe()`` return immediately, so leaving
+the instrumentation in place costs a method call per stage.
+"""
+import bisect
+import threading
+import time
+
+# Upper bounds in seconds; stages range from ~10us (cvtColor) to ~100ms (cold predict)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+FACE_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 16)
+PREFIX = 'emotion_music'
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+class _Stage:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Per-process registry: stage latency histograms, value histograms, counters and gauges."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._stages = {}
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def _histogram(self, table, name, buckets):
+        histogram = table.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(name, Histogram(buckets))
+        return histogram
+
+    def stage(self, name):
+        """Context manager timing one pass through a pipeline stage."""
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self._histogram(self._stages, name, LATENCY_BUCKETS))
+
+    def timed(self, name, fn):
+        """Wrap fn so every call is recorded as a stage (fn itself when disabled)."""
+        if not self.enabled:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def observe(self, name, value, buckets=FACE_BUCKETS):
+        if self.enabled:
+            self._histogram(self._histograms, name, buckets).observe(value)
+
+    def inc(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    def add(self, name, amount):
+        """Move an up/down gauge such as the number of requests in flight."""
+        if self.enabled:
+            with self._lock:
+                self._levels[name] = self._levels.get(name, 0) + amount
+
+    def gauge(self, name, fn):
+        """Register a callback sampled at scrape time (e.g. a queue depth)."""
+        self._gauges[name] = fn
+
+    def render(self):
+        lines = []
+        if self._stages:
+            lines.append(f'# TYPE {PREFIX}_stage_seconds histogram')
+        for name, histogram in sorted(self._stages.items()):
+            lines.extend(_render_histogram(f'{PREFIX}_stage_seconds', histogram, f'stage="{name}"'))
+        for name, histogram in sorted(self._histograms.items()):
+            lines.append(f'# TYPE {PREFIX}_{name} histogram')
+            lines.extend(_render_histogram(f'{PREFIX}_{name}', histogram))
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = dict(self._levels)
+        for name, value in counters:
+            lines.append(f'# TYPE {PREFIX}_{name} counter')
+            lines.append(f'{PREFIX}_{name} {value}')
+        for name, fn in self._gauges.items():
+            try:
+                gauges[name] = float(fn())
+            except Exception:
+                continue
+        for name, value in sorted(gauges.items()):
+            lines.append(f'# TYPE {PREFIX}_{name} gauge')
+            lines.append(f'{PREFIX}_{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(metric, histogram, labels=''):
+    counts, total, count = histogram.snapshot()
+    sep = ',' if labels else ''
+    lines = []
+    cumulative = 0
+    for bound, n in zip(histogram.buckets + (float('inf'),), counts):
+        cumulative += n
+        le = '+Inf' if bound == float('inf') else f'{bound:g}'
+        lines.append(f'{metric}_bucket{{{labels}{sep}le="{le}"}} {cumulative}')
+    suffix = f'{{{labels}}}' if labels else ''
+    lines.append(f'{metric}_sum{suffix} {total:.9g}')
+    lines.append(f'{metric}_count{suffix} {count}')
+    return lines
+
+
+# Shared by app.py, decoding.py and pipeline.py; app.py enables it with METRICS_ENABLED=1
+registry = Metrics()
@@ -0,0 +1,395 @@
+"""Single-process model server shared by all web workers.
+
+One process owns the model and a BatchingPredictor; web workers (e.g. gunicorn
+pre-fork workers started with MODEL_SERVER_ADDRESS set) never import the model.
+Face crops travel through a multiprocessing.shared_memory arena of fixed slots,
+and only small (request id, slot, count) messages go over the control socket,
+so crops from every worker land in the same batches.
+
+    python model_server.py --address /tmp/emotion_model.sock
+    MODEL_SERVER_ADDRESS=/tmp/emotion_model.sock gunicorn -w 8 app:app
+"""
+import argparse
+import itertools
+import os
+import queue
+import re
+import secrets
+import signal
+import sys
+import tempfile
+import threading
+from functools import partial
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+from batching import BatchingPredictor
+from pipeline import EMOTIONS, FACE_SIZE
+
+DEFAULT_ADDRESS = '/tmp/emotion_model.sock'
+
+
+def parse_address(address):
+    """'host:port' -> TCP tuple, anything else is a Unix socket / named pipe path."""
+    match = re.fullmatch(r'([\w.\-]+):(\d+)', address)
+    if match:
+        return match.group(1), int(match.group(2))
+    return address
+
+
+def authkey_path(address):
+    """Key file shared by the server and workers of a local socket: '<socket>.key' (0600)."""
+    if address.startswith('\\\\'):
+        # Windows named pipe: there is no directory next to it
+        return os.path.join(tempfile.gettempdir(), os.path.basename(address) + '.key')
+    return address + '.key'
+
+
+def server_authkey(address):
+    """Authkey for a server on ``address``; every connection unpickles what the peer sends.
+
+    MODEL_SERVER_AUTHKEY is required for TCP. For a local socket without it, a
+    random key is written to ``authkey_path()`` readable only by this user.
+    """
+    key = os.getenv('MODEL_SERVER_AUTHKEY')
+    if key:
+        return key.encode('utf-8')
+    if not isinstance(parse_address(address), str):
+        raise RuntimeError('MODEL_SERVER_AUTHKEY must be set when the model server listens on TCP')
+    key = secrets.token_hex(32)
+    path = authkey_path(address)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+    return key.encode('utf-8')
+
+
+def client_authkey(address):
+    """MODEL_SERVER_AUTHKEY, or the key file the server wrote next to its local socket."""
+    key = os.getenv('MODEL_SERVER_AUTHKEY')
+    if key:
+        return key.encode('utf-8')
+    if not isinstance(parse_address(address), str):
+        raise RuntimeError('MODEL_SERVER_AUTHKEY must be set to connect to a model server over TCP')
+    try:
+        with open(authkey_path(address)) as f:
+            return f.read().strip().encode('utf-8')
+    except OSError as e:
+        raise ConnectionError(f'No model server key at {authkey_path(address)} (is model_server.py running?)') from e
+
+
+def attach_shared_memory(name):
+    """Attach to an existing segment without letting this process's resource tracker unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the segment; undo that so worker exit doesn't destroy it
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SlotArena:
+    """Views over the shared segment: per-slot input crops followed by per-slot outputs."""
+
+    def __init__(self, buf, num_slots, slot_faces):
+        input_shape = (num_slots, slot_faces, FACE_SIZE, FACE_SIZE, 1)
+        self.inputs = np.ndarray(input_shape, dtype=np.float32, buffer=buf)
+        self.outputs = np.ndarray((num_slots, slot_faces, len(EMOTIONS)), dtype=np.float32,
+                                  buffer=buf, offset=self.inputs.nbytes)
+
+    @staticmethod
+    def size(num_slots, slot_faces):
+        return num_slots * slot_faces * (FACE_SIZE * FACE_SIZE + len(EMOTIONS)) * 4
+
+
+class ModelServer:
+    """Owns the model; each connected worker is leased a fixed range of arena slots."""
+
+    def __init__(self, predict_fn, address=DEFAULT_ADDRESS, authkey=None, clients=16,
+                 slots_per_client=8, slot_faces=16, max_batch_size=64, max_delay_ms=5.0):
+        # Resolved first so a refusal leaves nothing to clean up; the key file is written
+        # before the socket appears, so a worker that sees the socket finds the key
+        self.key_file = None
+        if authkey is None:
+            authkey = server_authkey(address)
+            if not os.getenv('MODEL_SERVER_AUTHKEY'):
+                self.key_file = authkey_path(address)
+
+        self.slots_per_client = slots_per_client
+        self.slot_faces = slot_faces
+        self.num_slots = clients * slots_per_client
+        self.batcher = BatchingPredictor(predict_fn, max_batch_size=max_batch_size, max_delay_ms=max_delay_ms)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=SlotArena.size(self.num_slots, slot_faces))
+        self.arena = SlotArena(self.shm.buf, self.num_slots, slot_faces)
+        self._free_leases = list(range(clients - 1, -1, -1))
+        self._lock = threading.Lock()
+
+        address = parse_address(address)
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self.listener = connection.Listener(address, authkey=authkey)
+        self.address = self.listener.address
+
+    def serve_forever(self):
+        try:
+            while True:
+                try:
+                    conn = self.listener.accept()
+                except (connection.AuthenticationError, EOFError, ConnectionError) as e:
+                    # A peer with the wrong key (or one that hung up mid-handshake) must not stop the server
+                    print(f"Model server rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        self.listener.close()
+        if self.key_file and os.path.exists(self.key_file):
+            os.unlink(self.key_file)
+        self.batcher.close()
+        del self.arena
+        self.shm.close()
+        self.shm.unlink()
+
+    def _serve_client(self, conn):
+        with self._lock:
+            lease = self._free_leases.pop() if self._free_leases else None
+        if lease is None:
+            conn.send(('error', 'Model server has no free slots; raise --clients'))
+            conn.close()
+            return
+
+        first = lease * self.slots_per_client
+        send_lock = threading.Lock()
+        outstanding = _Outstanding()
+        conn.send(('welcome', self.shm.name, self.num_slots, self.slot_faces, first, self.slots_per_client))
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == 'predict':
+                    _, request_id, slot, count = message
+                    if not (first <= slot < first + self.slots_per_client and 0 < count <= self.slot_faces):
+                        with send_lock:
+                            conn.send(('done', request_id, 'Invalid slot or crop count'))
+                        continue
+                    # The batcher copies the crops out of shared memory on submit
+                    future = self.batcher.submit(self.arena.inputs[slot, :count])
+                    outstanding.add()
+                    future.add_done_callback(partial(self._reply, conn, send_lock, request_id, slot, count, outstanding))
+                elif message[0] == 'stats':
+                    with send_lock:
+                        conn.send(('stats', message[1], self.batcher.stats()))
+        except (EOFError, OSError):
+            pass
+        finally:
+            # Don't hand the slots to another worker while results are still being written
+            outstanding.wait()
+            conn.close()
+            with self._lock:
+                self._free_leases.append(lease)
+
+    def _reply(self, conn, send_lock, request_id, slot, count, outstanding, future):
+        try:
+            try:
+                self.arena.outputs[slot, :count] = future.result()
+                message = ('done', request_id, None)
+            except Exception as e:
+                message = ('done', request_id, str(e))
+            try:
+                with send_lock:
+                    conn.send(message)
+            except OSError:
+                pass
+        finally:
+            # Only now is the slot no longer written to
+            outstanding.done()
+
+
+class _Outstanding:
+    """Count of a connection's in-flight requests, updated from batcher callback threads."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._count = 0
+
+    def add(self):
+        with self._cond:
+            self._count += 1
+
+    def done(self):
+        with self._cond:
+            self._count -= 1
+            if not self._count:
+                self._cond.notify_all()
+
+    def wait(self):
+        with self._cond:
+            while self._count:
+                self._cond.wait()
+
+
+class _Pending:
+    def __init__(self, slot=None):
+        self.slot = slot
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.result = None
+        self.abandoned = False
+
+
+class RemotePredictor:
+    """Drop-in for BatchingPredictor.predict() that forwards crops to a ModelServer.
+
+    Connects lazily and reconnects after fork, so it can be created before
+    gunicorn forks its workers. Without ``authkey`` the key comes from
+    ``client_authkey()`` at connect time.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.address = address
+        self.authkey = authkey
+        self._pid = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+    def predict(self, crops, timeout=None):
+        self._connect()
+        crops = np.asarray(crops, dtype=np.float32)
+        if crops.ndim == 3:
+            crops = crops[np.newaxis]
+        outputs = [self._predict_chunk(crops[i:i + self.slot_faces], timeout)
+                   for i in range(0, len(crops), self.slot_faces)]
+        if not outputs:
+            return np.zeros((0, len(EMOTIONS)), dtype=np.float32)
+        return np.concatenate(outputs)
+
+    def stats(self, timeout=5):
+        self._connect()
+        request_id = next(self._ids)
+        stats = self._call(('stats', request_id), _Pending(), timeout)
+        return {'mode': 'remote', 'address': self.address, **stats}
+
+    def close(self):
+        with self._lock:
+            if self._pid is not None:
+                self._conn.close()
+                del self.arena
+                self._shm.close()
+                self._pid = None
+
+    def _connect(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            authkey = self.authkey or client_authkey(self.address)
+            conn = connection.Client(parse_address(self.address), authkey=authkey)
+            kind, *info = conn.recv()
+            if kind != 'welcome':
+                conn.close()
+                raise RuntimeError(info[0])
+            shm_name, num_slots, self.slot_faces, first, count = info
+
+            self._shm = attach_shared_memory(shm_name)
+            self.arena = SlotArena(self._shm.buf, num_slots, self.slot_faces)
+            self._free_slots = queue.Queue()
+            for slot in range(first, first + count):
+                self._free_slots.put(slot)
+            self._waiters = {}
+            self._send_lock = threading.Lock()
+            self._conn = conn
+            self._pid = os.getpid()
+            threading.Thread(target=self._read_loop, args=(conn, self._waiters),
+                             name='model-server-reader', daemon=True).start()
+
+    def _predict_chunk(self, crops, timeout):
+        try:
+            slot = self._free_slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('No free model server slot in time') from None
+        count = len(crops)
+        pending = _Pending(slot)
+        self.arena.inputs[slot, :count] = crops
+        error = self._call(('predict', next(self._ids), slot, count), pending, timeout)
+        if error:
+            self._free_slots.put(slot)
+            raise RuntimeError(error)
+        outputs = self.arena.outputs[slot, :count].copy()
+        self._free_slots.put(slot)
+        return outputs
+
+    def _call(self, message, pending, timeout):
+        request_id = message[1]
+        self._waiters[request_id] = pending
+        with self._send_lock:
+            self._conn.send(message)
+        if not pending.event.wait(timeout):
+            with pending.lock:
+                if not pending.event.is_set():
+                    # The server may still write into this slot; the reader thread frees it on reply
+                    pending.abandoned = True
+                    raise TimeoutError('Model server did not answer in time')
+        if isinstance(pending.result, Exception):
+            raise pending.result
+        return pending.result
+
+    def _read_loop(self, conn, waiters):
+        try:
+            while True:
+                _, request_id, result = conn.recv()
+                pending = waiters.pop(request_id, None)
+                if pending is None:
+                    continue
+                with pending.lock:
+                    pending.result = result
+                    pending.event.set()
+                    if pending.abandoned and pending.slot is not None:
+                        self._free_slots.put(pending.slot)
+        except (EOFError, OSError):
+            error = ConnectionError('Lost connection to model server')
+            for pending in list(waiters.values()):
+                pending.result = error
+                pending.event.set()
+            with self._lock:
+                if self._conn is conn:
+                    self._pid = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--address', default=os.getenv('MODEL_SERVER_ADDRESS', DEFAULT_ADDRESS),
+                        help="Unix socket path or host:port")
+    parser.add_argument('--backend', default=os.getenv('INFERENCE_BACKEND', 'keras'))
+    parser.add_argument('--model-path', default=os.getenv('MODEL_PATH') or None)
+    parser.add_argument('--clients', type=int, default=16, help="Maximum connected web workers")
+    parser.add_argument('--slots-per-client', type=int, default=8, help="Concurrent requests per worker")
+    parser.add_argument('--slot-faces', type=int, default=16, help="Crops per slot (larger requests are split)")
+    parser.add_argument('--max-batch-size', type=int, default=int(os.getenv('BATCH_MAX_SIZE', 64)))
+    parser.add_argument('--max-delay-ms', type=float, default=float(os.getenv('BATCH_MAX_DELAY_MS', 5)))
+    args = parser.parse_args()
+
+    from backends import load_backend
+    model = load_backend(args.backend, args.model_path, max_batch_size=args.max_batch_size)
+    try:
+        server = ModelServer(model.predict, args.address, clients=args.clients,
+                             slots_per_client=args.slots_per_client, slot_faces=args.slot_faces,
+                             max_batch_size=args.max_batch_size, max_delay_ms=args.max_delay_ms)
+    except RuntimeError as e:
+        sys.exit(f"Model server not started: {e}")
+    print(f"Model server ({model.name} backend) listening on {server.address}, shared memory {server.shm.name}")
+    # Make `kill` run serve_forever's cleanup so the shared memory segment is unlinked
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
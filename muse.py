@@ -0,0 +1,176 @@
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+# After sorting by (emotional, pleasant) the MUSE catalog is split into fixed
+# 18000-row bands, one per mood; labels without a band use the "sad" band.
+SEGMENT_BOUNDS = (0, 18000, 36000, 54000, 72000)
+SEGMENT_OF = {
+    'Sad': 0,
+    'Fearful': 1, 'fear': 1,
+    'Angry': 2,
+    'Neutral': 3,
+    'Happy': 4, 'happy': 4,
+}
+# Songs drawn per emotion rank, by how many distinct emotions were seen
+TIMES = {1: [30], 2: [30, 20], 3: [55, 20, 15], 4: [30, 29, 18, 9], 5: [10, 7, 6, 5, 2]}
+STORE_VERSION = 1
+
+
+def allocation(emotion_list):
+    """[(emotion, count), ...] for the top five emotions, most frequent first.
+
+    Takes a label list or an {emotion: weight} mapping (e.g. aggregate shares).
+    """
+    sorted_emotions = [item for item, count in Counter(emotion_list).most_common(5)]
+    times = TIMES.get(len(sorted_emotions), [])
+    return [(emotion, times[i] if i < len(times) else 5) for i, emotion in enumerate(sorted_emotions)]
+
+
+class StringColumn:
+    """Strings stored as one UTF-8 blob plus offsets, optionally dictionary-encoded.
+
+    All three arrays can be memory-mapped .npy files; only the rows actually
+    requested are decoded into Python strings.
+    """
+
+    def __init__(self, offsets, blob, codes=None):
+        self.offsets = offsets
+        self.blob = blob
+        self.codes = codes
+
+    @classmethod
+    def encode(cls, values, dictionary=True):
+        values = np.asarray(values, dtype=object).astype(str)
+        codes = None
+        if dictionary:
+            values, codes = np.unique(values, return_inverse=True)
+            codes = codes.astype(np.int32)
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(offsets, blob, codes)
+
+    def __len__(self):
+        return len(self.codes) if self.codes is not None else len(self.offsets) - 1
+
+    def __getitem__(self, positions):
+        entries = self.codes[positions] if self.codes is not None else np.asarray(positions)
+        starts, ends = self.offsets[entries], self.offsets[entries + 1]
+        blob = self.blob
+        return np.array([blob[s:e].tobytes().decode('utf-8') for s, e in zip(starts, ends)], dtype=object)
+
+    def save(self, path, name):
+        np.save(os.path.join(path, f'{name}_offsets.npy'), self.offsets)
+        np.save(os.path.join(path, f'{name}_blob.npy'), self.blob)
+        if self.codes is not None:
+            np.save(os.path.join(path, f'{name}_codes.npy'), self.codes)
+
+    @classmethod
+    def load(cls, path, name, mmap_mode='r'):
+        codes_path = os.path.join(path, f'{name}_codes.npy')
+        codes = np.load(codes_path, mmap_mode=mmap_mode) if os.path.exists(codes_path) else None
+        return cls(np.load(os.path.join(path, f'{name}_offsets.npy'), mmap_mode=mmap_mode),
+                   np.load(os.path.join(path, f'{name}_blob.npy'), mmap_mode=mmap_mode), codes)
+
+
+class MuseSampler:
+    """Weighted multi-emotion sampler over the MUSE song catalog.
+
+    Columns are kept in (emotional, pleasant) order and each mood band is just
+    a (start, length) pair, so a recommendation is one vectorized draw of row
+    positions followed by one fancy-index per output column. Columns are
+    either numpy object arrays (CSV) or memory-mapped StringColumns (store).
+    """
+
+    def __init__(self, names, artists, links, seed=None):
+        self.names = names
+        self.artists = artists
+        self.links = links
+
+        n = len(names)
+        bounds = np.minimum(np.array(SEGMENT_BOUNDS + (n,), dtype=np.int64), n)
+        self.starts = bounds[:-1]
+        self.lengths = bounds[1:] - bounds[:-1]
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_columns(cls, names, artists, links, emotional, pleasant, seed=None):
+        order = np.lexsort((np.asarray(pleasant), np.asarray(emotional)))
+        return cls(np.asarray(names, dtype=object)[order], np.asarray(artists, dtype=object)[order],
+                   np.asarray(links, dtype=object)[order], seed=seed)
+
+    @classmethod
+    def from_csv(cls, path, seed=None):
+        import pandas as pd
+
+        df = pd.read_csv(path, usecols=['track', 'artist', 'lastfm_url', 'number_of_emotion_tags', 'valence_tags'])
+        df[['track', 'artist', 'lastfm_url']] = df[['track', 'artist', 'lastfm_url']].fillna('')
+        return cls.from_columns(df['track'].to_numpy(), df['artist'].to_numpy(), df['lastfm_url'].to_numpy(),
+                                df['number_of_emotion_tags'].to_numpy(), df['valence_tags'].to_numpy(), seed=seed)
+
+    @classmethod
+    def from_store(cls, path, seed=None):
+        """Memory-map a catalog written by convert_muse.py (pages are shared across workers)."""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported MUSE store version {meta.get('version')} in {path}")
+        return cls(StringColumn.load(path, 'name'), StringColumn.load(path, 'artist'),
+                   StringColumn.load(path, 'link'), seed=seed)
+
+    def save(self, path):
+        """Write the catalog in store format: names/artists dictionary-encoded, links as a plain blob."""
+        os.makedirs(path, exist_ok=True)
+        StringColumn.encode(self.names).save(path, 'name')
+        StringColumn.encode(self.artists).save(path, 'artist')
+        StringColumn.encode(self.links, dictionary=False).save(path, 'link')
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'version': STORE_VERSION, 'rows': len(self)}, f)
+
+    def __len__(self):
+        return len(self.names)
+
+    def sample_positions(self, emotion_list):
+        """Draw every emotion's songs, without repeats within the result.
+
+        Emotions that share a band (Sad, Disgusted, Surprised and unknown
+        labels all use band 0) are drawn together, so a small catalog caps
+        their combined count at the band size instead of running out of rows.
+        """
+        plan = allocation(emotion_list)
+        if not plan:
+            return np.zeros(0, dtype=np.int64)
+        wanted = {}
+        for emotion, count in plan:
+            segment = SEGMENT_OF.get(emotion, 0)
+            wanted[segment] = wanted.get(segment, 0) + count
+
+        positions = []
+        for segment, count in wanted.items():
+            length = int(self.lengths[segment])
+            count = min(count, length)
+            if count:
+                positions.append(self.starts[segment] + self.rng.choice(length, size=count, replace=False))
+        return np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64)
+
+    def sample_columns(self, emotion_list):
+        positions = self.sample_positions(emotion_list)
+        return {'name': self.names[positions], 'artist': self.artists[positions], 'link': self.links[positions]}
+
+    def recommend(self, emotion_list):
+        """Song dicts in the same shape as the /recommend fixed playlists."""
+        columns = self.sample_columns(emotion_list)
+        return [{'name': name, 'artist': artist, 'link': link, 'track': name}
+                for name, artist, link in zip(columns['name'], columns['artist'], columns['link'])]
+
+
+def load_sampler(csv_path='muse_v3.csv', store_path=None, seed=None):
+    """Prefer the memory-mapped store next to the CSV (muse_v3.store/) and fall back to the CSV."""
+    store_path = store_path or os.path.splitext(csv_path)[0] + '.store'
+    if os.path.isdir(store_path):
+        return MuseSampler.from_store(store_path, seed=seed)
+    return MuseSampler.from_csv(csv_path, seed=seed)
@@ -0,0 +1,286 @@
+import threading
+from collections import OrderedDict, deque
+
+import cv2
+import numpy as np
+
+from metrics import registry as metrics
+
+emotion_dict = {0: "Angry", 1: "Disgusted", 2: "Fearful", 3: "Happy", 4: "Neutral", 5: "Sad", 6: "Surprised"}
+EMOTIONS = [emotion_dict[i] for i in range(len(emotion_dict))]
+FACE_SIZE = 48
+
+
+def detect_faces(face_cascade, gray):
+    """Run the Haar cascade with the settings used throughout the app."""
+    with metrics.stage('detect'):
+        return face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
+
+
+class AdaptiveDetector:
+    """Haar detection on a downscaled copy, with the search range tuned to recent faces.
+
+    Frames wider than ``target_width`` are area-downscaled to that width before
+    ``detectMultiScale``, and the boxes are mapped back to full resolution for
+    cropping. ``minSize``/``maxSize`` start from ``min_face``/``max_face``
+    (fractions of the frame width) and then follow the widths of the last
+    ``history`` detections, widened by ``margin``, so the cascade skips pyramid
+    levels that cannot contain a face. A frame with no face in the tuned range
+    is searched again over the full range straight away, so a face of a new
+    size is found on its first frame; after ``miss_limit`` consecutive frames
+    without any face the tuned range is dropped. Frames no wider than
+    ``target_width`` (small uploads, tracker search windows) get plain
+    ``detect_faces`` and do not tune the range.
+
+    The range is learned from every frame passed in, so each stream or user
+    needs its own detector (see ``AdaptiveDetectorPool``).
+    """
+
+    def __init__(self, face_cascade, target_width=320, min_face=0.08, max_face=1.0, history=32, margin=0.5,
+                 miss_limit=5):
+        self.face_cascade = face_cascade
+        self.target_width = int(target_width)
+        self.min_face = float(min_face)
+        self.max_face = float(max_face)
+        self.margin = float(margin)
+        self.miss_limit = int(miss_limit)
+
+        self._widths = deque(maxlen=history)  # recent face widths as a fraction of frame width
+        self._misses = 0
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.downscaled_frames = 0
+        self.resets = 0
+        self.fallbacks = 0
+
+    def size_range(self):
+        """(min, max) face width as a fraction of the frame width."""
+        with self._lock:
+            if not self._widths:
+                return self.min_face, self.max_face
+            lo = min(self._widths) * (1 - self.margin)
+            hi = max(self._widths) * (1 + self.margin)
+        return max(lo, self.min_face), min(hi, self.max_face)
+
+    def __call__(self, gray):
+        return self.detect(gray)
+
+    def detect(self, gray):
+        height, width = gray.shape[:2]
+        self.frames += 1
+        if width <= self.target_width:
+            return detect_faces(self.face_cascade, gray)
+
+        self.downscaled_frames += 1
+        scale = self.target_width / width
+        small = cv2.resize(gray, (self.target_width, max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+        lo, hi = self.size_range()
+        faces = self._detect_range(small, lo, hi)
+        if not len(faces) and (lo, hi) != (self.min_face, self.max_face):
+            # Nothing in the tuned range: a new or resized face must not wait for miss_limit
+            self.fallbacks += 1
+            faces = self._detect_range(small, self.min_face, self.max_face)
+        self._observe(faces)
+        if not len(faces):
+            return faces
+
+        boxes = np.round(np.asarray(faces, dtype=np.float64) / scale).astype(np.int32)
+        # Keep crops inside the full-resolution frame after rounding
+        boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+        boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+        boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+        return boxes
+
+    def _detect_range(self, small, lo, hi):
+        # The cascade window is 24x24; smaller limits would only add empty pyramid levels
+        min_side = max(24, int(lo * self.target_width))
+        max_side = max(min_side + 1, int(hi * self.target_width))
+        with metrics.stage('detect'):
+            return self.face_cascade.detectMultiScale(small, scaleFactor=1.3, minNeighbors=5,
+                                                      minSize=(min_side, min_side), maxSize=(max_side, max_side))
+
+    def _observe(self, faces):
+        with self._lock:
+            if len(faces):
+                self._misses = 0
+                self._widths.extend(float(w) / self.target_width for _, _, w, _ in faces)
+                return
+            self._misses += 1
+            if self._misses >= self.miss_limit and self._widths:
+                self._widths.clear()
+                self.resets += 1
+
+    def stats(self):
+        lo, hi = self.size_range()
+        return {
+            'target_width': self.target_width,
+            'min_face_fraction': lo,
+            'max_face_fraction': hi,
+            'frames': self.frames,
+            'downscaled_frames': self.downscaled_frames,
+            'range_resets': self.resets,
+            'range_fallbacks': self.fallbacks,
+        }
+
+
+class AdaptiveDetectorPool:
+    """One ``AdaptiveDetector`` per owner (session user), sharing the cascade.
+
+    Each owner's size range is learned from that owner's frames only, so one
+    client's large faces never hide another client's small ones. Beyond
+    ``max_owners`` the least recently used owner's detector is dropped.
+    """
+
+    def __init__(self, face_cascade, max_owners=1024, **options):
+        self.face_cascade = face_cascade
+        self.max_owners = max(1, int(max_owners))
+        self.options = options
+        self._detectors = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def new(self):
+        """A detector owned by the caller alone (e.g. one /stream session)."""
+        return AdaptiveDetector(self.face_cascade, **self.options)
+
+    def get(self, owner):
+        with self._lock:
+            detector = self._detectors.get(owner)
+            if detector is None:
+                detector = self._detectors[owner] = self.new()
+                if len(self._detectors) > self.max_owners:
+                    self._detectors.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._detectors.move_to_end(owner)
+            return detector
+
+    def stats(self):
+        with self._lock:
+            detectors = list(self._detectors.values())
+        totals = {key: sum(d.stats()[key] for d in detectors)
+                  for key in ('frames', 'downscaled_frames', 'range_resets', 'range_fallbacks')}
+        return {'target_width': self.options.get('target_width', 320), 'owners': len(detectors),
+                'evictions': self.evictions, **totals}
+
+
+def prepare_crops(gray, faces, size=FACE_SIZE):
+    """Resize every detected face into one stacked (N, 48, 48, 1) float32 batch."""
+    with metrics.stage('resize'):
+        staging = np.empty((len(faces), size, size), dtype=np.uint8)
+        for i, (x, y, w, h) in enumerate(faces):
+            cv2.resize(gray[y:y + h, x:x + w], (size, size), dst=staging[i])
+        # Single vectorized cast + channel axis for the whole batch
+        return staging.astype(np.float32)[..., np.newaxis]
+
+
+class Preprocessor:
+    """``prepare_crops`` without per-frame allocations.
+
+    Each thread owns a uint8 staging buffer and a float32 ``(capacity, 48, 48, 1)``
+    input tensor, grown (doubled) only when a frame has more faces than any
+    before it. Every face is resized straight into its staging slot, optionally
+    contrast-normalized in place (``equalize='hist'`` for global histogram
+    equalization, ``'clahe'`` for CLAHE with ``clip_limit``/``tile_grid``), and
+    the whole batch is then cast into the tensor and normalized in place
+    (``pixel * scale + offset``). The defaults reproduce ``prepare_crops`` exactly.
+
+    The returned batch is a view of the calling thread's tensor and is
+    overwritten by that thread's next call, so it must be consumed (or copied)
+    first. Batched prediction that blocks on its result satisfies this.
+    """
+
+    EQUALIZE_MODES = (None, 'hist', 'clahe')
+
+    def __init__(self, size=FACE_SIZE, capacity=8, equalize=None, clip_limit=2.0, tile_grid=4, scale=1.0,
+                 offset=0.0):
+        if equalize not in self.EQUALIZE_MODES:
+            raise ValueError(f"equalize must be one of {self.EQUALIZE_MODES}, got {equalize!r}")
+        self.size = int(size)
+        self.capacity = max(1, int(capacity))
+        self.equalize = equalize
+        self.clip_limit = float(clip_limit)
+        self.tile_grid = int(tile_grid)
+        self.scale = float(scale)
+        self.offset = float(offset)
+        self._local = threading.local()
+
+    def _buffers(self, count):
+        local = self._local
+        staging = getattr(local, 'staging', None)
+        if staging is None or len(staging) < count:
+            capacity = max(self.capacity, len(staging) * 2 if staging is not None else 0, count)
+            local.staging = np.empty((capacity, self.size, self.size), dtype=np.uint8)
+            local.batch = np.empty((capacity, self.size, self.size, 1), dtype=np.float32)
+            if self.equalize == 'clahe' and not hasattr(local, 'clahe'):
+                # CLAHE objects keep internal state, so one per thread
+                local.clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=(self.tile_grid,) * 2)
+        return local.staging, local.batch
+
+    def __call__(self, gray, faces):
+        return self.prepare(gray, faces)
+
+    def prepare(self, gray, faces):
+        """(N, 48, 48, 1) float32 view over this thread's input tensor."""
+        return self.prepare_many(((gray, faces),))
+
+    def prepare_many(self, frames):
+        """Faces of several ``(gray, faces)`` frames in one batch, frame by frame in order."""
+        count = sum(len(faces) for _, faces in frames)
+        staging, batch = self._buffers(count)
+        with metrics.stage('resize'):
+            size = (self.size, self.size)
+            i = 0
+            for gray, faces in frames:
+                for (x, y, w, h) in faces:
+                    slot = staging[i]
+                    cv2.resize(gray[y:y + h, x:x + w], size, dst=slot)
+                    if self.equalize == 'hist':
+                        cv2.equalizeHist(slot, dst=slot)
+                    elif self.equalize == 'clahe':
+                        self._local.clahe.apply(slot, dst=slot)
+                    i += 1
+
+            out = batch[:count]
+            pixels = out[..., 0]
+            # Cast straight into the tensor, then normalize in place: a mixed-type
+            # ufunc with out= would allocate cast buffers on every call
+            np.copyto(pixels, staging[:count], casting='unsafe')
+            if self.scale != 1.0:
+                pixels *= self.scale
+            if self.offset:
+                pixels += self.offset
+            return out
+
+    def stats(self):
+        return {'equalize': self.equalize or 'none', 'scale': self.scale, 'offset': self.offset}
+
+
+def probabilities_to_dict(probabilities):
+    return {EMOTIONS[i]: float(p) for i, p in enumerate(probabilities)}
+
+
+def describe_faces(faces, probabilities):
+    """Per-face boxes, labels and full probability vectors for a JSON response."""
+    results = []
+    for (x, y, w, h), probs in zip(faces, probabilities):
+        results.append({
+            'box': [int(x), int(y), int(w), int(h)],
+            'emotion': EMOTIONS[int(np.argmax(probs))],
+            'probabilities': probabilities_to_dict(probs),
+        })
+    return results
+
+
+def aggregate(probabilities, default="Neutral"):
+    """Average the per-face probability vectors into one frame-level emotion."""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    if probabilities.size == 0:
+        return {'emotion': default, 'probabilities': {}, 'face_count': 0}
+    mean = probabilities.mean(axis=0)
+    return {
+        'emotion': EMOTIONS[int(np.argmax(mean))],
+        'probabilities': probabilities_to_dict(mean),
+        'face_count': len(probabilities),
+    }
@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Preferred first; identity is always available
+ENCODINGS = ('br', 'gzip')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.svg', '.json', '.txt')
+# Below this size the headers cost more than compression saves
+MIN_COMPRESS_BYTES = 256
+
+
+def compress(body):
+    """{'identity': body, 'gzip': ..., 'br': ...}, keeping only encodings that are smaller."""
+    variants = {'identity': body}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return variants
+    gz = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(gz) < len(body):
+        variants['gzip'] = gz
+    if brotli is not None:
+        br = brotli.compress(body, quality=11)
+        if len(br) < len(body):
+            variants['br'] = br
+    return variants
+
+
+def negotiate(accept_encodings, available):
+    """Best encoding in ``available`` that the client's Accept-Encoding allows."""
+    for encoding in ENCODINGS:
+        if encoding in available and accept_encodings[encoding]:
+            return encoding
+    return 'identity'
+
+
+def compress_dynamic(body, accept_encodings, level=5):
+    """(encoding, body) for a per-request body: gzip at a cheap level when accepted and worthwhile."""
+    if len(body) < MIN_COMPRESS_BYTES or not accept_encodings['gzip']:
+        return 'identity', body
+    return 'gzip', gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class Precompressed:
+    """A payload serialized and compressed once, then served in the client's best encoding.
+
+    Each encoding gets its own ETag (``<etag>-gzip``), since the bytes differ.
+    """
+
+    def __init__(self, body, content_type, etag=None):
+        self.content_type = content_type
+        self.variants = compress(body)
+        self.etag = etag or hashlib.sha1(body).hexdigest()[:16]
+
+    def select(self, accept_encodings):
+        """(encoding, body, etag) for a request's Accept-Encoding."""
+        encoding = negotiate(accept_encodings, self.variants)
+        etag = self.etag if encoding == 'identity' else f'{self.etag}-{encoding}'
+        return encoding, self.variants[encoding], etag
+
+
+class StaticAssets:
+    """Precompressed copies of the text assets under ``root`` (static/js, static/css, ...).
+
+    Each file is read and compressed on first request and again only when its
+    mtime changes, so edits show up without a restart.
+    """
+
+    def __init__(self, root, extensions=COMPRESSIBLE_EXTENSIONS):
+        self.root = os.path.realpath(root)
+        self.extensions = extensions
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        """Precompressed asset for a path relative to root, or None to fall back to plain serving."""
+        if not filename.lower().endswith(self.extensions):
+            return None
+        path = os.path.realpath(os.path.join(self.root, filename))
+        if not path.startswith(self.root + os.sep):
+            return None
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        cached = self._assets.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type.endswith(('javascript', 'json', 'svg+xml')):
+            content_type += '; charset=utf-8'
+        asset = Precompressed(body, content_type)
+        with self._lock:
+            self._assets[path] = (mtime, asset)
+        return asset
@@ -0,0 +1,435 @@
+"""Setup and request helpers shared by the Flask (app.py) and ASGI (asgi_app.py) servers.
+
+Model, batching, prediction cache, face detection and the song catalogs live
+here, once per process, along with the framework-neutral parts of /predict,
+/recommend and /inference-stats. Each server keeps its own database access,
+thread pools and admission controller, created by that server only.
+"""
+import mimetypes
+import os
+from collections import Counter
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import partial
+from urllib.parse import quote
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+from werkzeug.http import http_date, quote_etag
+
+from admission import AdmissionController
+from aggregation import weights_from_aggregate
+from backends import load_backend
+from batching import BatchingPredictor
+from catalog import SongCatalog
+from frame_cache import PredictionCache
+from metrics import registry as metrics
+from model_server import RemotePredictor
+from muse import load_sampler
+from pipeline import EMOTIONS, AdaptiveDetectorPool, Preprocessor, detect_faces, describe_faces, aggregate
+from responses import StaticAssets, compress_dynamic
+from streaming import StreamSession
+from tracking import FaceTracker
+
+# Load environment variables from .env file
+load_dotenv()
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SECRET_KEY = os.getenv('SECRET_KEY', 'supersecretkey')
+# bcrypt cost for new passwords; both servers hash with it
+BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+
+# --- Metrics ---
+# Per-stage latency histograms and counters at /metrics (Prometheus text format).
+# Off by default; when off the instrumentation is a no-op.
+metrics.enable(os.getenv('METRICS_ENABLED', '0').lower() in ('1', 'true', 'yes'))
+
+# --- ML Model Setup ---
+# With MODEL_SERVER_ADDRESS set, a separate model_server.py process owns the model and
+# this worker only ships face crops to it through shared memory.
+MODEL_SERVER_ADDRESS = os.getenv('MODEL_SERVER_ADDRESS')
+model = None
+predictor = None
+if MODEL_SERVER_ADDRESS:
+    predictor = RemotePredictor(MODEL_SERVER_ADDRESS)
+    print(f"Using shared model server at {MODEL_SERVER_ADDRESS}")
+else:
+    # INFERENCE_BACKEND=keras|onnx|tflite; TensorFlow is only imported by the keras backend
+    try:
+        model = load_backend(os.getenv('INFERENCE_BACKEND', 'keras'), os.getenv('MODEL_PATH') or None,
+                             threads=int(os.getenv('INFERENCE_THREADS', 0)) or None,
+                             max_batch_size=int(os.getenv('BATCH_MAX_SIZE', 32)))
+        print(f"Model loaded successfully ({model.name} backend)")
+    except Exception as e:
+        print(f"WARNING: Could not load emotion model: {e}")
+        print("Running in DEMO mode with mock predictions.")
+
+# --- Batched Inference ---
+# Concurrent /predict calls enqueue their face crops here and share one forward pass
+if model:
+    predictor = BatchingPredictor(
+        metrics.timed('model_predict', model.predict),
+        max_batch_size=int(os.getenv('BATCH_MAX_SIZE', 32)),
+        max_delay_ms=float(os.getenv('BATCH_MAX_DELAY_MS', 5)),
+    )
+PREDICT_TIMEOUT = float(os.getenv('PREDICT_TIMEOUT', 10))
+
+if hasattr(predictor, 'queue_depth'):
+    metrics.gauge('inference_queue_depth', predictor.queue_depth)
+
+# --- Prediction Cache ---
+# Near-identical consecutive frames (someone sitting still) reuse the last result
+# instead of re-running detection and the CNN. PREDICT_CACHE_SIZE=0 disables it.
+prediction_cache = None
+if predictor and int(os.getenv('PREDICT_CACHE_SIZE', 256)) > 0:
+    prediction_cache = PredictionCache(
+        max_entries=int(os.getenv('PREDICT_CACHE_SIZE', 256)),
+        ttl=float(os.getenv('PREDICT_CACHE_TTL', 1.0)),
+        threshold=int(os.getenv('PREDICT_CACHE_THRESHOLD', 4)),
+    )
+
+def load_haarcascade():
+    face_cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+    return face_cascade
+
+face_cascade = load_haarcascade()
+
+# DETECT_MODE=adaptive runs the cascade on a DETECT_TARGET_WIDTH-wide copy of larger
+# frames with the face size range tuned from recent detections, per user or stream
+adaptive_detectors = None
+if os.getenv('DETECT_MODE', 'full') == 'adaptive':
+    adaptive_detectors = AdaptiveDetectorPool(face_cascade, target_width=int(os.getenv('DETECT_TARGET_WIDTH', 320)),
+                                              max_owners=int(os.getenv('DETECT_MAX_OWNERS', 1024)))
+
+# Face crops are resized into per-thread preallocated input tensors; PREPROCESS_EQUALIZE=hist|clahe
+# adds contrast normalization (only useful if the model tolerates it, e.g. dim webcams)
+PREPROCESS_EQUALIZE = os.getenv('PREPROCESS_EQUALIZE', 'none').lower()
+preprocess = Preprocessor(equalize=None if PREPROCESS_EQUALIZE == 'none' else PREPROCESS_EQUALIZE,
+                          clip_limit=float(os.getenv('PREPROCESS_CLAHE_CLIP', 2.0)))
+
+def detect(gray):
+    """Full-range detection that learns nothing (tracker search windows, default)."""
+    return detect_faces(face_cascade, gray)
+
+def detector_for(owner):
+    """Detect function whose adaptive size range is tuned on ``owner``'s frames only."""
+    if adaptive_detectors is None:
+        return detect
+    return adaptive_detectors.get(owner).detect
+
+def stream_detector():
+    """Detect function for one /stream session, tuned on that session's keyframes only."""
+    if adaptive_detectors is None:
+        return detect
+    return adaptive_detectors.new().detect
+
+def classify_frame(gray, tracker=None, detect_fn=detect):
+    """Detect (or track) every face in a grayscale frame and return (faces, (N, 7) probabilities)."""
+    faces = tracker.update(gray) if tracker else detect_fn(gray)
+    if not len(faces):
+        return faces, np.zeros((0, len(EMOTIONS)), dtype=np.float32)
+    # A view of this thread's tensor; predict() blocks until the batch has copied it
+    crops = preprocess(gray, faces)
+    # Includes time spent waiting for the batch to fill
+    with metrics.stage('inference'):
+        return faces, predictor.predict(crops, timeout=PREDICT_TIMEOUT)
+
+# --- FIXED PLAYLISTS (7 Songs per Emotion) ---
+# Hardcoded to ensure no overlap and high quality
+FIXED_PLAYLISTS = {
+    "Angry": [
+        {"name": "Numb", "artist": "Linkin Park", "link": "https://youtu.be/kXYiU_JCYtU", "track": "Numb"},
+        {"name": "Break Stuff", "artist": "Limp Bizkit", "link": "https://youtu.be/ZpUYjpKg9KY", "track": "Break Stuff"},
+        {"name": "Killing In The Name", "artist": "Rage Against The Machine", "link": "https://youtu.be/bWXazVhlyxQ", "track": "Killing In The Name"},
+        {"name": "Chop Suey!", "artist": "System Of A Down", "link": "https://youtu.be/CSvFpBOe8eY", "track": "Chop Suey!"},
+        {"name": "Du Hast", "artist": "Rammstein", "link": "https://youtu.be/W3q8Od5qJio", "track": "Du Hast"},
+        {"name": "Bodies", "artist": "Drowning Pool", "link": "https://youtu.be/04F4xlWSFh0", "track": "Bodies"},
+        {"name": "Master of Puppets", "artist": "Metallica", "link": "https://youtu.be/xnKhsTXoKCI", "track": "Master of Puppets"}
+    ],
+    "Disgusted": [
+        {"name": "Ugly", "artist": "The Exies", "link": "https://youtu.be/O3M8g8lZgY4", "track": "Ugly"},
+        {"name": "Creep", "artist": "Radiohead", "link": "https://youtu.be/XFkzRNyygfk", "track": "Creep"},
+        {"name": "Bad Guy", "artist": "Billie Eilish", "link": "https://youtu.be/DyDfgMOUjCI", "track": "Bad Guy"},
+        {"name": "Toxic", "artist": "Britney Spears", "link": "https://youtu.be/LOZuxwVk7TU", "track": "Toxic"},
+        {"name": "Sick of It", "artist": "Skillet", "link": "https://youtu.be/A2JGDyX018g", "track": "Sick of It"},
+        {"name": "Hate Me", "artist": "Blue October", "link": "https://youtu.be/dDxgSvJINlU", "track": "Hate Me"},
+        {"name": "Complicated", "artist": "Avril Lavigne", "link": "https://youtu.be/5NPBIwQyPWE", "track": "Complicated"}
+    ],
+    "Fearful": [
+        {"name": "Demons", "artist": "Imagine Dragons", "link": "https://youtu.be/mWRsgZuwf_8", "track": "Demons"},
+        {"name": "Thriller", "artist": "Michael Jackson", "link": "https://youtu.be/sOnqjkJTMaA", "track": "Thriller"},
+        {"name": "Somebody's Watching Me", "artist": "Rockwell", "link": "https://youtu.be/7YvAYIJSSZY", "track": "Somebody's Watching Me"},
+        {"name": "Enter Sandman", "artist": "Metallica", "link": "https://youtu.be/CD-E-LDc384", "track": "Enter Sandman"},
+        {"name": "Disturbia", "artist": "Rihanna", "link": "https://youtu.be/E1mU6h4Xdxc", "track": "Disturbia"},
+        {"name": "In the End", "artist": "Linkin Park", "link": "https://youtu.be/eVTXPUF4Oz4", "track": "In the End"},
+        {"name": "Unthought Known", "artist": "Pearl Jam", "link": "https://youtu.be/T224iY8rYyM", "track": "Unthought Known"}
+    ],
+    "Happy": [
+        {"name": "Happy", "artist": "Pharrell Williams", "link": "https://youtu.be/ZbZSe6N_BXs", "track": "Happy"},
+        {"name": "Uptown Funk", "artist": "Mark Ronson ft. Bruno Mars", "link": "https://youtu.be/OPf0YbXqDm0", "track": "Uptown Funk"},
+        {"name": "Can't Stop the Feeling!", "artist": "Justin Timberlake", "link": "https://youtu.be/ru0K8uYEZWw", "track": "Can't Stop the Feeling!"},
+        {"name": "Walking on Sunshine", "artist": "Katrina and the Waves", "link": "https://youtu.be/iPUmE-tne5U", "track": "Walking on Sunshine"},
+        {"name": "Shut Up and Dance", "artist": "WALK THE MOON", "link": "https://youtu.be/6JCLY0Rlx6Q", "track": "Shut Up and Dance"},
+        {"name": "I Gotta Feeling", "artist": "The Black Eyed Peas", "link": "https://youtu.be/uSD4vsh1zDA", "track": "I Gotta Feeling"},
+        {"name": "Best Day of My Life", "artist": "American Authors", "link": "https://youtu.be/Y66j_BUCBMY", "track": "Best Day of My Life"}
+    ],
+    "Neutral": [
+        {"name": "Weightless", "artist": "Marconi Union", "link": "https://youtu.be/UfcAVejslrU", "track": "Weightless"},
+        {"name": "Orinoco Flow", "artist": "Enya", "link": "https://youtu.be/LTrk4X9ACTw", "track": "Orinoco Flow"},
+        {"name": "Put Your Records On", "artist": "Corinne Bailey Rae", "link": "https://youtu.be/rjOhZZyn30k", "track": "Put Your Records On"},
+        {"name": "Sunday Morning", "artist": "Maroon 5", "link": "https://youtu.be/S2CTI12XBJA", "track": "Sunday Morning"},
+        {"name": "Banana Pancakes", "artist": "Jack Johnson", "link": "https://youtu.be/6Graa_Vm5eA", "track": "Banana Pancakes"},
+        {"name": "Three Little Birds", "artist": "Bob Marley", "link": "https://youtu.be/LanCLS_hIo4", "track": "Three Little Birds"},
+        {"name": "Upside Down", "artist": "Jack Johnson", "link": "https://youtu.be/dqUdI4AIDF0", "track": "Upside Down"}
+    ],
+    "Sad": [
+        {"name": "Someone Like You", "artist": "Adele", "link": "https://youtu.be/hLQl3WQQoQ0", "track": "Someone Like You"},
+        {"name": "Fix You", "artist": "Coldplay", "link": "https://youtu.be/k4V3Mo61fJM", "track": "Fix You"},
+        {"name": "Let Her Go", "artist": "Passenger", "link": "https://youtu.be/RBumgq5yVrA", "track": "Let Her Go"},
+        {"name": "The Night We Met", "artist": "Lord Huron", "link": "https://youtu.be/KtlgYxa6BMU", "track": "The Night We Met"},
+        {"name": "All of Me", "artist": "John Legend", "link": "https://youtu.be/450p7goxZqg", "track": "All of Me"},
+        {"name": "Say Something", "artist": "A Great Big World", "link": "https://youtu.be/-2U0Ivkn2Ds", "track": "Say Something"},
+        {"name": "Skinny Love", "artist": "Birdy", "link": "https://youtu.be/aNzCDt2eidg", "track": "Skinny Love"}
+    ],
+    "Surprised": [
+        {"name": "Firework", "artist": "Katy Perry", "link": "https://youtu.be/QGJuMBdaqUb", "track": "Firework"},
+        {"name": "Bohemian Rhapsody", "artist": "Queen", "link": "https://youtu.be/fJ9rUzIMcZQ", "track": "Bohemian Rhapsody"},
+        {"name": "Sugar", "artist": "Maroon 5", "link": "https://youtu.be/09R8_2nJtjg", "track": "Sugar"},
+        {"name": "Counting Stars", "artist": "OneRepublic", "link": "https://youtu.be/hT_nvWreIhg", "track": "Counting Stars"},
+        {"name": "Viva La Vida", "artist": "Coldplay", "link": "https://youtu.be/dvgZkm1xWPE", "track": "Viva La Vida"},
+        {"name": "On Top of the World", "artist": "Imagine Dragons", "link": "https://youtu.be/w5tWYmIOWGk", "track": "On Top of the World"},
+        {"name": "Starlight", "artist": "Muse", "link": "https://youtu.be/Pgum6OT_VH8", "track": "Starlight"}
+    ]
+}
+
+# --- Song Catalog ---
+# Indexed once at startup; emotion folders are re-listed only when their mtime changes
+song_catalog = SongCatalog(os.path.join(ROOT, 'static', 'songs'), FIXED_PLAYLISTS,
+                           refresh_interval=float(os.getenv('CATALOG_REFRESH_SECONDS', 5)))
+
+# --- MUSE Catalog (optional) ---
+# When muse_v3.csv is present, emotions without local songs get a weighted
+# multi-emotion sample from it instead of the fixed playlist. A store written
+# by convert_muse.py is memory-mapped instead of parsing the CSV.
+muse_sampler = None
+MUSE_CSV = os.getenv('MUSE_CSV', 'muse_v3.csv')
+MUSE_STORE = os.getenv('MUSE_STORE') or os.path.splitext(MUSE_CSV)[0] + '.store'
+if os.path.isdir(MUSE_STORE) or os.path.exists(MUSE_CSV):
+    try:
+        muse_sampler = load_sampler(MUSE_CSV, MUSE_STORE)
+        print(f"Loaded MUSE catalog ({len(muse_sampler)} songs)")
+    except Exception as e:
+        print(f"WARNING: Could not load MUSE catalog: {e}")
+
+# --- Static Files ---
+# JS/CSS are served precompressed; audio gets Range support (for seeking) and a long
+# max-age, or is handed to the front proxy with AUDIO_SENDFILE=x-sendfile|x-accel
+static_assets = StaticAssets(os.path.join(ROOT, 'static'))
+AUDIO_MAX_AGE = int(os.getenv('AUDIO_MAX_AGE', 7 * 24 * 3600))
+AUDIO_SENDFILE = os.getenv('AUDIO_SENDFILE', '')
+AUDIO_ACCEL_PREFIX = os.getenv('AUDIO_ACCEL_PREFIX', '/protected/songs/')
+
+# --- Streaming ---
+STREAM_EMA_ALPHA = float(os.getenv('STREAM_EMA_ALPHA', 0.3))
+# Full Haar detection every N streamed frames, template tracking in between (1 = always detect)
+TRACK_KEYFRAME_INTERVAL = int(os.getenv('TRACK_KEYFRAME_INTERVAL', 10))
+
+# --- Request Helpers ---
+
+# Batched inference raises concurrent.futures.TimeoutError, the model server the
+# builtin one (the same class from Python 3.11 on)
+INFERENCE_TIMEOUTS = (FutureTimeout, TimeoutError)
+
+def classify_demo_frame(gray, tracker=None):
+    # DEMO MODE: random probability vectors so the smoothed stream still moves
+    return [], np.random.dirichlet(np.ones(len(EMOTIONS)), size=1)
+
+def predict_frame(gray, scale=1, owner=None):
+    """Classify every face in a decoded frame and build the /predict response body.
+
+    Cached results are only reused for the same ``owner`` (the session user),
+    so one user's near-identical frame never returns another user's prediction.
+    """
+    emotion = "Neutral"
+    result = {'faces': []}
+    
+    if predictor:
+        if prediction_cache is not None:
+            key, meta = prediction_cache.key(gray), (owner, gray.shape, scale)
+            cached = prediction_cache.get(key, meta)
+            if cached is not None:
+                metrics.inc('predict_cache_hits_total')
+                return cached
+        # Every face goes through a single stacked forward pass
+        faces, probabilities = classify_frame(gray, detect_fn=detector_for(owner))
+        metrics.observe('faces_per_frame', len(faces))
+        # Stays Neutral if no face found but model exists
+        if len(faces):
+            result['faces'] = describe_faces(np.asarray(faces) * scale, probabilities)
+            result['aggregate'] = aggregate(probabilities)
+            emotion = result['aggregate']['emotion']
+    else:
+        # DEMO MODE: Randomize emotion to show UI functionality
+        # Since TensorFlow failed to install, we simulate detection
+        import random
+        # Higher chance of non-neutral emotions for demo
+        emotions_pool = ["Happy", "Sad", "Angry", "Surprised", "Fearful", "Disgusted", "Neutral"]
+        emotion = random.choice(emotions_pool)
+        print(f"Demo Mode Prediction: {emotion}")
+        metrics.inc('demo_predictions_total')
+        return {'emotion': emotion, **result}
+
+    result = {'emotion': emotion, **result}
+    if prediction_cache is not None:
+        prediction_cache.put(key, result, meta)
+    return result
+
+def stream_session(ws):
+    """StreamSession for one /stream connection; ``ws`` has blocking receive()/send()."""
+    if not predictor:
+        return StreamSession(ws, classify_demo_frame, alpha=STREAM_EMA_ALPHA)
+    # Adaptive size range learned from this session's full-frame detections only
+    detect_fn = stream_detector()
+    tracker = None
+    if TRACK_KEYFRAME_INTERVAL > 1:
+        tracker = FaceTracker(detect_fn, keyframe_interval=TRACK_KEYFRAME_INTERVAL, local_detect_fn=detect)
+    return StreamSession(ws, partial(classify_frame, detect_fn=detect_fn), alpha=STREAM_EMA_ALPHA, tracker=tracker)
+
+def audio_path(filename):
+    """Real path of a song file under the catalog root, or None if missing or outside it."""
+    root = os.path.realpath(song_catalog.songs_root)
+    path = os.path.realpath(os.path.join(root, filename))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+def audio_offload(path, filename):
+    """(body, status, headers) handing an audio file to the front proxy, or None to send it here."""
+    headers = {
+        'Content-Type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+        'Cache-Control': f'public, max-age={AUDIO_MAX_AGE}',
+    }
+    if AUDIO_SENDFILE == 'x-accel':
+        # nginx serves the bytes (and Range requests) from its internal location
+        headers['X-Accel-Redirect'] = AUDIO_ACCEL_PREFIX.rstrip('/') + '/' + quote(filename)
+    elif AUDIO_SENDFILE == 'x-sendfile':
+        headers['X-Sendfile'] = path
+    else:
+        return None
+    return b'', 200, headers
+
+def asset_response(filename, request):
+    """(body, status, headers) for a precompressed JS/CSS asset, or None for plain static serving."""
+    asset = static_assets.get(filename)
+    if asset is None:
+        return None
+    encoding, body, etag = asset.select(request.accept_encodings)
+    headers = {'Vary': 'Accept-Encoding', 'ETag': quote_etag(etag), 'Cache-Control': 'no-cache'}
+    if request.if_none_match.contains(etag):
+        return b'', 304, headers
+    headers['Content-Type'] = asset.content_type
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return body, 200, headers
+
+def make_admission(max_in_flight):
+    """Admission control for /predict with the shared queue, deadline and per-user rate settings.
+
+    Bounded slots for detection/inference plus a short queue; requests that would miss
+    their deadline, overflow the queue or exceed a user's rate get 503/429 + Retry-After.
+    """
+    return AdmissionController(
+        max_in_flight=max_in_flight,
+        max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', 16)),
+        deadline=float(os.getenv('PREDICT_DEADLINE_MS', 2000)) / 1000.0,
+        rate=float(os.getenv('USER_RATE_LIMIT', 10)),
+        burst=float(os.getenv('USER_RATE_BURST', 20)),
+    )
+
+def request_budget(headers):
+    """Client time budget from X-Request-Deadline-Ms, in seconds (None = server default)."""
+    budget = headers.get('X-Request-Deadline-Ms', type=float)
+    return budget / 1000.0 if budget else None
+
+def overloaded(rejected):
+    """(body, status, headers) for a request shed by admission control."""
+    metrics.inc('predict_rejected_total')
+    return ({'error': rejected.reason, 'retry_after': rejected.retry_after}, rejected.status,
+            {'Retry-After': str(rejected.retry_after)})
+
+def inference_stats(admission):
+    if predictor is None:
+        return {'enabled': False}
+    stats = predictor.stats()
+    if prediction_cache is not None:
+        stats['cache'] = prediction_cache.stats()
+    if adaptive_detectors is not None:
+        stats['detection'] = adaptive_detectors.stats()
+    stats['admission'] = admission.stats()
+    return {'enabled': True, **stats}
+
+def posted_emotions(data):
+    """Emotions from a /recommend POST body: a label list, or {emotion: share} for an aggregate.
+
+    Raises ValueError (a 400 for the client) when the body is malformed.
+    """
+    emotions = data.get('emotions', []) if isinstance(data, dict) else None
+    if not isinstance(emotions, list) or not all(isinstance(e, str) for e in emotions):
+        raise ValueError('Expected {"emotions": [...]} or {"aggregate": {...}}')
+    # A compact {"aggregate": {"probabilities": {...}}} from /stream or the client; its vote
+    # shares are counted like labels (Counter, muse.allocation) instead of expanded into a list
+    if data.get('aggregate'):
+        try:
+            return weights_from_aggregate(data['aggregate'])
+        except ValueError as e:
+            raise ValueError(f'Invalid aggregate: {e}')
+    return emotions
+
+def recommendation_entry(emotions):
+    """Catalog entry for the dominant emotion: local files first, else the fixed playlist."""
+    # Get dominant emotion
+    emotion_counts = Counter(emotions)
+    if emotion_counts:
+        dominant_emotion = emotion_counts.most_common(1)[0][0]
+    else:
+        dominant_emotion = "Neutral"
+    return song_catalog.get(dominant_emotion)
+
+def is_not_modified(request, entry, etag):
+    if request.if_none_match:
+        # If-None-Match uses weak comparison (RFC 9110)
+        return request.if_none_match.contains_weak(etag)
+    return bool(request.if_modified_since and request.if_modified_since >= entry.last_modified)
+
+def recommendation(emotions, request):
+    """(body, status, headers) for /recommend, with ETag/Last-Modified revalidation.
+
+    ``request`` is the Flask or Quart request; only its Accept-Encoding and
+    conditional headers are read.
+    """
+    entry = recommendation_entry(emotions)
+    if not entry.is_local and muse_sampler is not None:
+        # Random draw every time, so there is nothing to revalidate
+        return {'dominant_emotion': entry.emotion, 'songs': muse_sampler.recommend(emotions)}, 200, {}
+
+    etag = entry.etag()
+    encoding = 'identity'
+    if entry.payload is not None:
+        # Fixed playlist: serialized and compressed at startup
+        encoding, body, etag = entry.payload.select(request.accept_encodings)
+    headers = {
+        'Vary': 'Accept-Encoding',
+        # Local playlists are reshuffled per response: same songs, different bytes
+        'ETag': quote_etag(etag, weak=entry.payload is None),
+        'Last-Modified': http_date(entry.last_modified),
+        'Cache-Control': 'private, no-cache',
+    }
+    if is_not_modified(request, entry, etag):
+        return b'', 304, headers
+
+    if entry.payload is None:
+        encoding, body = compress_dynamic(entry.body(), request.accept_encodings)
+    headers['Content-Type'] = 'application/json'
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return body, 200, headers
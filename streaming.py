@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from aggregation import EmotionAggregator
+from decoding import decode_image, decode_raw_gray
+from pipeline import EMOTIONS, probabilities_to_dict
+
+# Failures confined to one frame: a bad payload or config (ValueError,
+# TypeError, cv2.error) or inference that timed out or lost its model server.
+# They are reported to the client and the stream carries on.
+FRAME_ERRORS = (ValueError, TypeError, cv2.error, TimeoutError, ConnectionError, RuntimeError)
+
+
+class EmotionSmoother:
+    """Exponential moving average over per-frame 7-way probability vectors."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = float(alpha)
+        self.state = None
+
+    def update(self, probabilities):
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if self.state is None:
+            self.state = probabilities.copy()
+        else:
+            self.state += self.alpha * (probabilities - self.state)
+        return self.state
+
+    @property
+    def emotion(self):
+        if self.state is None:
+            return "Neutral"
+        return EMOTIONS[int(np.argmax(self.state))]
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox: a new frame replaces any frame not yet processed."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = (frame, time.perf_counter())
+            self.received += 1
+            self._cond.notify()
+
+    def take(self):
+        """Block until a frame is available; returns None once closed and drained."""
+        with self._cond:
+            while self._frame is None and not self._closed:
+                self._cond.wait()
+            frame, self._frame = self._frame, None
+            return frame
+
+    def poll(self):
+        """The pending (frame, received_at) without waiting, or None."""
+        with self._cond:
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StreamSession:
+    """Per-connection state for the /stream WebSocket.
+
+    Binary messages are frames (encoded JPEG/PNG by default, or raw 8-bit
+    grayscale after a ``{"type": "config", "format": "gray8", "width": ...,
+    "height": ...}`` text message). A receiver thread keeps only the newest
+    frame, so a slow classifier drops stale frames instead of queueing them.
+    After each processed frame the smoothed emotion is pushed back as JSON,
+    along with a ``session`` aggregate (confidence-weighted, time-decayed over
+    the whole connection, ready to post to /recommend) and detect-vs-track
+    frame counts when a ``FaceTracker`` is used. A frame that cannot be decoded
+    or classified (``FRAME_ERRORS``) is answered with ``{"type": "error"}`` and
+    the stream carries on; so is a malformed control message.
+    """
+
+    def __init__(self, ws, classify_frame, alpha=0.3, tracker=None):
+        self.ws = ws
+        self.classify_frame = classify_frame
+        self.tracker = tracker
+        self.smoother = EmotionSmoother(alpha)
+        self.aggregator = EmotionAggregator()
+        self.slot = LatestFrameSlot()
+        self.config = {'format': 'jpeg', 'reduce': 1}
+        self.processed = 0
+        # The receiver thread answers bad control messages while the main
+        # loop answers frames; websocket sends are not thread-safe
+        self._send_lock = threading.Lock()
+
+    def _send(self, message):
+        with self._send_lock:
+            self.ws.send(json.dumps(message))
+
+    def run(self):
+        receiver = threading.Thread(target=self._receive_loop, name='stream-receiver', daemon=True)
+        receiver.start()
+        try:
+            while True:
+                item = self.slot.take()
+                if item is None:
+                    break
+                frame, received_at = item
+                try:
+                    message = self._process(frame, received_at)
+                except FRAME_ERRORS as e:
+                    if not isinstance(e, ValueError):
+                        print(f"Stream frame failed: {type(e).__name__}: {e}")
+                    message = {'type': 'error', 'message': str(e) or type(e).__name__}
+                self._send(message)
+        finally:
+            self.slot.close()
+
+    def _receive_loop(self):
+        try:
+            while True:
+                data = self.ws.receive()
+                if data is None:
+                    continue
+                if isinstance(data, str):
+                    try:
+                        self._handle_control(json.loads(data))
+                    except (ValueError, TypeError) as e:
+                        # json.JSONDecodeError is a ValueError
+                        self._send({'type': 'error', 'message': f"Bad control message: {e}"})
+                else:
+                    self.slot.put(data)
+        except Exception:
+            # Client went away (ConnectionClosed); end the session
+            pass
+        finally:
+            self.slot.close()
+
+    def _handle_control(self, message):
+        if not isinstance(message, dict):
+            raise ValueError("expected a JSON object")
+        if message.get('type') == 'config':
+            alpha = self.smoother.alpha
+            if 'alpha' in message:
+                alpha = float(message['alpha'])
+                # Outside (0, 1] the moving average overshoots and diverges
+                if not 0 < alpha <= 1:
+                    raise ValueError("alpha must be in (0, 1]")
+            for key in ('format', 'width', 'height', 'reduce', 'scale'):
+                if key in message:
+                    self.config[key] = message[key]
+            self.smoother.alpha = alpha
+
+    def _decode(self, data):
+        buf = np.frombuffer(data, np.uint8)
+        if self.config['format'] == 'gray8':
+            gray = decode_raw_gray(buf, int(self.config.get('width', 0)), int(self.config.get('height', 0)))
+            return gray, float(self.config.get('scale', 1))
+        reduce = int(self.config.get('reduce', 1))
+        return decode_image(buf, reduce), reduce
+
+    def _process(self, data, received_at):
+        gray, scale = self._decode(data)
+        faces, probabilities = self.classify_frame(gray, tracker=self.tracker)
+        if len(probabilities):
+            self.smoother.update(np.mean(probabilities, axis=0))
+            self.aggregator.update(probabilities)
+        self.processed += 1
+
+        state = self.smoother.state
+        message = {
+            'type': 'emotion',
+            'emotion': self.smoother.emotion,
+            'probabilities': probabilities_to_dict(state) if state is not None else {},
+            'faces': [[int(v * scale) for v in box] for box in faces],
+            'frames_received': self.slot.received,
+            'frames_processed': self.processed,
+            'frames_dropped': self.slot.dropped,
+            'latency_ms': (time.perf_counter() - received_at) * 1000.0,
+            'session': self.aggregator.summary(),
+        }
+        if self.tracker is not None:
+            message['tracking'] = self.tracker.stats()
+        return message
@@ -1,12 +1,15 @@
-import numpy as np
+import queue
+
 import streamlit as st
 import cv2
 import pandas as pd
-from collections import Counter
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout, Flatten
-from tensorflow.keras.layers import Conv2D
-from tensorflow.keras.layers import MaxPooling2D
+
+from aggregation import EmotionAggregator
+from backends import load_backend
+from capture import CameraSource, CapturePipeline
+from muse import allocation, load_sampler
+from pipeline import Preprocessor, detect_faces
+from tracking import FaceTracker
 
 # Page config
 st.set_page_config(page_title="Emotion-based Music Recommendation", layout="wide")
@@ -15,34 +18,12 @@ st.set_page_config(page_title="Emotion-based Music Recommendation", layout="wide
 @st.cache_resource
 def load_data():
     print("Loading music dataset...")
-    df = pd.read_csv("muse_v3.csv")
-    df['link'] = df['lastfm_url']
-    df['name'] = df['track']
-    df['emotional'] = df['number_of_emotion_tags']
-    df['pleasant'] = df['valence_tags']
-    df = df[['name', 'emotional', 'pleasant', 'link', 'artist']]
-    df = df.sort_values(by=["emotional", "pleasant"])
-    df.reset_index(inplace=True, drop=True)
-    return df
+    return load_sampler("muse_v3.csv")
 
 @st.cache_resource
 def load_model():
     print("Loading model...")
-    model = Sequential()
-    model.add(Conv2D(32, kernel_size=(3, 3), activation='relu', input_shape=(48, 48, 1)))
-    model.add(Conv2D(64, kernel_size=(3, 3), activation='relu'))
-    model.add(MaxPooling2D(pool_size=(2, 2)))
-    model.add(Conv2D(128, kernel_size=(3, 3), activation='relu'))
-    model.add(MaxPooling2D(pool_size=(2, 2)))
-    model.add(Conv2D(128, kernel_size=(3, 3), activation='relu'))
-    model.add(MaxPooling2D(pool_size=(2, 2)))
-    model.add(Dropout(0.25))
-    model.add(Flatten())
-    model.add(Dense(1024, activation='relu'))
-    model.add(Dropout(0.5))
-    model.add(Dense(7, activation='softmax'))
-    model.load_weights('model.h5')
-    return model
+    return load_backend()
 
 @st.cache_resource
 def load_haarcascade():
@@ -56,72 +37,27 @@ def load_haarcascade():
         return face_cascade
 
 # Load data and model
-df = load_data()
+sampler = load_data()
 model = load_model()
 face_cascade = load_haarcascade()
-
-# Segment dataframe by emotion
-df_sad = df[:18000]
-df_fear = df[18000:36000]
-df_angry = df[36000:54000]
-df_neutral = df[54000:72000]
-df_happy = df[72000:]
-
-emotion_dict = {0: "Angry", 1: "Disgusted", 2: "Fearful", 3: "Happy", 4: "Neutral", 5: "Sad", 6: "Surprised"}
+# Reuses one preallocated input tensor across frames
+preprocess = Preprocessor()
 
 # --- Helper Functions ---
 def get_recommendations(emotion_list):
     """Get song recommendations based on detected emotions"""
-    data = pd.DataFrame()
-    
-    emotion_counts = Counter(emotion_list)
-    sorted_emotions = [item for item, count in emotion_counts.most_common()]
-    
-    if len(sorted_emotions) > 5:
-        sorted_emotions = sorted_emotions[:5]
-        
-    num_emotions = len(sorted_emotions)
-    
-    times = []
-    if num_emotions == 1:
-        times = [30]
-    elif num_emotions == 2:
-        times = [30, 20]
-    elif num_emotions == 3:
-        times = [55, 20, 15]
-    elif num_emotions == 4:
-        times = [30, 29, 18, 9]
-    else:
-        times = [10, 7, 6, 5, 2]
-        
-    for i, emotion in enumerate(sorted_emotions):
-        count = times[i] if i < len(times) else 5
-        
-        if emotion == 'Neutral':
-            data = pd.concat([data, df_neutral.sample(n=count)], ignore_index=True)
-        elif emotion == 'Angry':
-            data = pd.concat([data, df_angry.sample(n=count)], ignore_index=True)
-        elif emotion == 'Fearful' or emotion == 'fear':
-            data = pd.concat([data, df_fear.sample(n=count)], ignore_index=True)
-        elif emotion == 'Happy' or emotion == 'happy':
-            data = pd.concat([data, df_happy.sample(n=count)], ignore_index=True)
-        else:
-            data = pd.concat([data, df_sad.sample(n=count)], ignore_index=True)
-            
-    return data, sorted_emotions[0] if sorted_emotions else "Neutral"
+    # One vectorized draw across all detected emotions (see muse.py)
+    data = pd.DataFrame(sampler.sample_columns(emotion_list))
+    plan = allocation(emotion_list)
+    return data, plan[0][0] if plan else "Neutral"
 
-def process_emotions(emotion_list):
-    """Process and deduplicate emotions by frequency"""
-    emotion_counts = Counter(emotion_list)
-    result = []
-    for emotion, count in emotion_counts.items():
-        result.extend([emotion] * count)
-    
-    unique_list = []
-    for x in result:
-        if x not in unique_list:
-            unique_list.append(x)
-    return unique_list
+def process_emotions(emotion_list, aggregator=None):
+    """Deduplicate detected emotions, strongest first by confidence-weighted vote"""
+    seen = set(emotion_list)
+    if aggregator is not None and aggregator.frames:
+        return [emotion for emotion in aggregator.ranked() if emotion in seen]
+    # dict keeps first-seen order; O(n) instead of the old list membership scan
+    return list(dict.fromkeys(emotion_list))
 # --- UI Layout ---
 st.markdown("<h2 style='text-align: center; color: #2c3e50'><b>🎵 Emotion Based Music Recommendation</b></h2>", 
             unsafe_allow_html=True)
@@ -138,50 +74,59 @@ with col2:
     if st.button('🎬 SCAN EMOTION (Click here)', use_container_width=True):
         st.info("📹 Opening webcam... This will scan your face for 20 frames.")
         
-        cap = cv2.VideoCapture(0)
+        # Grab thread keeps the newest webcam frame; detection/inference run on the pipeline's worker
+        # Haar detection on keyframes only, template tracking in between
+        tracker = FaceTracker(lambda g: detect_faces(face_cascade, g), keyframe_interval=5)
+        results = queue.Queue()
+        scanner = CapturePipeline([CameraSource(0, name='webcam')], model.predict,
+                                  detect_factory=lambda name: tracker.update, preprocess=preprocess,
+                                  on_result=results.put)
         
-        if not cap.isOpened():
+        try:
+            scanner.start()
+        except RuntimeError:
             st.error("❌ Cannot access webcam. Please check your camera.")
         else:
             count = 0
             emotion_list = []
+            aggregator = EmotionAggregator(capacity=64)
             stframe = st.empty()
             status_text = st.empty()
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
-                count += 1
-                
-                # Draw rectangles and detect emotions
-                for (x, y, w, h) in faces:
-                    cv2.rectangle(frame, (x, y - 50), (x + w, y + h + 10), (255, 0, 0), 2)
-                    roi_gray = gray[y:y + h, x:x + w]
-                    cropped_img = np.expand_dims(np.expand_dims(cv2.resize(roi_gray, (48, 48)), -1), 0)
-                    prediction = model.predict(cropped_img, verbose=0)
-                    max_index = int(np.argmax(prediction))
-                    emotion = emotion_dict[max_index]
-                    emotion_list.append(emotion)
-                    
-                    cv2.putText(frame, emotion, (x + 20, y - 60), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+            try:
+                while count < 20:
+                    try:
+                        result = results.get(timeout=5)
+                    except queue.Empty:
+                        break
+                    frame = result.frame
+                    count += 1
                 
-                # Display frame
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                stframe.image(frame_rgb, channels="RGB", use_column_width=True)
-                status_text.text(f"Frame: {count}/20")
+                    # Every face in the frame was classified in one stacked forward pass
+                    if len(result.faces):
+                        aggregator.update(result.probabilities)
+                        for (x, y, w, h), emotion in zip(result.faces, result.emotions):
+                            cv2.rectangle(frame, (x, y - 50), (x + w, y + h + 10), (255, 0, 0), 2)
+                            emotion_list.append(emotion)
+                        
+                            cv2.putText(frame, emotion, (x + 20, y - 60), 
+                                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
                 
-                if count >= 20:
-                    break
+                    # Display frame (Streamlit swaps BGR channels itself; no per-frame RGB copy)
+                    stframe.image(frame, channels="BGR", use_column_width=True)
+                    status_text.text(f"Frame: {count}/20")
+            finally:
+                scanner.stop()
             
-            cap.release()
+            track_stats = tracker.stats()
+            camera_stats = scanner.stats()['cameras']['webcam']
+            st.caption(f"Face detection ran on {track_stats['detect_frames']} frames, "
+                       f"tracking on {track_stats['track_frames']}; "
+                       f"camera {camera_stats['capture_fps']:.0f} fps, "
+                       f"latency {camera_stats['latency_p50_ms']:.0f} ms.")
             
             if emotion_list:
-                emotion_list = process_emotions(emotion_list)
+                emotion_list = process_emotions(emotion_list, aggregator)
                 st.success(f"✅ Emotions detected: {', '.join(emotion_list)}")
             else:
                 st.warning("⚠️ No faces detected. Please try again.")
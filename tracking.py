@@ -0,0 +1,123 @@
+import cv2
+import numpy as np
+
+# Templates are matched at roughly this width so tracking cost is independent of face size
+TEMPLATE_WIDTH = 32
+
+
+class FaceTracker:
+    """Detect-then-track: full Haar detection on keyframes, template matching in between.
+
+    ``detect_fn(gray)`` is the full detector (e.g. ``detect_faces`` bound to the
+    cascade). Between keyframes each face is followed by normalized
+    cross-correlation inside its box padded by ``search_padding``. When a match
+    falls below ``min_confidence`` the detector is re-run on that small search
+    window only (with ``local_detect_fn``, default ``detect_fn``; pass a plain
+    detector when ``detect_fn`` tunes itself on full frames); if it still finds
+    nothing the track is dropped and the next frame becomes a keyframe.
+    """
+
+    def __init__(self, detect_fn, keyframe_interval=10, search_padding=0.5, min_confidence=0.6,
+                 local_detect_fn=None):
+        self.detect_fn = detect_fn
+        self.local_detect_fn = local_detect_fn or detect_fn
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.search_padding = float(search_padding)
+        self.min_confidence = float(min_confidence)
+
+        self._tracks = []  # list of (box, template, scale)
+        self._since_keyframe = 0
+        self.detect_frames = 0
+        self.track_frames = 0
+        self.local_redetects = 0
+        self.lost_tracks = 0
+
+    def reset(self):
+        self._tracks = []
+        self._since_keyframe = 0
+
+    def update(self, gray):
+        """Return the (N, 4) face boxes for this frame."""
+        if not self._tracks or self._since_keyframe >= self.keyframe_interval:
+            return self._keyframe(gray)
+
+        self.track_frames += 1
+        self._since_keyframe += 1
+        tracks = []
+        for box, template, scale in self._tracks:
+            new_box = self._match(gray, box, template, scale)
+            if new_box is None:
+                new_box = self._redetect_local(gray, box)
+                if new_box is None:
+                    self.lost_tracks += 1
+                    continue
+            tracks.append(self._make_track(gray, new_box))
+
+        self._tracks = tracks
+        if not tracks:
+            # Everything lost: force a full detection on the next frame
+            self._since_keyframe = self.keyframe_interval
+        return self.boxes()
+
+    def boxes(self):
+        if not self._tracks:
+            return np.zeros((0, 4), dtype=np.int32)
+        return np.array([box for box, _, _ in self._tracks], dtype=np.int32)
+
+    def stats(self):
+        total = self.detect_frames + self.track_frames
+        return {
+            'keyframe_interval': self.keyframe_interval,
+            'detect_frames': self.detect_frames,
+            'track_frames': self.track_frames,
+            'local_redetects': self.local_redetects,
+            'lost_tracks': self.lost_tracks,
+            'detect_ratio': (self.detect_frames / total) if total else 0.0,
+        }
+
+    def _keyframe(self, gray):
+        self.detect_frames += 1
+        self._since_keyframe = 1
+        faces = self.detect_fn(gray)
+        self._tracks = [self._make_track(gray, box) for box in faces]
+        return self.boxes()
+
+    def _make_track(self, gray, box):
+        x, y, w, h = (int(v) for v in box)
+        scale = min(1.0, TEMPLATE_WIDTH / float(w))
+        template = gray[y:y + h, x:x + w]
+        if scale < 1.0:
+            template = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return (x, y, w, h), template, scale
+
+    def _search_window(self, gray, box):
+        x, y, w, h = box
+        pad_x, pad_y = int(w * self.search_padding), int(h * self.search_padding)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(gray.shape[1], x + w + pad_x), min(gray.shape[0], y + h + pad_y)
+        return x0, y0, x1, y1
+
+    def _match(self, gray, box, template, scale):
+        x0, y0, x1, y1 = self._search_window(gray, box)
+        window = gray[y0:y1, x0:x1]
+        if scale < 1.0:
+            window = cv2.resize(window, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+            return None
+
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, confidence, _, (mx, my) = cv2.minMaxLoc(scores)
+        if confidence < self.min_confidence:
+            return None
+        x, y, w, h = box
+        return x0 + int(round(mx / scale)), y0 + int(round(my / scale)), w, h
+
+    def _redetect_local(self, gray, box):
+        self.local_redetects += 1
+        x0, y0, x1, y1 = self._search_window(gray, box)
+        faces = self.local_detect_fn(gray[y0:y1, x0:x1])
+        if not len(faces):
+            return None
+        # Keep the candidate closest in size to the face we were following
+        fx, fy, fw, fh = min(faces, key=lambda f: abs(int(f[2]) - box[2]))
+        return x0 + int(fx), y0 + int(fy), int(fw), int(fh)